@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
+
+The stock views are async, so serve them with an ASGI server to handle many slow
+upstream requests per process, e.g.  uvicorn Django_Projects.asgi:application
 """
 
 import os
@@ -10,11 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Market data comes through data_providers at the repository root (DATA_PROVIDER=live|record|replay)
+sys.path.append(str(BASE_DIR.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
@@ -55,7 +59,8 @@ ROOT_URLCONF = 'Django_Projects.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        # Templates shared with the Flask app live in templates/ at the repository root
+        'DIRS': [BASE_DIR.parent / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -78,6 +83,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Async views load several tickers at once; wait for the write lock instead of failing
+        'OPTIONS': {'timeout': 20},
     }
 }
 
@@ -118,6 +125,20 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Live stream (myapp.streaming): 'yahoo' polls Yahoo once for all tickers, or give the path of a
+# recorded CSV (ticker, timestamp, open, high, low, close, volume) to replay it
+
+STREAM_FEED = 'yahoo'
+STREAM_TICKERS = ['AAPL', 'GOOGL', 'MSFT', 'AMZN']
+STREAM_POLL_SECONDS = 60
+STREAM_REPLAY_INTERVAL = 1.0
+
+# Background jobs (myapp.jobs): 'thread' runs a worker thread in each server process; 'external' leaves
+# queued jobs to `python manage.py run_jobs`
+
+JOB_WORKER = 'thread'
+JOB_POLL_INTERVAL = 1.0
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
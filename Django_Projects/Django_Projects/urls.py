@@ -16,11 +16,19 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from myapp.views import stock_chart
+from myapp.views import compare, job_status, live, live_stream, metrics, ohlcv_api, stock_chart, stock_chart_client
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('stocks/', stock_chart, name='stock_chart'),
+    path('stocks/client/', stock_chart_client, name='stock_chart_client'),
+    path('stocks/compare/', compare, name='compare'),
+    path('stocks/jobs/<int:job_id>/', job_status, name='job_status'),
+    path('stocks/live/', live, name='live'),
+    path('stocks/live/stream/', live_stream, name='live_stream'),
+    path('stocks/api/ohlcv/<str:ticker>/', ohlcv_api, name='ohlcv_api'),
+    # Scrape with metrics_path: /metrics/ (a bare /metrics is redirected here by APPEND_SLASH)
+    path('metrics/', metrics, name='metrics'),
 ]
 
@@ -1,3 +1,28 @@
 from django.contrib import admin
+from .models import Bar, Instrument, Job
 
 # Register your models here.
+
+
+@admin.register(Instrument)
+class InstrumentAdmin(admin.ModelAdmin):
+    list_display = ('ticker', 'name', 'created_at')
+    search_fields = ('ticker', 'name')
+
+
+@admin.register(Bar)
+class BarAdmin(admin.ModelAdmin):
+    list_display = ('instrument', 'interval', 'timestamp', 'open', 'high', 'low', 'close', 'volume')
+    list_filter = ('interval',)
+    search_fields = ('instrument__ticker',)
+    # A select box with every instrument would be slow to render; use an id lookup instead
+    raw_id_fields = ('instrument',)
+    list_select_related = ('instrument',)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'worker', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('params_hash', 'created_at', 'started_at', 'finished_at')
+    exclude = ('result',)
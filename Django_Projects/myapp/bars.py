@@ -0,0 +1,148 @@
+import threading
+import time
+from datetime import time as clock, timedelta
+from zoneinfo import ZoneInfo
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from data_providers import PERIOD_DAYS, history
+from instrumentation import span, timed
+from .models import Bar, Instrument
+
+BATCH_SIZE = 5000
+# Longest history Yahoo serves per interval (intraday bars only go back a limited number of days)
+MAX_PERIOD = {'1m': '7d', '5m': '60d', '15m': '60d', '1h': '730d', '1d': 'max'}
+INTERVAL_LENGTH = {'1m': timedelta(minutes=1), '5m': timedelta(minutes=5), '15m': timedelta(minutes=15),
+                   '1h': timedelta(hours=1), '1d': timedelta(days=1)}
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_OPEN = clock(9, 30)
+MARKET_CLOSE = clock(16, 0)
+# A stale ticker is topped up at most this often (holidays look stale but have no new bars)
+REFRESH_SECONDS = 300
+
+_refreshed = {}
+_refresh_lock = threading.Lock()
+
+
+# Function to get the lower bound (exclusive) of a yfinance-style period counted back from the newest
+# stored bar, so '1d' and '5d' cover the last sessions even on weekends and holidays (None for 'max')
+def period_start(period, last):
+    if period == 'ytd':
+        # Just before midnight on January 1 (the bound is exclusive)
+        new_year = last.astimezone(MARKET_TZ).replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        return new_year - timedelta(microseconds=1)
+    if period in PERIOD_DAYS:
+        return last - timedelta(days=PERIOD_DAYS[period])
+    return None
+
+
+# Function to get the date of the newest session that has opened (weekends skipped; holidays are not known)
+def last_session_date(now=None):
+    now = (now or timezone.now()).astimezone(MARKET_TZ)
+    day = now.date() if now.time() >= MARKET_OPEN else now.date() - timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+# Function to check whether stored bars miss bars the market has produced since: daily bars need the
+# last session; intraday bars also need to be within one bar of now while the market is open
+def is_stale(last, interval, now=None):
+    now = now or timezone.now()
+    local = now.astimezone(MARKET_TZ)
+    if last.astimezone(MARKET_TZ).date() < last_session_date(now):
+        return True
+    market_open = local.weekday() < 5 and MARKET_OPEN <= local.time() < MARKET_CLOSE
+    return interval != '1d' and market_open and now - last > INTERVAL_LENGTH.get(interval, timedelta(days=1))
+
+
+# Function to get the timestamp of the newest stored bar (None if the ticker has never been loaded)
+def last_bar_time(ticker, interval='1d'):
+    return Bar.objects.filter(instrument__ticker=ticker.upper(), interval=interval).aggregate(
+        last=Max('timestamp'))['last']
+
+
+# Function to download bars and upsert them in large batches. Only bars from the last stored bar onwards
+# are fetched (the last one is rewritten because it may have been a partial bar); full=True reloads everything.
+def load_bars(ticker, interval='1d', full=False, batch_size=BATCH_SIZE):
+    instrument, _ = Instrument.objects.get_or_create(ticker=ticker.upper())
+    last = None if full else instrument.bars.filter(interval=interval).aggregate(last=Max('timestamp'))['last']
+
+    if last is None:
+        df = history(instrument.ticker, period=MAX_PERIOD.get(interval, 'max'), interval=interval)
+    else:
+        df = history(instrument.ticker, start=last.date(), interval=interval)
+        df = df[df.index >= pd.Timestamp(last)]
+    if df.empty:
+        return 0
+    df = df.dropna(subset=['Open', 'High', 'Low', 'Close'])
+
+    bars = [
+        Bar(instrument=instrument, interval=interval, timestamp=timestamp.to_pydatetime(), open=row.Open,
+            high=row.High, low=row.Low, close=row.Close, volume=0 if pd.isna(row.Volume) else int(row.Volume))
+        for timestamp, row in zip(df.index, df.itertuples(index=False))
+    ]
+    with span('write', target='bars'), transaction.atomic():
+        Bar.objects.bulk_create(bars, batch_size=batch_size, update_conflicts=True,
+                                unique_fields=['instrument', 'interval', 'timestamp'],
+                                update_fields=['open', 'high', 'low', 'close', 'volume'])
+    return len(bars)
+
+
+# Function to read bars for a ticker from the database as an mplfinance-ready DataFrame
+@timed('query', target='bars')
+def bars_frame(ticker, interval='1d', after=None, end=None):
+    bars = Bar.objects.filter(instrument__ticker=ticker.upper(), interval=interval)
+    if after is not None:
+        bars = bars.filter(timestamp__gt=after)
+    if end is not None:
+        bars = bars.filter(timestamp__lte=end)
+    rows = bars.order_by('timestamp').values_list('timestamp', 'open', 'high', 'low', 'close', 'volume')
+    df = pd.DataFrame.from_records(list(rows), columns=['Date', 'Open', 'High', 'Low', 'Close', 'Volume'])
+    return df.set_index(pd.DatetimeIndex(df.pop('Date')))
+
+
+# Function to top up a ticker whose newest bar is stale (at most once per REFRESH_SECONDS). A failed
+# download leaves the stored bars in place.
+def refresh_bars(ticker, interval, last):
+    key = (ticker.upper(), interval)
+    with _refresh_lock:
+        if time.monotonic() - _refreshed.get(key, float('-inf')) < REFRESH_SECONDS:
+            return last
+        _refreshed[key] = time.monotonic()
+    try:
+        load_bars(ticker, interval)
+    except Exception as e:
+        print(f'Could not refresh {ticker} {interval} bars: {e}')
+        return last
+    return last_bar_time(ticker, interval)
+
+
+# Function to get a period of bars from the database. A ticker that has never been stored is loaded
+# first, and stored bars are topped up incrementally when the newest one is older than the last session.
+def get_history(ticker, period, interval='1d'):
+    last = last_bar_time(ticker, interval)
+    if last is None:
+        load_bars(ticker, interval)
+        last = last_bar_time(ticker, interval)
+    elif is_stale(last, interval):
+        last = refresh_bars(ticker, interval, last)
+    if last is None:
+        return bars_frame(ticker, interval)
+    return bars_frame(ticker, interval, period_start(period, last))
+
+
+# Function to run get_history in its own worker thread and close that thread's connection afterwards
+def _get_history_in_thread(ticker, period, interval):
+    try:
+        return get_history(ticker, period, interval)
+    finally:
+        connection.close()
+
+
+# Async version of get_history. Calls do not share Django's single sync thread, so several tickers
+# (including first-time downloads) are fetched at the same time.
+async def aget_history(ticker, period, interval='1d'):
+    return await sync_to_async(_get_history_in_thread, thread_sensitive=False)(ticker, period, interval)
@@ -14,4 +14,18 @@ class StockForm(forms.Form):
     ]
 
     ticker = forms.ChoiceField(choices=TICKER_CHOICES, label='Stock Ticker')
-    period = forms.ChoiceField(choices=PERIOD_CHOICES, label='Period')
\ No newline at end of file
+    period = forms.ChoiceField(choices=PERIOD_CHOICES, label='Period')
+
+class CompareForm(forms.Form):
+    tickers = forms.CharField(label='Tickers (comma separated)', initial='AAPL,GOOGL,MSFT,AMZN')
+    period = forms.ChoiceField(choices=StockForm.PERIOD_CHOICES, label='Period')
+
+    MAX_TICKERS = 10
+
+    def clean_tickers(self):
+        tickers = [t.strip().upper() for t in self.cleaned_data['tickers'].split(',') if t.strip()]
+        if not tickers:
+            raise forms.ValidationError('Enter at least one ticker')
+        if len(tickers) > self.MAX_TICKERS:
+            raise forms.ValidationError(f'At most {self.MAX_TICKERS} tickers')
+        return list(dict.fromkeys(tickers))
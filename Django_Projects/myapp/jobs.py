@@ -0,0 +1,144 @@
+import base64
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from instrumentation import count, span
+from . import rendering
+from .bars import get_history
+from .models import Job
+
+# Finished results are reused for identical requests for this long
+JOB_RESULT_TTL = timedelta(minutes=15)
+# A running job whose worker has been silent this long is assumed dead and retried
+JOB_TIMEOUT = timedelta(minutes=5)
+MAX_ATTEMPTS = 3
+
+
+# Job: candlestick chart for one ticker
+def chart_job(ticker, period):
+    df = get_history(ticker, period)
+    if df.empty:
+        raise ValueError(f'No price data for {ticker}')
+    png = rendering.render(rendering.draw_candlestick_chart, df[['Open', 'High', 'Low', 'Close', 'Volume']])
+    return {'png': base64.b64encode(png).decode('utf-8')}
+
+
+JOB_HANDLERS = {
+    'chart': chart_job,
+}
+
+
+# Function to hash a job's kind and parameters for deduplication
+def params_hash(kind, params):
+    return hashlib.sha256(json.dumps([kind, params], sort_keys=True).encode()).hexdigest()
+
+
+# Function to queue a job, or return the cached result / in-flight job for identical parameters
+def submit_job(kind, params):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'Unknown job kind {kind}')
+    digest = params_hash(kind, params)
+
+    for _ in range(3):
+        cached = (Job.objects.filter(params_hash=digest, status='done',
+                                     finished_at__gte=timezone.now() - JOB_RESULT_TTL)
+                  .order_by('-finished_at').first())
+        if cached is not None:
+            return cached
+        active = Job.objects.filter(params_hash=digest, status__in=Job.ACTIVE_STATUSES).first()
+        if active is not None:
+            return active
+        try:
+            with transaction.atomic():
+                return Job.objects.create(kind=kind, params=params, params_hash=digest)
+        except IntegrityError:
+            # Another request queued the same job in the meantime; look again and attach to it
+            continue
+    raise RuntimeError(f'Could not submit {kind} job')
+
+
+# Function to requeue jobs whose worker died, failing those that ran out of attempts
+def requeue_stale_jobs():
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', started_at__lt=now - JOB_TIMEOUT)
+    stale.filter(attempts__lt=MAX_ATTEMPTS).update(status='queued', worker='')
+    stale.filter(attempts__gte=MAX_ATTEMPTS).update(status='failed', error='Timed out', finished_at=now)
+
+
+# Function to claim the oldest queued job; the conditional update makes the claim safe across processes
+def claim_next_job(worker):
+    for job_id in Job.objects.filter(status='queued').order_by('created_at').values_list('id', flat=True)[:10]:
+        claimed = Job.objects.filter(pk=job_id, status='queued').update(
+            status='running', worker=worker, started_at=timezone.now(), attempts=F('attempts') + 1)
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+# Function to run a claimed job and store its result or error
+def run_job(job):
+    try:
+        with span('job', kind=job.kind):
+            result = JOB_HANDLERS[job.kind](**job.params)
+    except Exception as e:
+        Job.objects.filter(pk=job.pk).update(status='failed', error=str(e), finished_at=timezone.now())
+        count('jobs', kind=job.kind, status='failed')
+        return False
+    Job.objects.filter(pk=job.pk).update(status='done', result=result, error='', finished_at=timezone.now())
+    count('jobs', kind=job.kind, status='done')
+    return True
+
+
+# Function to delete finished jobs older than the given age
+def prune_jobs(max_age=timedelta(days=1)):
+    return Job.objects.filter(status__in=['done', 'failed'], finished_at__lt=timezone.now() - max_age).delete()[0]
+
+
+# Worker loop: claim and run jobs, sleeping while the queue is empty (returns when empty if once=True)
+def work(poll_interval=1.0, once=False, name=None):
+    name = name or f'{socket.gethostname()}:{os.getpid()}'
+    processed = 0
+    while True:
+        requeue_stale_jobs()
+        job = claim_next_job(name)
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+        started = time.perf_counter()
+        ok = run_job(job)
+        processed += 1
+        print(f"[{name}] {job.kind} #{job.pk} {'done' if ok else 'failed'} in {time.perf_counter() - started:.1f}s")
+
+
+_worker_thread = None
+_worker_lock = threading.Lock()
+
+
+# Worker loop of the in-process worker thread
+def _thread_worker():
+    try:
+        work(getattr(settings, 'JOB_POLL_INTERVAL', 1.0), name=f'{socket.gethostname()}:{os.getpid()}:thread')
+    finally:
+        connection.close()
+
+
+# Function to start a worker thread in this server process, unless JOB_WORKER is 'external' (jobs are then
+# left to `manage.py run_jobs`). Claims are safe across processes, so several servers can each run one.
+def ensure_worker():
+    global _worker_thread
+    if getattr(settings, 'JOB_WORKER', 'thread') != 'thread':
+        return
+    with _worker_lock:
+        if _worker_thread is None or not _worker_thread.is_alive():
+            _worker_thread = threading.Thread(target=_thread_worker, name='job-worker', daemon=True)
+            _worker_thread.start()
@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from myapp.bars import BATCH_SIZE, load_bars
+from myapp.models import Bar
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load OHLCV bars into the database, fetching only bars newer than the last stored one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tickers', nargs='+')
+        parser.add_argument('--interval', choices=[value for value, _ in Bar.INTERVAL_CHOICES], default='1d')
+        parser.add_argument('--full', action='store_true', help='reload the whole history instead of updating')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        failed = []
+        for ticker in options['tickers']:
+            started = time.perf_counter()
+            try:
+                count = load_bars(ticker, options['interval'], options['full'], options['batch_size'])
+            except Exception as e:
+                failed.append(ticker)
+                self.stderr.write(f'{ticker}: {e}')
+                continue
+            self.stdout.write(f"{ticker}: {count} {options['interval']} bars in {time.perf_counter() - started:.1f}s")
+
+        if failed:
+            raise CommandError(f"Failed to load {', '.join(failed)}")
@@ -0,0 +1,48 @@
+import multiprocessing as mp
+import os
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+
+
+# Entry point of a spawned worker process: set up Django, then run the worker loop
+def worker_main(settings_module, poll_interval, once):
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+    from myapp.jobs import work
+    work(poll_interval, once)
+
+
+class Command(BaseCommand):
+    help = "Run background workers for queued chart jobs (set JOB_WORKER = 'external' to use only these)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+        parser.add_argument('--prune-days', type=float, default=1.0, help='delete finished jobs older than this')
+
+    def handle(self, *args, **options):
+        from myapp.jobs import prune_jobs, work
+        pruned = prune_jobs(timedelta(days=options['prune_days']))
+        self.stdout.write(f'Pruned {pruned} finished jobs')
+
+        if options['workers'] <= 1:
+            work(options['poll_interval'], options['once'])
+            return
+
+        context = mp.get_context('spawn')
+        processes = [
+            context.Process(target=worker_main,
+                            args=(os.environ['DJANGO_SETTINGS_MODULE'], options['poll_interval'], options['once']))
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} workers")
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
@@ -1,3 +1,76 @@
 from django.db import models
 
 # Create your models here.
+
+
+class Instrument(models.Model):
+    ticker = models.CharField(max_length=16, unique=True)
+    name = models.CharField(max_length=128, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.ticker
+
+
+class Bar(models.Model):
+    INTERVAL_CHOICES = [
+        ('1m', '1 Minute'),
+        ('5m', '5 Minutes'),
+        ('15m', '15 Minutes'),
+        ('1h', '1 Hour'),
+        ('1d', '1 Day'),
+    ]
+
+    instrument = models.ForeignKey(Instrument, on_delete=models.CASCADE, related_name='bars')
+    interval = models.CharField(max_length=4, choices=INTERVAL_CHOICES, default='1d')
+    timestamp = models.DateTimeField()
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    volume = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the composite index behind every chart query: (instrument, interval, timestamp range)
+            models.UniqueConstraint(fields=['instrument', 'interval', 'timestamp'], name='unique_bar'),
+        ]
+
+    def __str__(self):
+        return f'{self.instrument} {self.interval} {self.timestamp:%Y-%m-%d %H:%M}'
+
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    ACTIVE_STATUSES = ('queued', 'running')
+
+    kind = models.CharField(max_length=32)
+    params = models.JSONField()
+    params_hash = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default='queued')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest queued job
+            models.Index(fields=['status', 'created_at'], name='job_queue_idx'),
+        ]
+        constraints = [
+            # At most one queued or running job per set of parameters; identical requests attach to it
+            models.UniqueConstraint(fields=['params_hash'], condition=models.Q(status__in=['queued', 'running']),
+                                    name='unique_active_job'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
@@ -0,0 +1,30 @@
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from render_pool import RenderBusy, RenderError, RenderTimeout, arender, figure_png, render
+
+# Charts are drawn on per-call Figure objects (never pyplot's global state) in the shared render pool
+# (render_pool.py at the repository root); this module only holds the Django app's drawing functions.
+
+
+# Function to draw closing prices of several tickers rebased to 100 (runs in a render worker)
+def draw_comparison_chart(closes, period):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    for ticker, close in closes.items():
+        ax.plot(close.index, close / close.iloc[0] * 100, label=ticker)
+    ax.set_title(f"Relative performance ({period})")
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Rebased to 100')
+    ax.grid(True)
+    ax.legend()
+    return figure_png(fig)
+
+
+# Function to draw the candlestick chart (runs in a render worker)
+def draw_candlestick_chart(df):
+    import mplfinance as mpf
+    fig = Figure()
+    ax = fig.add_subplot()
+    mpf.plot(df, type='candle', style='charles', ax=ax)
+    return figure_png(fig)
@@ -0,0 +1,210 @@
+import asyncio
+import json
+from collections import defaultdict, deque
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from instrumentation import span
+
+HEARTBEAT_SECONDS = 15
+
+
+# Function to turn one OHLCV row into a bar event
+def bar_event(ticker, timestamp, row):
+    return {'type': 'bar', 'ticker': ticker, 't': int(pd.Timestamp(timestamp).timestamp()),
+            'o': float(row['Open']), 'h': float(row['High']), 'l': float(row['Low']), 'c': float(row['Close']),
+            'v': 0 if pd.isna(row['Volume']) else int(row['Volume'])}
+
+
+# Live feed: one batched Yahoo download (through data_providers) for all tickers per poll. Each poll re-sends the newest bar
+# (it is still forming) and every bar after the last one sent. The first poll's bars (the day so far) are marked as
+# backfill: they seed the pattern windows but are not reported as new patterns.
+class YahooFeed:
+    def __init__(self, tickers, interval='1m', poll_seconds=60):
+        self.tickers = list(tickers)
+        self.interval = interval
+        self.poll_seconds = poll_seconds
+
+    async def events(self):
+        from data_providers import download
+        last_sent = {}
+        while True:
+            data = await asyncio.to_thread(download, self.tickers, period='1d', interval=self.interval,
+                                           group_by='ticker', progress=False)
+            for ticker in self.tickers:
+                # A list of tickers always gives (ticker, field) columns with group_by='ticker', even for one
+                frame = data[ticker].dropna(subset=['Close'])
+                backfill = ticker not in last_sent
+                if not backfill:
+                    frame = frame[frame.index >= last_sent[ticker]]
+                for timestamp, row in frame.iterrows():
+                    event = bar_event(ticker, timestamp, row)
+                    if backfill:
+                        event['backfill'] = True
+                    yield event
+                if len(frame):
+                    last_sent[ticker] = frame.index[-1]
+            await asyncio.sleep(self.poll_seconds)
+
+
+# Replay feed: recorded bars (CSV with ticker, timestamp and OHLCV columns, or a DataFrame) in time order,
+# one every `interval` seconds. Used for demos and tests without the network.
+class ReplayFeed:
+    def __init__(self, source, interval=1.0, loop=False):
+        self.source = source
+        self.interval = interval
+        self.loop = loop
+
+    def _frame(self):
+        frame = pd.read_csv(self.source, parse_dates=['timestamp']) if isinstance(self.source, str) else self.source
+        frame = frame.rename(columns=str.lower).sort_values('timestamp')
+        return frame.rename(columns={'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close',
+                                     'volume': 'Volume'})
+
+    async def events(self):
+        frame = await asyncio.to_thread(self._frame)
+        while True:
+            for row in frame.to_dict('records'):
+                yield bar_event(row['ticker'], row['timestamp'], row)
+                await asyncio.sleep(self.interval)
+            if not self.loop:
+                return
+
+
+# Function to build the feed configured in settings (STREAM_FEED: 'yahoo' or the path of a recorded CSV)
+def configured_feed():
+    source = getattr(settings, 'STREAM_FEED', 'yahoo')
+    if source == 'yahoo':
+        return YahooFeed(getattr(settings, 'STREAM_TICKERS', ['AAPL', 'GOOGL', 'MSFT', 'AMZN']),
+                         poll_seconds=getattr(settings, 'STREAM_POLL_SECONDS', 60))
+    return ReplayFeed(source, interval=getattr(settings, 'STREAM_REPLAY_INTERVAL', 1.0), loop=True)
+
+
+# Function to get TA-Lib's candlestick pattern functions (empty when TA-Lib is not installed)
+def pattern_functions():
+    try:
+        import talib
+    except ImportError:
+        return {}
+    return {name: getattr(talib, name) for name in talib.get_function_groups()['Pattern Recognition']}
+
+
+# Function to find the candlestick patterns completed by the newest bar of a window
+def detect_patterns(bars, functions):
+    if len(bars) < 5 or not functions:
+        return []
+    o, h, l, c = (np.array([bar[k] for bar in bars], dtype=np.float64) for k in 'ohlc')
+    last = bars[-1]
+    events = []
+    for name, function in functions.items():
+        signal = int(function(o, h, l, c)[-1])
+        if signal:
+            events.append({'type': 'pattern', 'ticker': last['ticker'], 't': last['t'], 'pattern': name,
+                           'signal': signal})
+    return events
+
+
+# Hub that runs one feed and fans its events out to every connected client. The feed starts with
+# the first subscriber and stops with the last, so viewers never trigger downloads of their own.
+class Broadcaster:
+    def __init__(self, feed_factory=configured_feed, queue_size=256, window=30):
+        self.feed_factory = feed_factory
+        self.queue_size = queue_size
+        self.window = window
+        self.subscribers = set()
+        self.latest = {}
+        self._windows = defaultdict(lambda: deque(maxlen=self.window))
+        self._sent_patterns = {}
+        self._patterns = None
+        self._task = None
+
+    # Function to register a client; it gets the latest bar of every ticker first (as many as fit in its queue)
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        for event in list(self.latest.values())[-self.queue_size:]:
+            queue.put_nowait(event)
+        self.subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # Function to send an event to every client; a client that falls behind loses its oldest events
+    def publish(self, event):
+        for queue in list(self.subscribers):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    # Function to record a bar and publish it with any newly completed patterns. Pattern detection (some 60
+    # TA-Lib functions) runs in a worker thread so it never blocks the event loop; backfill bars only seed
+    # the window.
+    async def handle_bar(self, bar):
+        backfill = bar.pop('backfill', False)
+        self.latest[bar['ticker']] = bar
+        window = self._windows[bar['ticker']]
+        if window and window[-1]['t'] == bar['t']:
+            window[-1] = bar
+        else:
+            window.append(bar)
+        self.publish(bar)
+        if backfill:
+            return
+
+        if self._patterns is None:
+            self._patterns = await asyncio.to_thread(pattern_functions)
+        with span('pattern', source='stream'):
+            events = await asyncio.to_thread(detect_patterns, list(window), self._patterns)
+        for event in events:
+            # A forming bar is re-sent on every poll; announce each pattern once per bar
+            key = (event['ticker'], event['t'], event['pattern'])
+            if key not in self._sent_patterns:
+                self._sent_patterns[key] = True
+                self.publish(event)
+        if len(self._sent_patterns) > 10000:
+            self._sent_patterns.clear()
+
+    # Feed loop: restart the feed after an upstream error; a finished (non-looping) replay ends it
+    async def _run(self, retry_seconds=30):
+        while True:
+            try:
+                async for bar in self.feed_factory().events():
+                    await self.handle_bar(bar)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.publish({'type': 'error', 'message': str(e)})
+                await asyncio.sleep(retry_seconds)
+
+
+hub = Broadcaster()
+
+
+# Function to format an event in the server-sent events wire format
+def sse_message(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+# Async generator of SSE messages for one client, optionally filtered to some tickers
+async def event_stream(tickers=None, broadcaster=hub):
+    queue = broadcaster.subscribe()
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': heartbeat\n\n'
+                continue
+            if tickers and event.get('ticker') not in tickers and event['type'] != 'error':
+                continue
+            yield sse_message(event)
+    finally:
+        broadcaster.unsubscribe(queue)
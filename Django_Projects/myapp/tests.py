@@ -1,3 +1,262 @@
-from django.test import TestCase
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
 
-# Create your tests here.
+import data_providers
+from data_providers import ReplayProvider, save_bars
+from .bars import MARKET_TZ, get_history, is_stale, last_session_date, load_bars, period_start
+from .jobs import JOB_RESULT_TTL, claim_next_job, submit_job
+from .models import Bar, Job
+from .streaming import Broadcaster, ReplayFeed, YahooFeed
+
+
+# Recorded bars for the replay feed: `count` one-minute bars per ticker, deliberately out of time order
+def recorded_bars(tickers=('AAA', 'BBB'), count=6):
+    start = pd.Timestamp('2024-01-02 14:30', tz='UTC')
+    rows = [{'ticker': ticker, 'timestamp': start + pd.Timedelta(minutes=i), 'open': 10.0 + i, 'high': 11.0 + i,
+             'low': 9.0 + i, 'close': 10.5 + i, 'volume': 1000 + i}
+            for ticker in tickers for i in range(count)]
+    return pd.DataFrame(rows[::-1])
+
+
+# Function to serve data_providers calls from recordings in a scratch folder for the rest of a test
+def use_replay(test):
+    folder = tempfile.TemporaryDirectory()
+    test.addCleanup(folder.cleanup)
+    test.addCleanup(data_providers.set_provider, data_providers._provider)
+    data_providers.set_provider(ReplayProvider(folder.name))
+    return folder.name
+
+
+# Function to make a New York local time
+def market_time(*args):
+    return datetime(*args, tzinfo=MARKET_TZ)
+
+
+# Function to build daily OHLCV bars at midnight New York time, like Yahoo's history
+def daily_bars(closes, first='2024-01-02'):
+    index = pd.bdate_range(first, periods=len(closes), tz='America/New_York')
+    closes = np.asarray(closes, dtype=float)
+    return pd.DataFrame({'Open': closes, 'High': closes + 1, 'Low': closes - 1, 'Close': closes, 'Volume': 100},
+                        index=index)
+
+
+# Pattern function that fires on every bar, so the tests do not need TA-Lib
+def always(o, h, l, c):
+    return np.full(len(c), 100)
+
+
+# Feed that yields prepared events (some marked as backfill) and then ends
+class ListFeed:
+    def __init__(self, events):
+        self._events = events
+
+    async def events(self):
+        for event in self._events:
+            yield dict(event)
+
+
+class ReplayFeedTests(SimpleTestCase):
+    def test_replays_bars_in_time_order(self):
+        async def collect():
+            return [event async for event in ReplayFeed(recorded_bars(), interval=0).events()]
+
+        events = asyncio.run(collect())
+        self.assertEqual(len(events), 12)
+        self.assertEqual([e['t'] for e in events], sorted(e['t'] for e in events))
+        self.assertEqual({e['type'] for e in events}, {'bar'})
+        self.assertEqual(events[0]['o'], 10.0)
+
+
+class BroadcasterTests(SimpleTestCase):
+    def test_replay_feed_reaches_subscribers(self):
+        async def run():
+            hub = Broadcaster(feed_factory=lambda: ReplayFeed(recorded_bars(), interval=0))
+            hub._patterns = {}
+            queue = hub.subscribe()
+            await hub._task
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+
+        events = asyncio.run(run())
+        self.assertEqual(len(events), 12)
+        self.assertEqual({e['ticker'] for e in events}, {'AAA', 'BBB'})
+
+    def test_backfill_seeds_windows_without_pattern_events(self):
+        # Five bars from the first poll, then one live bar
+        feed_events = [{'type': 'bar', 'ticker': 'AAA', 't': 60 * i, 'o': 10.0 + i, 'h': 11.0 + i, 'l': 9.0 + i,
+                        'c': 10.5 + i, 'v': 1000, **({'backfill': True} if i < 5 else {})} for i in range(6)]
+
+        async def run():
+            hub = Broadcaster(feed_factory=lambda: ListFeed(feed_events))
+            hub._patterns = {'ALWAYS': always}
+            queue = hub.subscribe()
+            await hub._task
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+
+        events = asyncio.run(run())
+        patterns = [e for e in events if e['type'] == 'pattern']
+        self.assertEqual(len([e for e in events if e['type'] == 'bar']), 6)
+        self.assertEqual(len(patterns), 1)
+        self.assertEqual(patterns[0]['t'], feed_events[-1]['t'])
+        self.assertTrue(all('backfill' not in e for e in events))
+
+    def test_subscribe_caps_initial_replay_at_queue_size(self):
+        async def run():
+            hub = Broadcaster(feed_factory=lambda: ListFeed([]), queue_size=3)
+            for i in range(10):
+                hub.latest[f'T{i}'] = {'type': 'bar', 'ticker': f'T{i}', 't': i}
+            queue = hub.subscribe()
+            hub.unsubscribe(queue)
+            return [queue.get_nowait()['ticker'] for _ in range(queue.qsize())]
+
+        self.assertEqual(asyncio.run(run()), ['T7', 'T8', 'T9'])
+
+
+class YahooFeedTests(SimpleTestCase):
+    def test_one_ticker_first_poll_is_backfill(self):
+        recordings = use_replay(self)
+        index = pd.date_range('2024-01-02 14:30', periods=5, freq='1min', tz='UTC')
+        close = np.arange(5, dtype=float) + 10
+        save_bars(pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 100},
+                               index=index), 'AAA', recordings, interval='1m')
+
+        async def first_poll():
+            events = []
+            async for event in YahooFeed(['AAA'], poll_seconds=0).events():
+                events.append(event)
+                if len(events) == 5:
+                    return events
+
+        events = asyncio.run(first_poll())
+        self.assertEqual([e['c'] for e in events], list(close))
+        self.assertTrue(all(e['ticker'] == 'AAA' and e['backfill'] for e in events))
+
+
+class LiveStreamTests(SimpleTestCase):
+    def test_stream_needs_asgi(self):
+        response = self.client.get('/stocks/live/stream/')
+        self.assertEqual(response.status_code, 501)
+        self.assertIn(b'ASGI', response.content)
+
+    def test_page_explains_missing_asgi(self):
+        response = self.client.get('/stocks/live/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'EventSource(')
+
+
+class SubmitJobTests(TestCase):
+    params = {'ticker': 'AAPL', 'period': '1mo'}
+
+    def test_identical_submits_share_one_job(self):
+        first = submit_job('chart', self.params)
+        second = submit_job('chart', dict(reversed(list(self.params.items()))))
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_running_job_is_shared(self):
+        job = submit_job('chart', self.params)
+        claim_next_job('worker-a')
+        self.assertEqual(submit_job('chart', self.params).pk, job.pk)
+
+    def test_active_duplicates_are_rejected_by_the_database(self):
+        job = submit_job('chart', self.params)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.create(kind='chart', params=self.params, params_hash=job.params_hash)
+
+    def test_recent_result_is_reused(self):
+        job = submit_job('chart', self.params)
+        Job.objects.filter(pk=job.pk).update(status='done', result={'png': ''}, finished_at=timezone.now())
+        self.assertEqual(submit_job('chart', self.params).pk, job.pk)
+
+    def test_finished_job_allows_a_new_submit(self):
+        failed = submit_job('chart', self.params)
+        Job.objects.filter(pk=failed.pk).update(status='failed', error='boom', finished_at=timezone.now())
+        retry = submit_job('chart', self.params)
+        self.assertNotEqual(retry.pk, failed.pk)
+        self.assertEqual(retry.status, 'queued')
+
+        Job.objects.filter(pk=retry.pk).update(status='done', result={'png': ''},
+                                               finished_at=timezone.now() - JOB_RESULT_TTL - timedelta(minutes=1))
+        fresh = submit_job('chart', self.params)
+        self.assertNotIn(fresh.pk, (failed.pk, retry.pk))
+
+    def test_unknown_kind_is_rejected(self):
+        with self.assertRaises(ValueError):
+            submit_job('nope', {})
+
+
+class ClaimJobTests(TestCase):
+    def test_claims_never_share_a_job(self):
+        jobs = [submit_job('chart', {'ticker': ticker, 'period': '1mo'}) for ticker in ('AAA', 'BBB')]
+        first = claim_next_job('worker-a')
+        second = claim_next_job('worker-b')
+        self.assertEqual([first.pk, second.pk], [job.pk for job in jobs])
+        self.assertIsNone(claim_next_job('worker-c'))
+        self.assertEqual(Job.objects.get(pk=first.pk).worker, 'worker-a')
+        self.assertEqual(Job.objects.get(pk=second.pk).attempts, 1)
+
+    def test_claim_leaves_a_running_job_alone(self):
+        job = submit_job('chart', {'ticker': 'AAA', 'period': '1mo'})
+        # Another worker's conditional update won the row
+        Job.objects.filter(pk=job.pk, status='queued').update(status='running', worker='worker-a')
+        self.assertIsNone(claim_next_job('worker-b'))
+        self.assertEqual(Job.objects.get(pk=job.pk).worker, 'worker-a')
+
+
+class BarDateTests(SimpleTestCase):
+    def test_period_counts_back_from_the_newest_bar(self):
+        last = market_time(2024, 3, 15, 16)
+        self.assertEqual(period_start('5d', last), last - timedelta(days=5))
+        self.assertEqual(period_start('1y', last), last - timedelta(days=366))
+        self.assertEqual(period_start('ytd', last), market_time(2024, 1, 1) - timedelta(microseconds=1))
+        self.assertIsNone(period_start('max', last))
+
+    def test_last_session_skips_weekends(self):
+        self.assertEqual(last_session_date(market_time(2024, 1, 6, 12)).isoformat(), '2024-01-05')
+        self.assertEqual(last_session_date(market_time(2024, 1, 8, 9)).isoformat(), '2024-01-05')
+        self.assertEqual(last_session_date(market_time(2024, 1, 8, 10)).isoformat(), '2024-01-08')
+
+    def test_daily_bars_are_fresh_over_the_weekend(self):
+        friday = market_time(2024, 1, 5)
+        self.assertFalse(is_stale(friday, '1d', market_time(2024, 1, 6, 12)))
+        self.assertFalse(is_stale(friday, '1d', market_time(2024, 1, 8, 9)))
+        self.assertTrue(is_stale(friday, '1d', market_time(2024, 1, 8, 10)))
+        self.assertTrue(is_stale(market_time(2024, 1, 4), '1d', market_time(2024, 1, 6, 12)))
+
+    def test_intraday_bars_lag_at_most_one_bar_while_open(self):
+        now = market_time(2024, 1, 9, 11)
+        self.assertFalse(is_stale(market_time(2024, 1, 9, 10, 57), '5m', now))
+        self.assertTrue(is_stale(market_time(2024, 1, 9, 10, 50), '5m', now))
+        self.assertTrue(is_stale(market_time(2024, 1, 9, 10, 58), '1m', now))
+        # After the close and over the weekend the last bar of the session is the newest there is
+        self.assertFalse(is_stale(market_time(2024, 1, 9, 15, 55), '5m', market_time(2024, 1, 9, 17)))
+        self.assertFalse(is_stale(market_time(2024, 1, 5, 15, 59), '1m', market_time(2024, 1, 6, 12)))
+
+
+class LoadBarsTests(TestCase):
+    def test_reload_updates_bars_instead_of_duplicating_them(self):
+        recordings = use_replay(self)
+        save_bars(daily_bars([10, 11, 12]), 'AAA', recordings)
+        self.assertEqual(load_bars('AAA'), 3)
+
+        # The last bar was partial; the next load rewrites it and appends the new one
+        save_bars(daily_bars([10, 11, 12.5, 13]), 'AAA', recordings)
+        data_providers.set_provider(ReplayProvider(recordings))
+        self.assertEqual(load_bars('AAA'), 2)
+        bars = Bar.objects.filter(instrument__ticker='AAA').order_by('timestamp')
+        self.assertEqual([bar.close for bar in bars], [10, 11, 12.5, 13])
+
+        self.assertEqual(load_bars('AAA', full=True), 4)
+        self.assertEqual(Bar.objects.count(), 4)
+
+    def test_get_history_loads_a_new_ticker_and_slices_from_the_last_bar(self):
+        recordings = use_replay(self)
+        save_bars(daily_bars(range(10, 30)), 'AAA', recordings)
+        df = get_history('aaa', '5d')
+        # Counted back from the newest bar, not from today: the last five calendar days hold three sessions
+        self.assertEqual(list(df['Close']), [27, 28, 29])
@@ -2,41 +2,137 @@ from django.shortcuts import render
 
 # Create your views here.
 
-from django.shortcuts import render
-from django.http import HttpResponse
-import yfinance as yf
-import mplfinance as mpf
-import io
+from django.shortcuts import get_object_or_404, render
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+import asyncio
 import base64
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-import matplotlib.pyplot as plt
-from .forms import StockForm
+from .forms import CompareForm, StockForm
+from . import rendering
+from .bars import aget_history
+from .jobs import ensure_worker, submit_job
+from .models import Job
+from .streaming import event_stream
+from instrumentation import prometheus_text
+from ohlcv_api import build_response
+
+ASGI_REQUIRED = 'The live stream needs an ASGI server: uvicorn Django_Projects.asgi:application'
+VALID_PERIODS = ('1d', '5d', '1wk', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max')
 
-def stock_chart(request):
+# Async view: the chart is built by a background job (the in-process worker thread, or `manage.py run_jobs`
+# with JOB_WORKER = 'external'); identical requests share one job and recent results are reused, so the
+# request itself only queues work and returns
+async def stock_chart(request):
     chart = None
+    error = None
+    job = None
     if request.method == 'POST':
         form = StockForm(request.POST)
         if form.is_valid():
             ticker = form.cleaned_data['ticker']
             period = form.cleaned_data['period']
-            
-            # Fetch stock data
-            stock = yf.Ticker(ticker)
-            df = stock.history(period=period)
-
-            # Create a candlestick chart
-            fig, ax = plt.subplots()
-            mpf.plot(df, type='candle', style='charles', ax=ax)
-            
-            # Convert plot to image
-            buf = io.BytesIO()
-            canvas = FigureCanvas(fig)
-            canvas.print_png(buf)
-            plt.close(fig)
-
-            # Encode image to base64 string
-            chart = base64.b64encode(buf.getvalue()).decode('utf-8')
+            ensure_worker()
+            job = await sync_to_async(submit_job)('chart', {'ticker': ticker, 'period': period})
+            if job.status == 'done':
+                chart = job.result['png']
+            elif job.status == 'failed':
+                error = f'Could not build the chart: {job.error}'
     else:
         form = StockForm()
 
-    return render(request, 'stocks/stock_chart.html', {'form': form, 'chart': chart})
\ No newline at end of file
+    return render(request, 'stocks/stock_chart.html', {'form': form, 'chart': chart, 'error': error, 'job': job})
+
+
+# Status of a background job for the page to poll; the result is included once the job is done
+def job_status(request, job_id):
+    job = get_object_or_404(Job, pk=job_id)
+    payload = {'id': job.pk, 'kind': job.kind, 'status': job.status, 'error': job.error}
+    if job.status == 'done':
+        payload['result'] = job.result
+    elif job.status == 'queued':
+        payload['position'] = Job.objects.filter(status='queued', created_at__lt=job.created_at).count() + 1
+        payload['queued_seconds'] = (timezone.now() - job.created_at).total_seconds()
+    return JsonResponse(payload)
+
+
+# Columnar OHLCV data for client-side charts:
+# /stocks/api/ohlcv/<ticker>/?period=1y&start=&end=&limit=&indicators=sma20,rsi14&format=json|bin
+async def ohlcv_api(request, ticker):
+    ticker = ticker.upper()
+    period = request.GET.get('period', '1y')
+    if period not in VALID_PERIODS:
+        return JsonResponse({'error': f'Unknown period {period}'}, status=400)
+
+    df = await aget_history(ticker, period)
+    try:
+        body, headers = build_response(df, ticker, period, request.GET, request.headers.get('Accept-Encoding'),
+                                       request.headers.get('Accept'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = HttpResponse(body, content_type=headers.pop('Content-Type'))
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+# Page that fetches the binary OHLCV data and draws the chart in the browser
+def stock_chart_client(request):
+    return render(request, 'stock_chart_client.html',
+                  {'periods': VALID_PERIODS, 'api_url': '/stocks/api/ohlcv/{ticker}/'})
+
+
+# Multi-ticker comparison: all tickers are fetched concurrently, then drawn in one chart
+async def compare(request):
+    chart = None
+    errors = []
+    form = CompareForm(request.GET or None)
+    if form.is_valid():
+        tickers = form.cleaned_data['tickers']
+        period = form.cleaned_data['period']
+        results = await asyncio.gather(*(aget_history(t, period) for t in tickers), return_exceptions=True)
+
+        closes = {}
+        for ticker, result in zip(tickers, results):
+            if isinstance(result, Exception):
+                errors.append(f'{ticker}: {result}')
+            elif result.empty:
+                errors.append(f'{ticker}: no price data')
+            else:
+                closes[ticker] = result['Close']
+
+        if closes:
+            try:
+                png = await rendering.arender(rendering.draw_comparison_chart, closes, period)
+            except rendering.RenderError as e:
+                errors.append(f'Could not render the chart: {e}')
+            else:
+                chart = base64.b64encode(png).decode('utf-8')
+
+    return render(request, 'stocks/compare.html', {'form': form, 'chart': chart, 'errors': errors})
+
+
+# Server-sent events: live bars and newly detected patterns from the shared feed (?tickers=AAPL,MSFT).
+# Needs an ASGI server: under WSGI Django reads an async stream into memory before sending it, so this endless
+# one would never send a byte and would hold a worker thread forever.
+async def live_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(ASGI_REQUIRED + '\n', status=501, content_type='text/plain')
+    tickers = {t.strip().upper() for t in request.GET.get('tickers', '').split(',') if t.strip()}
+    response = StreamingHttpResponse(event_stream(tickers or None), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Dashboard that updates from the live stream instead of reloading
+def live(request):
+    return render(request, 'stocks/live.html',
+                  {'asgi': isinstance(request, ASGIRequest), 'asgi_required': ASGI_REQUIRED})
+
+
+# Stage timings and counters in the Prometheus text format (empty unless METRICS is set)
+def metrics(request):
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4')
@@ -1,12 +1,69 @@
 # app.py
 
-from flask import Flask, render_template, request
-import yfinance as yf
-import matplotlib.pyplot as plt
-import io
-import base64
+from flask import Flask, Response, abort, jsonify, render_template, request
+from jinja2 import ChoiceLoader, FileSystemLoader
+import hashlib
+import os
+from datetime import datetime, timezone
+
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from chart_cache import LRUCache
+from rendering import RenderError, RenderTimeout, draw_line_chart, render
+from data_providers import history
+from ohlcv_api import build_response
+from instrumentation import count, prometheus_text
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
+# Templates shared with the Django app (the browser-drawn chart page) live in templates/ at the repository root
+app.jinja_loader = ChoiceLoader([app.jinja_loader, FileSystemLoader(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'templates'))])
+
+VALID_PERIODS = ('1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max')
+
+# Fetched frames are reused for FRAME_TTL seconds; rendered charts are keyed by the bars they show
+# (including the last bar's prices, which change all day), so a chart is only redrawn when its data changes
+FRAME_TTL = 60
+frame_cache = LRUCache(maxsize=64, ttl=FRAME_TTL)
+chart_cache = LRUCache(maxsize=256)
+
+
+# Function to fetch price history, reusing a recent download of the same ticker and period
+def get_history(ticker, period):
+    key = (ticker, period)
+    df = frame_cache.get(key)
+    count('frame_cache', result='hit' if df is not None else 'miss')
+    if df is None:
+        df = history(ticker, period=period)
+        frame_cache.put(key, df)
+    return df
+
+
+# Function to draw the price chart as PNG bytes in the render pool (only the Close column is sent over)
+def render_chart(df, ticker, period):
+    return render(draw_line_chart, df[['Close']], ticker, period)
+
+
+# Function to get the rendered chart with its validators (None if there is no data)
+def get_chart(ticker, period):
+    df = get_history(ticker, period)
+    if df.empty:
+        return None
+    last = df.iloc[-1]
+    key = (ticker, period, len(df), df.index[0].isoformat(), df.index[-1].isoformat(),
+           tuple(float(last[c]) for c in ('Open', 'High', 'Low', 'Close', 'Volume')))
+    chart = chart_cache.get(key)
+    count('chart_cache', result='hit' if chart is not None else 'miss')
+    if chart is None:
+        png = render_chart(df, ticker, period)
+        # Validators come from the content: the ETag hashes the PNG and Last-Modified is when it was drawn
+        chart = {
+            'png': png,
+            'etag': hashlib.sha1(png).hexdigest(),
+            'last_modified': datetime.now(timezone.utc).replace(microsecond=0),
+        }
+        chart_cache.put(key, chart)
+    return chart
+
 
 @app.route('/', methods=['GET', 'POST'])
 def stock_chart():
@@ -15,31 +72,70 @@ def stock_chart():
     period = None
 
     if request.method == 'POST':
-        ticker = request.form['ticker']
+        ticker = request.form['ticker'].strip().upper()
         period = request.form['period']
 
-        # Fetch stock data
-        stock = yf.Ticker(ticker)
-        df = stock.history(period=period)
-
-        # Create a simple plot (you can modify this based on your actual plot requirements)
-        plt.figure(figsize=(10, 6))
-        plt.plot(df.index, df['Close'], marker='o', linestyle='-')
-        plt.title(f'Stock Chart for {ticker} ({period})')
-        plt.xlabel('Date')
-        plt.ylabel('Price')
-        plt.grid(True)
-        
-        # Save plot to a bytes buffer
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close()
-
-        # Encode image to base64 string
-        buf.seek(0)
-        chart = base64.b64encode(buf.getvalue()).decode('utf-8')
+        # Fetch (or reuse) the data now; the chart itself is rendered when the <img> is requested
+        chart = period in VALID_PERIODS and not get_history(ticker, period).empty
 
     return render_template('stock_chart.html', chart=chart, ticker=ticker, period=period)
 
+
+# Chart image with ETag/Last-Modified; a matching If-None-Match or If-Modified-Since gets a 304
+@app.route('/chart/<ticker>/<period>.png')
+def chart_png(ticker, period):
+    if period not in VALID_PERIODS:
+        abort(404)
+    try:
+        chart = get_chart(ticker.upper(), period)
+    except RenderTimeout:
+        abort(504)
+    except RenderError:
+        abort(503)
+    if chart is None:
+        abort(404)
+
+    response = Response(chart['png'], mimetype='image/png')
+    response.set_etag(chart['etag'])
+    response.last_modified = chart['last_modified']
+    response.cache_control.public = True
+    response.cache_control.max_age = FRAME_TTL
+    return response.make_conditional(request)
+
+
+# Columnar OHLCV data for client-side charts:
+# /api/ohlcv/<ticker>?period=1y&start=&end=&limit=&indicators=sma20,rsi14&format=json|bin
+@app.route('/api/ohlcv/<ticker>')
+def ohlcv(ticker):
+    ticker = ticker.upper()
+    period = request.args.get('period', '1y')
+    if period not in VALID_PERIODS:
+        return jsonify({'error': f'Unknown period {period}'}), 400
+    try:
+        body, headers = build_response(get_history(ticker, period), ticker, period, request.args,
+                                       request.headers.get('Accept-Encoding'), request.headers.get('Accept'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(body, headers=headers)
+
+
+# Page that fetches the binary OHLCV data and draws the chart in the browser
+@app.route('/client')
+def stock_chart_client():
+    return render_template('stock_chart_client.html', periods=VALID_PERIODS,
+                           api_url=request.script_root + '/api/ohlcv/{ticker}')
+
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify({'frames': frame_cache.stats(), 'charts': chart_cache.stats()})
+
+
+# Stage timings and counters in the Prometheus text format (empty unless METRICS is set)
+@app.route('/metrics')
+def metrics():
+    return Response(prometheus_text(), mimetype='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,19 @@
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from render_pool import RenderBusy, RenderError, RenderTimeout, figure_png, render
+
+# Charts are drawn on per-call Figure objects (never pyplot's global state) in the shared render pool
+# (render_pool.py at the repository root); this module only holds the Flask app's drawing functions.
+
+
+# Function to draw the closing-price line chart (runs in a render worker)
+def draw_line_chart(df, ticker, period):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    ax.plot(df.index, df['Close'], marker='o', linestyle='-')
+    ax.set_title(f'Stock Chart for {ticker} ({period})')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Price')
+    ax.grid(True)
+    return figure_png(fig)
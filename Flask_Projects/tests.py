@@ -0,0 +1,128 @@
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+import app as server
+import data_providers
+from chart_cache import LRUCache
+from data_providers import ReplayProvider, save_bars
+from ohlcv_api import decode_binary
+
+# Offline tests: run with `python tests.py` from this folder. Prices come from the replay provider.
+
+
+# Function to build daily OHLCV bars at midnight New York time, ending with the given closes
+def daily_bars(closes, first='2024-01-02'):
+    index = pd.bdate_range(first, periods=len(closes), tz='America/New_York')
+    closes = np.asarray(closes, dtype=float)
+    return pd.DataFrame({'Open': closes, 'High': closes + 1, 'Low': closes - 1, 'Close': closes, 'Volume': 100},
+                        index=index)
+
+
+class LRUCacheTests(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_put_refreshes_recency(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.put('a', 10)
+        cache.put('c', 3)
+        self.assertEqual(cache.get('a'), 10)
+        self.assertIsNone(cache.get('b'))
+
+    def test_entries_expire_after_ttl(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        with mock.patch('chart_cache.time.monotonic', return_value=1000.0):
+            cache.put('a', 1)
+        with mock.patch('chart_cache.time.monotonic', return_value=1060.0):
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch('chart_cache.time.monotonic', return_value=1060.5):
+            self.assertIsNone(cache.get('a'))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['expirations'], stats['size']), (1, 1, 1, 0))
+
+
+# Test case for requests on replayed bars of AAA, with empty caches
+class ReplayTestCase(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.recordings = folder.name
+        self.addCleanup(data_providers.set_provider, data_providers._provider)
+        self.record([10, 11, 12])
+        for cache in (server.frame_cache, server.chart_cache):
+            cache.clear()
+            self.addCleanup(cache.clear)
+        self.client = server.app.test_client()
+
+    # Function to replace the recorded bars of AAA (a new provider, so nothing read before is reused)
+    def record(self, closes):
+        save_bars(daily_bars(closes), 'AAA', self.recordings)
+        data_providers.set_provider(ReplayProvider(self.recordings))
+
+
+# Chart requests. Rendering is replaced by the closes' bytes, so each test checks the HTTP caching without
+# starting render processes.
+class ChartCachingTests(ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(server, 'render_chart',
+                                    side_effect=lambda df, ticker, period: df['Close'].to_numpy().tobytes())
+        self.render = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeat_request_with_etag_gets_304(self):
+        first = self.client.get('/chart/aaa/1mo.png')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.mimetype, 'image/png')
+        etag = first.headers['ETag']
+
+        again = self.client.get('/chart/AAA/1mo.png', headers={'If-None-Match': etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.data, b'')
+        self.assertEqual(self.render.call_count, 1)
+
+    def test_changed_last_bar_changes_the_chart(self):
+        etag = self.client.get('/chart/AAA/1mo.png').headers['ETag']
+
+        # Same dates and length, only the last bar's prices move (as they do during the session)
+        self.record([10, 11, 12.5])
+        server.frame_cache.clear()
+        changed = self.client.get('/chart/AAA/1mo.png', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+        self.assertEqual(self.render.call_count, 2)
+        self.assertEqual(server.chart_cache.stats()['size'], 2)
+
+    def test_unknown_period_is_404(self):
+        self.assertEqual(self.client.get('/chart/AAA/7y.png').status_code, 404)
+
+
+class OhlcvApiTests(ReplayTestCase):
+    def test_binary_by_accept_header(self):
+        response = self.client.get('/api/ohlcv/aaa?period=1mo', headers={'Accept': 'application/octet-stream'})
+        self.assertEqual(response.status_code, 200)
+        meta, columns = decode_binary(response.data)
+        self.assertEqual((meta['ticker'], meta['rows']), ('AAA', 3))
+        self.assertEqual(list(columns['c']), [10, 11, 12])
+
+    def test_negative_limit_is_rejected(self):
+        response = self.client.get('/api/ohlcv/AAA?period=1mo&limit=-1')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('limit', response.get_json()['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
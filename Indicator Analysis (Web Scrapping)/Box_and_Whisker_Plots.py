@@ -1,12 +1,13 @@
-import yfinance as yf
 import matplotlib.pyplot as plt
 import pandas as pd
 
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from data_providers import history
+
 def get_stock_data(tickers, period):
     data = {}
     for ticker in tickers:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period=period)
+        hist = history(ticker, period=period)
         data[ticker] = hist['Close']
     return data
 
@@ -1,7 +1,6 @@
 import pandas as pd
 from bs4 import BeautifulSoup
 import matplotlib.pyplot as plt
-from urllib.request import urlopen, Request
 from urllib.error import HTTPError
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 import nltk
@@ -9,6 +8,9 @@ import time
 import random
 from datetime import datetime, timedelta
 
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from data_providers import fetch, pause
+
 # Download the VADER lexicon
 nltk.download('vader_lexicon')
 
@@ -39,15 +41,14 @@ news_tables = {}
 for ticker in tickers:
     url = finwiz_url + ticker
     user_agent = random.choice(user_agents)
-    req = Request(url=url, headers={'user-agent': user_agent})
     try:
-        resp = urlopen(req)
+        resp = fetch(url, headers={'user-agent': user_agent})
         html = BeautifulSoup(resp, features="lxml")
         news_table = html.find(id='news-table')
         news_tables[ticker] = news_table
     except HTTPError as e:
         print(f"HTTPError for {ticker}: {e}")
-    time.sleep(random.uniform(1, 3))  # Add delay
+    pause(random.uniform(1, 3))  # Add delay (skipped when replaying)
 
 # Print Recent News Headlines
 try:
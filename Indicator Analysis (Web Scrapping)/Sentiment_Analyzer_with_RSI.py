@@ -1,7 +1,6 @@
 import pandas as pd
 from bs4 import BeautifulSoup
 import matplotlib.pyplot as plt
-from urllib.request import urlopen, Request
 from urllib.parse import quote
 from urllib.error import HTTPError
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
@@ -11,6 +10,10 @@ import random
 from datetime import datetime, timedelta
 import concurrent.futures
 
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from data_providers import fetch, pause, sp500_html
+from instrumentation import span, timed
+
 # Download the VADER lexicon
 nltk.download('vader_lexicon')
 
@@ -25,8 +28,7 @@ def parse_date(date_str):
 
 # Function to fetch S&P 500 stock tickers
 def get_sp500_tickers():
-    sp500_url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-    html = urlopen(sp500_url)
+    html = sp500_html()
     soup = BeautifulSoup(html, 'html.parser')
     table = soup.find('table', {'id': 'constituents'})
     tickers = []
@@ -47,24 +49,25 @@ user_agents = [
 ]
 
 # Function to fetch news table and RSI for a single ticker
+@timed()
 def fetch_news_and_rsi(ticker):
     finviz_url = 'https://finviz.com/quote.ashx?t='
     encoded_ticker = quote(ticker)
     url = finviz_url + encoded_ticker
     user_agent = random.choice(user_agents)
-    req = Request(url=url, headers={'user-agent': user_agent})
     try:
-        resp = urlopen(req)
-        html = BeautifulSoup(resp, features="lxml")
-        news_table = html.find(id='news-table')
-        
-        # Extracting RSI value using more robust method
-        rsi_text = html.find(text='RSI (14)')
-        if rsi_text:
-            rsi = rsi_text.find_next(class_='snapshot-td2').text
-            rsi = float(rsi)
-        else:
-            rsi = None
+        resp = fetch(url, headers={'user-agent': user_agent})
+        with span('parse', source='finviz'):
+            html = BeautifulSoup(resp, features="lxml")
+            news_table = html.find(id='news-table')
+
+            # Extracting RSI value using more robust method
+            rsi_text = html.find(text='RSI (14)')
+            if rsi_text:
+                rsi = rsi_text.find_next(class_='snapshot-td2').text
+                rsi = float(rsi)
+            else:
+                rsi = None
         
         return ticker, news_table, rsi
     except HTTPError as e:
@@ -74,7 +77,7 @@ def fetch_news_and_rsi(ticker):
         print(f"Error for {ticker}: {e}")
         return ticker, None, None
     finally:
-        time.sleep(random.uniform(1, 3))  # Add delay
+        pause(random.uniform(1, 3))  # Add delay (skipped when replaying)
 
 # Function to fetch news tables and RSI concurrently
 def fetch_news_and_rsi_tables(tickers):
@@ -123,13 +126,16 @@ def main():
     news_tables = fetch_news_and_rsi_tables(tickers)
 
     # Parse news headlines and dates
-    parsed_news = parse_news(news_tables)
+    with span('parse', source='headlines'):
+        parsed_news = parse_news(news_tables)
 
     # Calculate sentiment scores
-    news_sentiment = calculate_sentiment(parsed_news)
+    with span('indicator', name='sentiment'):
+        news_sentiment = calculate_sentiment(parsed_news)
 
     # Output to Excel file
-    news_sentiment.to_excel("sentiment_scores_sp500.xlsx", index=False)
+    with span('write'):
+        news_sentiment.to_excel("sentiment_scores_sp500.xlsx", index=False)
 
     # Plotting
     fig, ax1 = plt.subplots(figsize=(12, 6))
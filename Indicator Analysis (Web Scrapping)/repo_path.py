@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Importing this module puts the repository root on sys.path, so scripts run from this folder can use
+# the shared modules there (data_providers, instrumentation, render_pool, ohlcv_api, ...)
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
@@ -1,36 +1,43 @@
 import pandas as pd
 from datetime import datetime
 import math
-import requests
 import numpy as np
+from urllib.error import HTTPError
 from bs4 import BeautifulSoup
 import mplfinance as mpf
-import yfinance as yf
 import matplotlib.pyplot as plt
 
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from data_providers import download, fetch
+from instrumentation import span, timed
+
 def fetch_html_table(url):
     headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/71.0.3578.98 Safari/537.36 '}     
-    response = requests.get(url, headers=headers, timeout=20)
+    try:
+        content = fetch(url, headers=headers, timeout=20)
+    except HTTPError:
+        try:
+            content = fetch(url, headers=headers, timeout=20)
+        except HTTPError as e:
+            print(f'Could not fetch {url}: {e}')
+            return None
 
-    if response.status_code != 200: 
-        response = requests.get(url, headers=headers, timeout=20)
-        if response.status_code != 200:
-            return None, response.status_code, response.text
-    
-    soup = BeautifulSoup(response.content, "html.parser")
+    with span('parse', source='trending'):
+        soup = BeautifulSoup(content, "html.parser")
 
-    if 'Select All' in response.text:
-        for span in soup.find_all("span", {'class': 'Fz(0)'}):
-            span.replaceWith('')
+        if b'Select All' in content:
+            for tag in soup.find_all("span", {'class': 'Fz(0)'}):
+                tag.replaceWith('')
 
-    table_tags = soup.find_all('table')
-    if len(table_tags) == 0:
-        print('No tables found on the page!')
-        return None
-    
-    data_frame = pd.read_html(str(table_tags))[0]    
+        table_tags = soup.find_all('table')
+        if len(table_tags) == 0:
+            print('No tables found on the page!')
+            return None
+
+        data_frame = pd.read_html(str(table_tags))[0]
     return data_frame
 
+@timed()
 def generate_combined_stock_charts(source_url, start_date):
     ticker_list = fetch_html_table(source_url)
     if ticker_list is None or ticker_list.empty:
@@ -44,7 +51,7 @@ def generate_combined_stock_charts(source_url, start_date):
     fig, axes = plt.subplots(num_rows, num_cols, figsize=(num_cols * 5, num_rows * 5), dpi=200)
     plt.subplots_adjust(wspace=0.2, hspace=0.5)
     
-    stock_data = yf.download(ticker_list.Symbol.to_list(), start=start_date, interval='1d')
+    stock_data = download(ticker_list.Symbol.to_list(), start=start_date, interval='1d')
     stock_data = stock_data.reset_index()
     stock_data['Date'] = pd.to_datetime(stock_data['Date'], errors='coerce')
     stock_data.set_index('Date', inplace=True)
@@ -70,7 +77,8 @@ def generate_combined_stock_charts(source_url, start_date):
         mc = mpf.make_marketcolors(up='g', down='r', inherit=True)
         s = mpf.make_mpf_style(marketcolors=mc, facecolor=facecolor)
         
-        mpf.plot(symbol_data, type='candle', ax=axis, style=s)
+        with span('render'):
+            mpf.plot(symbol_data, type='candle', ax=axis, style=s)
         axis.set_title(f"{title_name}\n({symbol}) {current_price:.2f}{todaytrendsymbol}{pct_change:.2f}%", color=title_color, fontsize=10)
     
     # Remove any unused axes
@@ -79,8 +87,9 @@ def generate_combined_stock_charts(source_url, start_date):
     
     today_date = datetime.now().strftime("%Y-%m-%d")
     fig.suptitle(f'{source_url}\n{start_date} ~ {today_date}', fontweight="bold", fontsize=16)
-    fig.tight_layout()
-    fig.savefig('stock_screener_combined.jpg', dpi=200, bbox_inches='tight')
+    with span('write'):
+        fig.tight_layout()
+        fig.savefig('stock_screener_combined.jpg', dpi=200, bbox_inches='tight')
 
     return True
 
@@ -0,0 +1,433 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlencode, urlsplit
+import numpy as np
+
+# Load test for the Flask and Django chart apps. The server runs in a subprocess on the replay data
+# provider (recorded or synthetic OHLCV, optional simulated upstream latency), so results measure the app
+# itself and never touch the network.
+#
+#   python load_test.py record --tickers AAPL MSFT           # optional: save real history once
+#   python load_test.py run --app flask --concurrency 16 --duration 30 --mix chart=4,api=4,index=1
+#   python load_test.py run --app django --latency 0.3 --output django.json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from data_providers import BAR_FORMATS, DIR_ENV, JITTER_ENV, LATENCY_ENV, PROVIDER_ENV, LiveProvider, save_bars
+from synthetic_data import synthetic_frame
+
+APP_DIRS = {'flask': os.path.join(ROOT, 'Flask_Projects'), 'django': os.path.join(ROOT, 'Django_Projects')}
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recorded_ohlcv')
+TICKERS = ['AAPL', 'GOOGL', 'MSFT', 'AMZN']
+DEFAULT_PERIODS = {'flask': ['1mo', '6mo', '1y'], 'django': ['1wk', '1mo', '6mo']}
+DEFAULT_MIX = {'flask': 'chart=4,api=4,index=1,submit=1', 'django': 'api=4,chart=3,compare=1,index=1'}
+PERCENTILES = (50, 90, 95, 99)
+
+
+# Function to make sure every ticker has replayable daily bars, synthesizing those that were never recorded
+def ensure_bars(tickers, data_dir=DATA_DIR):
+    for ticker in tickers:
+        paths = [os.path.join(data_dir, 'bars', f'{ticker.upper()}_1d.{fmt}') for fmt in BAR_FORMATS]
+        if not any(os.path.exists(path) for path in paths):
+            save_bars(synthetic_frame(ticker.upper()), ticker, data_dir)
+
+
+# Function to download real history once and save it for later offline runs
+def record(tickers, data_dir=DATA_DIR, period='10y'):
+    provider = LiveProvider()
+    for ticker in tickers:
+        df = provider.history(ticker, period=period)
+        save_bars(df, ticker, data_dir)
+        print(f'Recorded {len(df)} bars for {ticker}')
+
+
+# Function to run the Flask app on the given port (threaded dev server, like `python app.py`)
+def serve_flask(port):
+    sys.path.insert(0, APP_DIRS['flask'])
+    os.chdir(APP_DIRS['flask'])
+    from app import app
+    app.run(host='127.0.0.1', port=port, threaded=True, use_reloader=False)
+
+
+# Function to run the Django project on the given port against a throwaway database; its in-process
+# job worker thread (JOB_WORKER = 'thread') builds the queued charts. Uses uvicorn (ASGI) when installed, else Django's threaded server.
+def serve_django(port):
+    sys.path.insert(0, APP_DIRS['django'])
+    os.chdir(APP_DIRS['django'])
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'Django_Projects.settings'
+    import Django_Projects.settings as settings
+    settings.DATABASES['default']['NAME'] = os.path.join(tempfile.mkdtemp(prefix='load_test_'), 'db.sqlite3')
+    # DEBUG would keep every query in memory and distort the RSS numbers
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+    settings.JOB_WORKER = 'thread'
+    settings.JOB_POLL_INTERVAL = 0.05
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from myapp.jobs import ensure_worker
+    call_command('migrate', verbosity=0)
+    ensure_worker()
+
+    try:
+        import uvicorn
+    except ImportError:
+        from django.core.servers.basehttp import run
+        from django.core.wsgi import get_wsgi_application
+        run('127.0.0.1', port, get_wsgi_application(), threading=True)
+    else:
+        from Django_Projects.asgi import application
+        uvicorn.run(application, host='127.0.0.1', port=port, log_level='warning')
+
+
+# Function to get the RSS of a process and of all its descendants (render pool workers) in MB, from /proc
+def process_tree_rss(pid):
+    children = defaultdict(list)
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # The process name may contain spaces; fields after it are fixed
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children[ppid].append(int(entry))
+
+    def rss(p):
+        try:
+            with open(f'/proc/{p}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return 0.0
+
+    total, stack = 0.0, [pid]
+    while stack:
+        p = stack.pop()
+        total += rss(p)
+        stack.extend(children.get(p, ()))
+    return rss(pid), total
+
+
+# Sampler thread that records the server's RSS while the test runs
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            if os.path.exists(f'/proc/{self.pid}'):
+                self.samples.append(process_tree_rss(self.pid))
+            self.stopped.wait(self.interval)
+
+    def summary(self):
+        if not self.samples:
+            return None
+        server, tree = zip(*self.samples)
+        return {'server_start_mb': server[0], 'server_peak_mb': max(server), 'server_end_mb': server[-1],
+                'total_start_mb': tree[0], 'total_peak_mb': max(tree), 'total_end_mb': tree[-1]}
+
+
+# One keep-alive HTTP connection per load-test worker, with the cookies and ETags it has seen
+class Client:
+    def __init__(self, base_url, timeout=60):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+        self.etags = {}
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+        for header in response.headers.get_all('Set-Cookie') or []:
+            name, _, value = header.split(';', 1)[0].partition('=')
+            self.cookies[name.strip()] = value.strip()
+        return response.status, response.headers, data
+
+
+# Scenarios: each makes one logical user action and returns the final HTTP status
+def flask_index(client, rng, tickers, periods):
+    return client.request('GET', '/')[0]
+
+
+def flask_submit(client, rng, tickers, periods):
+    body = urlencode({'ticker': rng.choice(tickers), 'period': rng.choice(periods)})
+    return client.request('POST', '/', body, {'Content-Type': 'application/x-www-form-urlencoded'})[0]
+
+
+# Chart image, revalidated with If-None-Match once this client has an ETag for it (like a browser cache)
+def flask_chart(client, rng, tickers, periods):
+    path = f'/chart/{rng.choice(tickers)}/{rng.choice(periods)}.png'
+    headers = {'If-None-Match': client.etags[path]} if path in client.etags else {}
+    status, response_headers, _ = client.request('GET', path, headers=headers)
+    if response_headers.get('ETag'):
+        client.etags[path] = response_headers['ETag']
+    return status
+
+
+def flask_api(client, rng, tickers, periods):
+    query = urlencode({'period': rng.choice(periods), 'format': 'bin', 'indicators': 'sma20'})
+    return client.request('GET', f'/api/ohlcv/{rng.choice(tickers)}?{query}', headers={'Accept-Encoding': 'gzip, br'})[0]
+
+
+def django_index(client, rng, tickers, periods):
+    return client.request('GET', '/stocks/')[0]
+
+
+# Submit the chart form and poll the job until the chart is ready (end-to-end latency as a user sees it)
+def django_chart(client, rng, tickers, periods, poll_interval=0.05, timeout=60):
+    if 'csrftoken' not in client.cookies:
+        client.request('GET', '/stocks/')
+    token = client.cookies.get('csrftoken', '')
+    body = urlencode({'ticker': rng.choice(tickers), 'period': rng.choice(periods), 'csrfmiddlewaretoken': token})
+    status, _, page = client.request('POST', '/stocks/', body, {'Content-Type': 'application/x-www-form-urlencoded',
+                                                               'Referer': f'http://{client.host}:{client.port}/stocks/'})
+    match = re.search(rb'/stocks/jobs/(\d+)/', page)
+    if status != 200 or match is None:
+        return status
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, _, data = client.request('GET', match.group(0).decode())
+        if status != 200:
+            return status
+        job = json.loads(data)
+        if job['status'] in ('done', 'failed'):
+            return 200 if job['status'] == 'done' else 500
+        time.sleep(poll_interval)
+    return 504
+
+
+def django_api(client, rng, tickers, periods):
+    query = urlencode({'period': rng.choice(periods), 'format': 'bin', 'indicators': 'sma20'})
+    return client.request('GET', f'/stocks/api/ohlcv/{rng.choice(tickers)}/?{query}',
+                          headers={'Accept-Encoding': 'gzip, br'})[0]
+
+
+def django_compare(client, rng, tickers, periods):
+    query = urlencode({'tickers': ','.join(rng.sample(tickers, min(3, len(tickers)))), 'period': rng.choice(periods)})
+    return client.request('GET', f'/stocks/compare/?{query}')[0]
+
+
+SCENARIOS = {
+    'flask': {'index': flask_index, 'submit': flask_submit, 'chart': flask_chart, 'api': flask_api},
+    'django': {'index': django_index, 'chart': django_chart, 'api': django_api, 'compare': django_compare},
+}
+
+
+# Function to parse a request mix like "chart=4,api=4,index=1" into scenario weights
+def parse_mix(text, scenarios):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in scenarios:
+            raise ValueError(f"Unknown scenario {name}; choose from {', '.join(scenarios)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# Function to start the app in a subprocess on the replay provider and wait until it answers
+def start_server(app, port, data_dir, latency=0.0, jitter=0.0, timeout=90):
+    env = dict(os.environ, **{PROVIDER_ENV: 'replay', DIR_ENV: data_dir, LATENCY_ENV: str(latency),
+                              JITTER_ENV: str(jitter)})
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', '--app', app,
+                                '--port', str(port)], env=env)
+    path = '/' if app == 'flask' else '/stocks/'
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{app} server exited with code {process.returncode}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', path)
+            if conn.getresponse().status < 500:
+                return process
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f'{app} server did not start within {timeout}s')
+
+
+# Function to drive the scenario mix from `concurrency` threads; requests during the warm-up are not counted
+def run_load(base_url, scenarios, mix, concurrency, duration, warmup, tickers, periods, seed=0):
+    names, weights = list(mix), list(mix.values())
+    records = []
+    lock = threading.Lock()
+    start = time.monotonic()
+    measure_from, stop_at = start + warmup, start + warmup + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = Client(base_url)
+        local = []
+        while True:
+            began = time.monotonic()
+            if began >= stop_at:
+                break
+            name = rng.choices(names, weights)[0]
+            try:
+                status, error = scenarios[name](client, rng, tickers, periods), None
+            except Exception as e:
+                status, error = None, f'{type(e).__name__}: {e}'
+            if began >= measure_from:
+                local.append((name, time.monotonic() - began, status, error))
+        with lock:
+            records.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records
+
+
+# Function to summarize request records: throughput, latency percentiles (ms) and error rate
+def summarize(records, duration):
+    def stats(group):
+        latencies = np.array([r[1] for r in group]) * 1000
+        errors = [r for r in group if r[2] is None or r[2] >= 400]
+        summary = {'requests': len(group), 'rps': len(group) / duration,
+                   'errors': len(errors), 'error_rate': len(errors) / len(group) if group else 0.0,
+                   'status': dict(sorted(Counter(str(r[2]) for r in group).items()))}
+        if len(latencies):
+            summary.update({f'p{p}_ms': float(np.percentile(latencies, p)) for p in PERCENTILES})
+            summary.update(mean_ms=float(latencies.mean()), max_ms=float(latencies.max()))
+        sample = next((r[3] for r in group if r[3]), None)
+        if sample:
+            summary['sample_error'] = sample
+        return summary
+
+    by_scenario = defaultdict(list)
+    for record in records:
+        by_scenario[record[0]].append(record)
+    return {'overall': stats(records), 'scenarios': {name: stats(group) for name, group in sorted(by_scenario.items())}}
+
+
+def print_report(report):
+    print(f"{'scenario':>10} {'requests':>9} {'req/s':>8} {'errors':>7} "
+          + ' '.join(f'{f"p{p} ms":>9}' for p in PERCENTILES) + f" {'max ms':>9}")
+    rows = list(report['summary']['scenarios'].items()) + [('overall', report['summary']['overall'])]
+    for name, s in rows:
+        print(f"{name:>10} {s['requests']:>9} {s['rps']:>8.1f} {s['error_rate']:>7.1%} "
+              + ' '.join(f"{s.get(f'p{p}_ms', 0):>9.1f}" for p in PERCENTILES) + f" {s.get('max_ms', 0):>9.1f}")
+        if s.get('sample_error'):
+            print(f"{'':>10} e.g. {s['sample_error']}")
+    if report.get('rss'):
+        rss = report['rss']
+        print(f"server RSS {rss['server_start_mb']:.0f} -> {rss['server_end_mb']:.0f} MB (peak {rss['server_peak_mb']:.0f}), "
+              f"with workers {rss['total_start_mb']:.0f} -> {rss['total_end_mb']:.0f} MB (peak {rss['total_peak_mb']:.0f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test for the Flask and Django chart apps on recorded data.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='start an app (or use --url) and drive load against it')
+    run.add_argument('--app', choices=list(APP_DIRS), default='flask')
+    run.add_argument('--url', help='test an already running server instead of starting one (no RSS numbers)')
+    run.add_argument('--port', type=int, default=8765)
+    run.add_argument('--data', default=DATA_DIR, help='replay directory (bars/<TICKER>_1d.csv)')
+    run.add_argument('--latency', type=float, default=0.0, help='simulated upstream latency per fetch (seconds)')
+    run.add_argument('--jitter', type=float, default=0.0)
+    run.add_argument('--concurrency', type=int, default=8)
+    run.add_argument('--duration', type=float, default=20, help='measured seconds')
+    run.add_argument('--warmup', type=float, default=3, help='seconds of unmeasured load first (fills caches)')
+    run.add_argument('--mix', help='scenario weights, e.g. chart=4,api=4,index=1')
+    run.add_argument('--tickers', nargs='+', default=TICKERS)
+    run.add_argument('--periods', nargs='+')
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--output', help='write the report as JSON')
+
+    serve = commands.add_parser('serve', help='run an app (set DATA_PROVIDER=replay for offline data)')
+    serve.add_argument('--app', choices=list(APP_DIRS), required=True)
+    serve.add_argument('--port', type=int, default=8765)
+
+    rec = commands.add_parser('record', help='download real history for later offline runs')
+    rec.add_argument('--tickers', nargs='+', default=TICKERS)
+    rec.add_argument('--data', default=DATA_DIR)
+    rec.add_argument('--period', default='10y')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.tickers, args.data, args.period)
+        return
+    if args.command == 'serve':
+        (serve_flask if args.app == 'flask' else serve_django)(args.port)
+        return
+
+    scenarios = SCENARIOS[args.app]
+    mix = parse_mix(args.mix or DEFAULT_MIX[args.app], scenarios)
+    periods = args.periods or DEFAULT_PERIODS[args.app]
+    process = None
+    if not args.url:
+        data_dir = os.path.abspath(args.data)
+        ensure_bars(args.tickers, data_dir)
+        process = start_server(args.app, args.port, data_dir, args.latency, args.jitter)
+    base_url = args.url or f'http://127.0.0.1:{args.port}'
+    sampler = None
+    if process is not None and os.path.isdir('/proc'):
+        sampler = RssSampler(process.pid)
+        sampler.start()
+    try:
+        records = run_load(base_url, scenarios, mix, args.concurrency, args.duration, args.warmup,
+                           args.tickers, periods, args.seed)
+        report = {'app': args.app, 'url': base_url, 'concurrency': args.concurrency, 'duration': args.duration,
+                  'warmup': args.warmup, 'latency': args.latency, 'mix': mix, 'tickers': args.tickers, 'periods': periods,
+                  'summary': summarize(records, args.duration)}
+        if args.app == 'flask':
+            try:
+                status, _, data = Client(base_url).request('GET', '/cache/stats')
+                report['cache'] = json.loads(data) if status == 200 else None
+            except OSError:
+                pass
+    finally:
+        if sampler is not None:
+            sampler.stopped.set()
+            sampler.join()
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+    if sampler is not None:
+        report['rss'] = sampler.summary()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print('Report saved to', args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,15 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
 from bs4 import BeautifulSoup
-from urllib.request import urlopen
+
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from data_providers import download, sp500_html
 
 # Function to fetch S&P 500 stock tickers
 def get_sp500_tickers():
-    sp500_url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-    html = urlopen(sp500_url)
+    html = sp500_html()
     soup = BeautifulSoup(html, 'html.parser')
     table = soup.find('table', {'id': 'constituents'})
     tickers = []
@@ -53,7 +53,7 @@ if select_stock and select_period:
     symbol = select_stock
     
     # Fetch stock data for the selected period
-    df = yf.download(symbol, period=select_period, interval='1d')
+    df = download(symbol, period=select_period, interval='1d')
     df = df.reset_index()
 
     # Calculate MACD and Signal Line
@@ -1,4 +1,3 @@
-import yfinance as yf
 import pandas as pd
 import talib
 import mplfinance as mpf
@@ -7,7 +6,10 @@ import os
 import streamlit as st
 import time
 from bs4 import BeautifulSoup
-from urllib.request import urlopen
+
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from data_providers import download
+from instrumentation import count, span, timed
 
 mytickerlist= ["NVDA","MU","HOLO","ETN","DELL","SMCI","DECK","KTRA","RGF"
                "AVGO","LLY"
@@ -82,9 +84,10 @@ patterns = {
 }
 
 # Function to analyze stock data
+@timed()
 def analyze_stock(stock, output_dir):
     try:
-        data = yf.download(stock, period='5d', interval='1h')  
+        data = download(stock, period='5d', interval='1h')  
     except Exception as e:
         print(f"Error downloading data for {stock}: {e}")
         return []
@@ -99,11 +102,14 @@ def analyze_stock(stock, output_dir):
     results = []
 
     for pattern_name, (pattern_func, explanation, suggestion) in patterns.items():
-        result = pattern_func(data['Open'], data['High'], data['Low'], data['Close'])
+        with span('pattern'):
+            result = pattern_func(data['Open'], data['High'], data['Low'], data['Close'])
         if result.iloc[-1] != 0:
+            count('patterns_found', pattern=pattern_name)
             # Save the plot
             plot_filename = os.path.join(output_dir, f"{stock}_{pattern_name}_{last_candle_date}.png")
-            mpf.plot(data.set_index('Datetime'), type='candle', style='charles', title=f"{stock} - {pattern_name}", savefig=plot_filename)
+            with span('render'):
+                mpf.plot(data.set_index('Datetime'), type='candle', style='charles', title=f"{stock} - {pattern_name}", savefig=plot_filename)
 
             results.append({
                 'Stock name': stock,
@@ -145,7 +151,8 @@ def update_dashboard():
 
     # Save results to a CSV file
     csv_filename = os.path.join(date_dir, 'sp500_stock_analysis_results.csv')
-    df_results.to_csv(csv_filename, index=False)
+    with span('write'):
+        df_results.to_csv(csv_filename, index=False)
 
     # Display results in Streamlit
     refresh_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -2,18 +2,33 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from pandas_datareader import data as pdr
-import yfinance as yf
-from sklearn.preprocessing import MinMaxScaler
 from keras.models import Sequential
 from keras.layers import Dense, LSTM, Dropout
 from datetime import datetime, timedelta
-
-# Ensure yfinance overrides
-yf.pdr_override()
-
-# Get the stock quote
-df = pdr.get_data_yahoo('SOUN', start='2022-01-01', end=datetime.now())
+import os
+from checkpointing import CHECKPOINT_DIR
+from training_pipeline import configure_threads, train_model
+from forecasting import multi_step_forecast
+from monte_carlo import plot_bands, residual_bands
+from model_registry import ModelRegistry, restore_scaler
+from feature_store import FeatureStore
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from instrumentation import span
+
+TICKER = 'SOUN'
+START_DATE = '2022-01-01'
+
+# Training settings (use 0 threads to let TensorFlow decide)
+BATCH_SIZE = 64
+EPOCHS = 50
+FINE_TUNE_EPOCHS = 5
+configure_threads(intra_op_threads=0, inter_op_threads=0)
+
+# Get the stock quote from the shared feature store (downloaded again only when older than 12 hours;
+# see data_providers for record/replay)
+store = FeatureStore()
+store.materialize(TICKER, START_DATE)
+df = store.frame(TICKER, START_DATE)
 
 # Create a new dataframe with only the 'Close' column
 data = df.filter(['Close'])
@@ -22,9 +37,20 @@ dataset = data.values
 # Get the number of rows to train the model on
 training_data_len = int(np.ceil(len(dataset) * .95))
 
-# Scale the data
-scaler = MinMaxScaler(feature_range=(0, 1))
-scaled_data = scaler.fit_transform(dataset)
+# Look up a previously trained model for the same inputs
+registry = ModelRegistry()
+registry_key = registry.key(TICKER, 'lstm', 60, ['Close'], START_DATE)
+entry, status = registry.resolve(registry_key, dataset[:, 0])
+print(f'Model registry: {status}')
+
+# Scale the data (keeping the registered scaler so a stored model sees the same inputs)
+if status in ('current', 'advanced'):
+    scaler = restore_scaler(entry['scaler'])
+    scaled_data = scaler.transform(dataset)
+else:
+    # New model: use the min-max scaled copy kept in the feature store
+    scaler = store.scaler(TICKER, START_DATE)
+    scaled_data = np.asarray(store.open(TICKER, START_DATE, scaled=True), dtype=np.float64).reshape(-1, 1)
 
 # Create the training data set 
 train_data = scaled_data[0:int(training_data_len), :]
@@ -43,21 +69,34 @@ x_train, y_train = np.array(x_train), np.array(y_train)
 x_train = np.reshape(x_train, (x_train.shape[0], x_train.shape[1], 1))
 
 # Build the LSTM model with additional layers and dropout
-model = Sequential()
-model.add(LSTM(128, return_sequences=True, input_shape=(x_train.shape[1], 1)))
-model.add(Dropout(0.2))  # Add dropout to prevent overfitting
-model.add(LSTM(64, return_sequences=True))
-model.add(Dropout(0.2))
-model.add(LSTM(64, return_sequences=False))
-model.add(Dropout(0.2))
-model.add(Dense(25))
-model.add(Dense(1))
-
-# Compile the model
-model.compile(optimizer='adam', loss='mean_squared_error')
-
-# Train the model with more epochs
-model.fit(x_train, y_train, batch_size=1, epochs=10)
+def build_model():
+    model = Sequential()
+    model.add(LSTM(128, return_sequences=True, input_shape=(x_train.shape[1], 1)))
+    model.add(Dropout(0.2))  # Add dropout to prevent overfitting
+    model.add(LSTM(64, return_sequences=True))
+    model.add(Dropout(0.2))
+    model.add(LSTM(64, return_sequences=False))
+    model.add(Dropout(0.2))
+    model.add(Dense(25))
+    model.add(Dense(1))
+    return model
+
+if status == 'current':
+    # Inputs are unchanged, reuse the stored model as is
+    model = registry.load_model(entry)
+elif status == 'advanced':
+    # Fine-tune the stored model on the windows whose targets are new bars
+    model = registry.load_model(entry)
+    first_new = max(entry['num_train_rows'] - 60, 0)
+    if first_new < len(x_train):
+        history, train_stats = train_model(model, x_train[first_new:], y_train[first_new:], batch_size=BATCH_SIZE,
+                                           epochs=FINE_TUNE_EPOCHS, validation_split=0, patience=0, base_lr=1e-4)
+else:
+    # Compile and train the model with batched, prefetched input and early stopping.
+    # Every epoch is checkpointed, so rerunning after a crash resumes instead of starting over.
+    model = build_model()
+    history, train_stats = train_model(model, x_train, y_train, batch_size=BATCH_SIZE, epochs=EPOCHS,
+                                       checkpoint_dir=os.path.join(CHECKPOINT_DIR, f'{TICKER}_lstm'), scaler=scaler)
 
 # Create the testing data set
 test_data = scaled_data[training_data_len - 60:, :]
@@ -74,26 +113,23 @@ x_test = np.array(x_test)
 x_test = np.reshape(x_test, (x_test.shape[0], x_test.shape[1], 1))
 
 # Get the model's predicted price values 
-predictions = model.predict(x_test)
+with span('predict', kind='test'):
+    predictions = model.predict(x_test)
 predictions = scaler.inverse_transform(predictions)
 
 # Get the root mean squared error (RMSE)
 rmse = np.sqrt(np.mean(((predictions - y_test) ** 2)))
 print('RMSE: ', rmse)
 
-model.save('LSTM_sercan.h5')
+# Register the new or fine-tuned model
+if status != 'current':
+    registry.save(registry_key, model, dataset[:, 0], scaler, {'rmse': float(rmse)}, num_train_rows=training_data_len)
 
-# Predict the next 10 days
-last_60_days = scaled_data[-60:]
-next_10_days = []
+model.save('LSTM_sercan.h5')
 
-for i in range(10):
-    X_test = np.array([last_60_days])
-    X_test = np.reshape(X_test, (X_test.shape[0], X_test.shape[1], 1))
-    pred_price = model.predict(X_test)
-    pred_price_unscaled = scaler.inverse_transform(pred_price)
-    next_10_days.append(pred_price_unscaled[0, 0])
-    last_60_days = np.append(last_60_days, pred_price, axis=0)[-60:]
+# Predict the next 10 days in a single compiled rollout
+last_60_days = scaled_data[-60:].reshape(1, 60, 1)
+next_10_days = scaler.inverse_transform(multi_step_forecast(model, last_60_days, horizon=10).reshape(-1, 1))[:, 0]
 
 # Create a dataframe for the next 10 days
 last_date = df.index[-1]
@@ -101,6 +137,9 @@ future_dates = [last_date + timedelta(days=i) for i in range(1, 11)]
 future_predictions = pd.DataFrame(data={'Date': future_dates, 'Close': next_10_days})
 future_predictions.set_index('Date', inplace=True)
 
+# Uncertainty bands: resample the validation residuals around the forecast path
+bands = residual_bands(next_10_days, y_test, predictions, index=future_predictions.index)
+
 # Create dataframes for plotting and saving
 train = data[:training_data_len]
 valid = data[training_data_len:]
@@ -120,5 +159,6 @@ plt.ylabel('Close Price USD ($)', fontsize=18)
 plt.plot(train['Close'])
 plt.plot(valid[['Close', 'Predictions']])
 plt.plot(future_predictions['Close'], linestyle='dashed', color='red')
-plt.legend(['Train', 'Val', 'Predictions', 'Future'], loc='lower right')
+plot_bands(bands)
+plt.legend(['Train', 'Val', 'Predictions', 'Future', '5-95% band', '25-75% band'], loc='lower right')
 plt.show()
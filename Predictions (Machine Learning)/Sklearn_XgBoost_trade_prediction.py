@@ -2,30 +2,49 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from pandas_datareader import data as pdr
-import yfinance as yf
-from sklearn.preprocessing import MinMaxScaler
 from xgboost import XGBRegressor
 from datetime import datetime, timedelta
 from sklearn.metrics import mean_squared_error
-
-# Ensure yfinance overrides
-yf.pdr_override()
-
-# Get the stock quote
-df = pdr.get_data_yahoo('LLY', start='2022-04-01', end=datetime.now())
+from forecasting import multi_step_forecast
+from monte_carlo import plot_bands, residual_bands
+from model_registry import ModelRegistry, restore_scaler
+from feature_store import FeatureStore
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from instrumentation import span
+
+TICKER = 'LLY'
+START_DATE = '2022-04-01'
+FINE_TUNE_ROUNDS = 20
+
+# Get the stock quote from the shared feature store (downloaded again only when older than 12 hours;
+# see data_providers for record/replay)
+store = FeatureStore()
+store.materialize(TICKER, START_DATE)
+df = store.frame(TICKER, START_DATE)
 
 # Create a new dataframe with only the 'Close' column
 data = df.filter(['Close']).values
 
-# Scale the data
-scaler = MinMaxScaler(feature_range=(0, 1))
-scaled_data = scaler.fit_transform(data)
+# Look up a previously trained model for the same inputs
+registry = ModelRegistry()
+registry_key = registry.key(TICKER, 'xgboost', 60, ['Close'], START_DATE)
+entry, status = registry.resolve(registry_key, data[:, 0])
+print(f'Model registry: {status}')
+
+# Scale the data (keeping the registered scaler so a stored model sees the same inputs)
+if status in ('current', 'advanced'):
+    scaler = restore_scaler(entry['scaler'])
+    scaled_data = scaler.transform(data)
+else:
+    # New model: use the min-max scaled copy kept in the feature store
+    scaler = store.scaler(TICKER, START_DATE)
+    scaled_data = np.asarray(store.open(TICKER, START_DATE, scaled=True), dtype=np.float64).reshape(-1, 1)
 
 # Split the data into training and validation sets
 training_data_len = int(len(scaled_data) * 0.95)
 train_data = scaled_data[:training_data_len]
-valid_data = scaled_data[training_data_len:]
+# (validation windows start time_step rows early so every validation day gets a prediction)
+valid_data = scaled_data[training_data_len - 60:]
 
 # Function to create dataset for XGBoost
 def create_dataset(dataset, time_step=1):
@@ -40,24 +59,30 @@ time_step = 60
 X_train, y_train = create_dataset(train_data, time_step)
 X_valid, y_valid = create_dataset(valid_data, time_step)
 
-# Initialize and train the XGBoost model
-xgb_model = XGBRegressor(objective='reg:squarederror', n_estimators=100, random_state=42)
-xgb_model.fit(X_train, y_train)
-
-
-# Predict future prices
-future_prices = []
-
-# Get the last 60 days of data
+if status == 'current':
+    # Inputs are unchanged, reuse the stored model as is
+    xgb_model = registry.load_model(entry)
+elif status == 'advanced':
+    # Continue boosting the stored model on the windows whose targets are new bars
+    xgb_model = registry.load_model(entry)
+    first_new = max(entry['num_train_rows'] - time_step, 0)
+    if first_new < len(X_train):
+        xgb_model.set_params(n_estimators=FINE_TUNE_ROUNDS)
+        with span('train', model='xgboost'):
+            xgb_model.fit(X_train[first_new:], y_train[first_new:], xgb_model=xgb_model.get_booster())
+else:
+    # Initialize and train the XGBoost model
+    xgb_model = XGBRegressor(objective='reg:squarederror', n_estimators=100, random_state=42)
+    with span('train', model='xgboost'):
+        xgb_model.fit(X_train, y_train)
+
+
+# Predict future prices from the last 60 days in one batched rollout
 last_60_days = scaled_data[-time_step:].reshape(1, -1)
-
-for i in range(10):
-    pred_price = xgb_model.predict(last_60_days)
-    future_prices.append(pred_price[0])
-    last_60_days = np.append(last_60_days, pred_price.reshape(1, -1), axis=1)[:, 1:]
+future_prices = multi_step_forecast(xgb_model, last_60_days, horizon=10)
 
 # Inverse transform the predicted prices
-future_prices = scaler.inverse_transform(np.array(future_prices).reshape(-1, 1))
+future_prices = scaler.inverse_transform(future_prices.reshape(-1, 1))
 
 
 # Create dataframes for plotting and saving
@@ -65,13 +90,24 @@ train = data[:training_data_len]
 valid = data[training_data_len:]
 
 
-# Calculate RMSE
-rmse = np.sqrt(mean_squared_error(df['Close'][-10:], future_prices))
+# Calculate RMSE on the validation days (the future has no actual prices to compare against yet)
+with span('predict', kind='test'):
+    valid_predictions = scaler.inverse_transform(xgb_model.predict(X_valid).reshape(-1, 1))
+rmse = np.sqrt(mean_squared_error(valid, valid_predictions))
 print('RMSE:', rmse)
 
+# Uncertainty bands: resample the validation residuals around the forecast path
+future_dates = pd.date_range(df.index[-1], periods=10)
+bands = residual_bands(future_prices[:, 0], valid, valid_predictions, index=future_dates)
+
+# Register the new or fine-tuned model
+if status != 'current':
+    registry.save(registry_key, xgb_model, data[:, 0], scaler, {'rmse': float(rmse)}, num_train_rows=training_data_len)
+
 # Plot the data
 plt.plot(df.index[-100:], df['Close'].tail(100), label='Historical Prices')
-plt.plot(pd.date_range(df.index[-1], periods=10), future_prices, linestyle='dashed', color='red', label='Future Predictions')
+plt.plot(future_dates, future_prices, linestyle='dashed', color='red', label='Future Predictions')
+plot_bands(bands)
 plt.title('Stock Price Prediction for Next 10 Days using XGBoost')
 plt.xlabel('Date')
 plt.ylabel('Close Price (USD)')
@@ -2,19 +2,32 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from pandas_datareader import data as pdr
-import yfinance as yf
 from datetime import datetime, timedelta
+import os
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, LSTM, Dropout
-from tensorflow.keras.callbacks import EarlyStopping
-
-# Ensure yfinance overrides
-yf.pdr_override()
-
-# Get the stock quote
-df = pdr.get_data_yahoo('DELL', start='2022-04-01', end=datetime.now())
+from training_pipeline import configure_threads, train_model
+from forecasting import multi_step_forecast
+from monte_carlo import plot_bands, residual_bands
+from checkpointing import CHECKPOINT_DIR
+from feature_store import FeatureStore
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from instrumentation import span
+
+TICKER = 'DELL'
+START_DATE = '2022-04-01'
+
+# Training settings (use 0 threads to let TensorFlow decide)
+BATCH_SIZE = 64
+EPOCHS = 100
+configure_threads(intra_op_threads=0, inter_op_threads=0)
+
+# Get the stock quote from the shared feature store (downloaded again only when older than 12 hours;
+# see data_providers for record/replay)
+store = FeatureStore()
+store.materialize(TICKER, START_DATE)
+df = store.frame(TICKER, START_DATE)
 
 # Create a new dataframe with only the 'Close' column
 data = df.filter(['Close'])
@@ -54,14 +67,10 @@ model = Sequential([
     Dense(1)
 ])
 
-# Compile the model
-model.compile(optimizer='adam', loss='mean_squared_error')
-
-# Implement early stopping
-early_stop = EarlyStopping(monitor='loss', patience=10)
-
-# Train the model with more epochs
-model.fit(x_train, y_train, batch_size=32, epochs=100, callbacks=[early_stop])
+# Compile and train the model with batched, prefetched input and early stopping.
+# Every epoch is checkpointed, so rerunning after a crash resumes instead of starting over.
+history, train_stats = train_model(model, x_train, y_train, batch_size=BATCH_SIZE, epochs=EPOCHS, patience=10,
+                                   checkpoint_dir=os.path.join(CHECKPOINT_DIR, f'{TICKER}_tf_lstm'), scaler=scaler)
 
 # Create the testing data set
 test_data = scaled_data[training_data_len - 60:]
@@ -75,23 +84,18 @@ for i in range(60, len(test_data)):
 x_test = np.array(x_test)
 
 # Get the model's predicted price values 
-predictions = model.predict(x_test)
+with span('predict', kind='test'):
+    predictions = model.predict(x_test)
 predictions = scaler.mean + predictions * scaler.variance ** 0.5
 
 # Get the root mean squared error (RMSE)
 rmse = np.sqrt(np.mean(((predictions - y_test) ** 2)))
 print('RMSE: ', rmse)
 
-# Predict the next 10 days
-last_60_days = scaled_data[-60:]
-next_10_days = []
-
-for i in range(10):
-    X_test = np.array([last_60_days])
-    pred_price = model.predict(X_test)
-    pred_price_unscaled = scaler.mean + pred_price * scaler.variance ** 0.5
-    next_10_days.append(pred_price_unscaled[0, 0])
-    last_60_days = np.append(last_60_days, pred_price, axis=0)[-60:]
+# Predict the next 10 days in a single compiled rollout
+last_60_days = np.array([scaled_data[-60:]])
+pred_prices = multi_step_forecast(model, last_60_days, horizon=10)
+next_10_days = np.array(scaler.mean + pred_prices * scaler.variance ** 0.5)[0]
 
 # Create a dataframe for the next 10 days
 last_date = df.index[-1]
@@ -99,6 +103,9 @@ future_dates = [last_date + timedelta(days=i) for i in range(1, 11)]
 future_predictions = pd.DataFrame(data={'Date': future_dates, 'Close': next_10_days})
 future_predictions.set_index('Date', inplace=True)
 
+# Uncertainty bands: resample the validation residuals around the forecast path
+bands = residual_bands(next_10_days, y_test, predictions, index=future_predictions.index)
+
 # Create dataframes for plotting and saving
 train = data[:training_data_len]
 valid = data[training_data_len:]
@@ -118,5 +125,6 @@ plt.ylabel('Close Price USD ($)', fontsize=18)
 plt.plot(train['Close'])
 plt.plot(valid[['Close', 'Predictions']])
 plt.plot(future_predictions['Close'], linestyle='dashed', color='red')
-plt.legend(['Train', 'Val', 'Predictions', 'Future'], loc='upper left')
+plot_bands(bands)
+plt.legend(['Train', 'Val', 'Predictions', 'Future', '5-95% band', '25-75% band'], loc='upper left')
 plt.show()
@@ -1,18 +1,24 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from pandas_datareader import data as pdr
-import yfinance as yf
 from datetime import datetime, timedelta
 import tensorflow as tf
 import xgboost as xgb
 from sklearn.metrics import mean_squared_error
+from forecasting import multi_step_forecast
+from monte_carlo import plot_bands, residual_bands
+from feature_store import FeatureStore
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from instrumentation import span
 
-# Ensure yfinance overrides
-yf.pdr_override()
+TICKER = 'SOUN'
+START_DATE = '2022-10-01'
 
-# Get the stock quote
-df = pdr.get_data_yahoo('SOUN', start='2022-10-01', end=datetime.now())
+# Get the stock quote from the shared feature store (downloaded again only when older than 12 hours;
+# see data_providers for record/replay)
+store = FeatureStore()
+store.materialize(TICKER, START_DATE)
+df = store.frame(TICKER, START_DATE)
 
 # Create a new dataframe with only the 'Close' column
 data = df.filter(['Close'])
@@ -58,10 +64,12 @@ x_test = x_test.reshape((x_test.shape[0], x_test.shape[1]))
 
 # Train the XGBoost model
 model = xgb.XGBRegressor(objective='reg:squarederror', n_estimators=1000)
-model.fit(x_train, y_train)
+with span('train', model='xgboost'):
+    model.fit(x_train, y_train)
 
 # Get the model's predicted price values 
-predictions = model.predict(x_test)
+with span('predict', kind='test'):
+    predictions = model.predict(x_test)
 predictions = predictions.reshape(-1, 1)
 predictions = normalizer.mean.numpy() + predictions * normalizer.variance.numpy() ** 0.5
 
@@ -69,16 +77,10 @@ predictions = normalizer.mean.numpy() + predictions * normalizer.variance.numpy(
 rmse = np.sqrt(mean_squared_error(y_test, predictions))
 print('RMSE: ', rmse)
 
-# Predict the next 10 days
-last_60_days = scaled_data[-60:].numpy()  # Convert to numpy array
-next_10_days = []
-
-for i in range(10):
-    X_test = last_60_days[-60:].reshape(1, -1)
-    pred_price = model.predict(X_test)
-    pred_price = normalizer.mean.numpy() + pred_price * normalizer.variance.numpy() ** 0.5
-    next_10_days.append(pred_price[0])
-    last_60_days = np.append(last_60_days, pred_price).reshape(-1, 1)[-60:]
+# Predict the next 10 days in one batched rollout (the model is fed its scaled predictions)
+last_60_days = scaled_data[-60:].numpy().reshape(1, -1)
+pred_prices = multi_step_forecast(model, last_60_days, horizon=10)
+next_10_days = (normalizer.mean.numpy() + pred_prices * normalizer.variance.numpy() ** 0.5)[0]
 
 # Create a dataframe for the next 10 days
 last_date = df.index[-1]
@@ -86,6 +88,9 @@ future_dates = [last_date + timedelta(days=i) for i in range(1, 11)]
 future_predictions = pd.DataFrame(data={'Date': future_dates, 'Close': next_10_days})
 future_predictions.set_index('Date', inplace=True)
 
+# Uncertainty bands: resample the validation residuals around the forecast path
+bands = residual_bands(next_10_days, y_test, predictions, index=future_predictions.index)
+
 # Create dataframes for plotting and saving
 train = data[:training_data_len]
 valid = data[training_data_len:]
@@ -105,5 +110,6 @@ plt.ylabel('Close Price USD ($)', fontsize=18)
 plt.plot(train['Close'])
 plt.plot(valid[['Close', 'Predictions']])
 plt.plot(future_predictions['Close'], linestyle='dashed', color='red')
-plt.legend(['Train', 'Val', 'Predictions', 'Future'], loc='upper left')
+plot_bands(bands)
+plt.legend(['Train', 'Val', 'Predictions', 'Future', '5-95% band', '25-75% band'], loc='upper left')
 plt.show()
@@ -0,0 +1,203 @@
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Everything runs offline on synthetic or recorded prices; nothing here touches the network.
+
+
+# Function to generate a reproducible synthetic daily close series (geometric Brownian motion)
+def synthetic_prices(rows=750, start_price=100.0, drift=0.0003, volatility=0.02, seed=42):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(drift - volatility ** 2 / 2, volatility, rows)
+    closes = start_price * np.exp(np.cumsum(returns))
+    dates = pd.bdate_range('2022-01-03', periods=rows)
+    return pd.DataFrame({'Close': closes}, index=dates)
+
+
+# Function to load recorded prices from a CSV with Date and Close columns
+def recorded_prices(path):
+    return pd.read_csv(path, index_col='Date', parse_dates=True)[['Close']]
+
+
+# Timer for one pipeline stage: wall time, process peak RSS and (when tracing) peak traced memory.
+# tracemalloc slows allocation-heavy stages such as training, so traced timings are not comparable.
+class StageTimer:
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            record = {'seconds': elapsed}
+            if self.trace_memory:
+                record['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+            # ru_maxrss is reported in KiB on Linux
+            record['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            self.stages[name] = record
+
+
+# Function to time each stage of one model script on the given prices
+# (load_prices stands in for the yfinance download so the run stays offline)
+def benchmark_model(model_type, load_prices, window=60, epochs=2, batch_size=64, trace_memory=False):
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    from sklearn.preprocessing import MinMaxScaler
+    from forecasting import multi_step_forecast
+    from model_builders import build_model, fit_model, make_windows, predict
+
+    timer = StageTimer(trace_memory)
+    with timer.stage('load'):
+        df = load_prices()
+    dataset = df[['Close']].values
+    training_data_len = int(np.ceil(len(dataset) * .95))
+
+    with timer.stage('scale'):
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        scaled_data = scaler.fit_transform(dataset)
+
+    # The original per-sample loop from the scripts, kept as a reference point
+    with timer.stage('windows_loop'):
+        x_loop = np.array([scaled_data[i - window:i, 0] for i in range(window, training_data_len)])
+
+    with timer.stage('windows'):
+        x, y = make_windows(scaled_data[:, 0], window)
+        num_train = training_data_len - window
+        x_train, y_train, x_test = x[:num_train], y[:num_train], x[num_train:]
+
+    with timer.stage('train'):
+        model = build_model(model_type, window)
+        stats = fit_model(model, model_type, x_train, y_train, batch_size=batch_size, epochs=epochs,
+                          validation_split=0, patience=0)
+
+    with timer.stage('inference'):
+        predictions = scaler.inverse_transform(predict(model, model_type, x_test).reshape(-1, 1))
+
+    with timer.stage('forecast'):
+        future = multi_step_forecast(model, scaled_data[-window:, 0].reshape(1, -1), horizon=10)
+        future = scaler.inverse_transform(future.reshape(-1, 1))[:, 0]
+
+    train = df[:training_data_len]
+    valid = df[training_data_len:].copy()
+    valid['Predictions'] = predictions
+    future_dates = pd.bdate_range(df.index[-1], periods=11)[1:]
+    future_predictions = pd.DataFrame({'Close': future}, index=future_dates)
+
+    with timer.stage('excel'):
+        with tempfile.TemporaryDirectory() as folder:
+            with pd.ExcelWriter(os.path.join(folder, 'stock_predictions.xlsx')) as writer:
+                train.to_excel(writer, sheet_name='Train')
+                valid.to_excel(writer, sheet_name='Validation')
+                future_predictions.to_excel(writer, sheet_name='Future')
+
+    with timer.stage('plot'):
+        fig = Figure(figsize=(16, 6))
+        ax = fig.subplots()
+        ax.plot(train['Close'])
+        ax.plot(valid[['Close', 'Predictions']])
+        ax.plot(future_predictions['Close'], linestyle='dashed', color='red')
+        fig.savefig(io.BytesIO(), format='png')
+
+    return {
+        'model_type': model_type,
+        'rows': len(df),
+        'train_samples': len(x_train),
+        'loop_windows_match': bool(np.allclose(x_loop, x_train)),
+        'samples_per_second': stats.get('samples_per_second'),
+        'stages': timer.stages,
+    }
+
+
+# Function to describe the environment so results from different versions can be compared
+def environment_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'cpu_count': os.cpu_count(),
+        'machine': platform.machine(),
+    }
+
+
+# Function to compare two result files stage by stage and flag slowdowns above a threshold
+def compare(baseline_path, current_path, threshold=0.2):
+    with open(baseline_path) as f:
+        baseline = {r['model_type']: r for r in json.load(f)['results']}
+    with open(current_path) as f:
+        current = {r['model_type']: r for r in json.load(f)['results']}
+
+    regressions = []
+    for model_type in sorted(set(baseline) & set(current)):
+        for name, record in current[model_type]['stages'].items():
+            old = baseline[model_type]['stages'].get(name)
+            if not old:
+                continue
+            ratio = record['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+            flag = ' REGRESSION' if ratio > 1 + threshold else ''
+            print(f"{model_type:>8} {name:>13}: {old['seconds']:.3f}s -> {record['seconds']:.3f}s ({ratio:.2f}x){flag}")
+            if flag:
+                regressions.append((model_type, name, ratio))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline benchmark of the prediction pipeline stages.')
+    parser.add_argument('--models', nargs='+', default=['gru', 'lstm', 'xgboost'])
+    parser.add_argument('--prices', help='CSV of recorded prices (Date, Close); synthetic if omitted')
+    parser.add_argument('--rows', type=int, default=750)
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also measure peak traced memory per stage in a second, separate run')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'))
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare)
+        raise SystemExit(1 if regressions else 0)
+
+    if args.prices:
+        load_prices = lambda: recorded_prices(args.prices)
+    else:
+        load_prices = lambda: synthetic_prices(args.rows)
+    results = []
+    for model_type in args.models:
+        result = benchmark_model(model_type, load_prices, epochs=args.epochs)
+        if args.trace_memory:
+            # Separate traced run, so tracemalloc's overhead never reaches the recorded timings
+            traced = benchmark_model(model_type, load_prices, epochs=args.epochs, trace_memory=True)
+            for name, record in traced['stages'].items():
+                result['stages'][name]['peak_traced_mb'] = record['peak_traced_mb']
+        results.append(result)
+        for name, record in result['stages'].items():
+            print(f"{model_type:>8} {name:>13}: {record['seconds']:.3f}s")
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment_info(), 'results': results}, f, indent=2)
+    print('Results saved to', args.output)
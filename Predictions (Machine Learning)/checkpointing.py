@@ -0,0 +1,160 @@
+import json
+import os
+import time
+from datetime import datetime
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback
+from model_registry import fingerprint, restore_scaler, scaler_params
+
+CHECKPOINT_DIR = 'checkpoints'
+STATE_FILE = 'state.json'
+BEST_WEIGHTS_FILE = 'early_stopping_best.npz'
+
+
+# Function to read the JSON state saved next to a run's checkpoints (None if there is none)
+def read_state(directory):
+    path = os.path.join(directory, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# Function to rebuild the scaler saved with a run's checkpoints (None if there is none)
+def load_scaler(directory):
+    state = read_state(directory)
+    if not state or not state.get('scaler'):
+        return None
+    return restore_scaler(state['scaler'])
+
+
+# Callback that periodically saves model weights, optimizer state and the epoch counter with
+# tf.train.CheckpointManager, plus a JSON state file holding the scaler, the data fingerprint and
+# the data cursor. restore() picks a preempted run back up at the next epoch.
+class TrainingCheckpoint(Callback):
+    def __init__(self, directory, scaler=None, data=None, keep=3, every_epochs=1, keep_every_hours=None,
+                 early_stopping=None):
+        super().__init__()
+        self.directory = directory
+        self.scaler = scaler_params(scaler) if scaler is not None else None
+        self.data_fingerprint = fingerprint(data) if data is not None else None
+        self.num_samples = len(data) if data is not None else None
+        self.keep = keep
+        self.every_epochs = every_epochs
+        self.keep_every_hours = keep_every_hours
+        self.early_stopping = early_stopping
+        self.epoch = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.resumed_state = None
+        self._manager = None
+        self._saved_best_weights = None
+        os.makedirs(directory, exist_ok=True)
+
+    # Function to create the checkpoint manager for a compiled model (once per callback)
+    def _manager_for(self, model):
+        if self._manager is None:
+            checkpoint = tf.train.Checkpoint(model=model, optimizer=model.optimizer, epoch=self.epoch)
+            self._manager = tf.train.CheckpointManager(checkpoint, self.directory, max_to_keep=self.keep,
+                                                       keep_checkpoint_every_n_hours=self.keep_every_hours)
+        return self._manager
+
+    # Function to restore the latest checkpoint into a compiled model and return the epoch to resume at
+    def restore(self, model):
+        manager = self._manager_for(model)
+        state = read_state(self.directory)
+        if not manager.latest_checkpoint or not state:
+            return 0
+        if self.data_fingerprint and state.get('data_fingerprint') != self.data_fingerprint:
+            print(f"Training data changed since the checkpoint in {self.directory}, starting from scratch")
+            return 0
+
+        # Create the optimizer slots up front so their values are restored immediately
+        if not getattr(model.optimizer, 'built', False) and hasattr(model.optimizer, 'build'):
+            model.optimizer.build(model.trainable_variables)
+        try:
+            manager.checkpoint.restore(manager.latest_checkpoint).assert_existing_objects_matched()
+        except (AssertionError, ValueError) as e:
+            print(f"Checkpoint in {self.directory} does not match the model ({e}), starting from scratch")
+            self.epoch.assign(0)
+            return 0
+
+        self.resumed_state = state
+        if state.get('completed'):
+            print(f"Training in {self.directory} already finished at epoch {int(self.epoch.numpy())}")
+        else:
+            print(f"Resuming from {manager.latest_checkpoint} at epoch {int(self.epoch.numpy()) + 1}")
+        return int(self.epoch.numpy())
+
+    # Function to tell whether the restored run had already finished training
+    @property
+    def completed(self):
+        return bool(self.resumed_state and self.resumed_state.get('completed'))
+
+    def on_train_begin(self, logs=None):
+        # EarlyStopping resets itself when training starts; carry its patience counter, best value and best
+        # weights over a resume, so restore_best_weights can still go back to an epoch before the restart
+        if self.early_stopping is not None and self.resumed_state and self.resumed_state.get('early_stopping'):
+            saved = self.resumed_state['early_stopping']
+            self.early_stopping.wait = saved['wait']
+            if saved['best'] is not None:
+                self.early_stopping.best = saved['best']
+            if saved.get('best_epoch') is not None:
+                self.early_stopping.best_epoch = saved['best_epoch']
+            path = os.path.join(self.directory, BEST_WEIGHTS_FILE)
+            if saved.get('best_weights') and os.path.exists(path):
+                with np.load(path) as weights:
+                    self.early_stopping.best_weights = [weights[f'arr_{i}'] for i in range(len(weights.files))]
+                self._saved_best_weights = self.early_stopping.best_weights
+
+    def on_epoch_end(self, epoch, logs=None):
+        if (epoch + 1) % self.every_epochs == 0:
+            self.save(epoch + 1)
+
+    def on_train_end(self, logs=None):
+        self.save(int(self.epoch.numpy()), completed=True)
+
+    # Function to write a checkpoint and then the state file that describes it
+    def save(self, epoch, completed=False):
+        # The final save runs after EarlyStopping has put the best weights back
+        manager = self._manager_for(self.model)
+        self.epoch.assign(epoch)
+        manager.save()
+
+        state = {
+            'epoch': epoch,
+            'completed': completed,
+            'checkpoint': manager.latest_checkpoint,
+            'checkpoints': list(manager.checkpoints),
+            # Cursor into the training data: the next epoch starts over these samples
+            'num_samples': self.num_samples,
+            'data_fingerprint': self.data_fingerprint,
+            'scaler': self.scaler,
+            'saved_at': time.time(),
+            'saved': datetime.now().isoformat(timespec='seconds'),
+        }
+        if self.early_stopping is not None:
+            best = self.early_stopping.best
+            best_epoch = getattr(self.early_stopping, 'best_epoch', None)
+            state['early_stopping'] = {'wait': int(self.early_stopping.wait),
+                                       'best': float(best) if best is not None else None,
+                                       'best_epoch': int(best_epoch) if best_epoch is not None else None,
+                                       'best_weights': self._save_best_weights()}
+
+        path = os.path.join(self.directory, STATE_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    # Function to write EarlyStopping's best weights next to the checkpoints (only when they changed; it
+    # keeps a new list for every improvement) and return whether the state file can point at them
+    def _save_best_weights(self):
+        weights = self.early_stopping.best_weights
+        if weights is None:
+            return False
+        if weights is not self._saved_best_weights:
+            path = os.path.join(self.directory, BEST_WEIGHTS_FILE)
+            with open(path + '.tmp', 'wb') as f:
+                np.savez(f, *weights)
+            os.replace(path + '.tmp', path)
+            self._saved_best_weights = weights
+        return True
@@ -0,0 +1,112 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from feature_store import FeatureStore
+from model_builders import MODEL_TYPES, build_model, fit_model, predict
+
+
+# Ensemble of forecasting models sharing one set of input windows. Members run in threads:
+# TensorFlow and XGBoost release the GIL while computing, so wall time tracks the slowest member.
+class EnsembleForecaster:
+    def __init__(self, members, weights=None, method='weighted'):
+        # members: name -> (model_type, model)
+        self.members = members
+        self.method = method
+        weights = weights or {name: 1.0 for name in members}
+        total = sum(weights.values())
+        self.weights = {name: weights[name] / total for name in members}
+        self.stacking_coef = None
+        self.timings = {}
+
+    # Function to run fn(name, model_type, model) for every member in parallel, timing each
+    def _run_members(self, fn):
+        def timed(name):
+            started = time.perf_counter()
+            model_type, model = self.members[name]
+            result = fn(name, model_type, model)
+            return result, time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=len(self.members)) as executor:
+            futures = {name: executor.submit(timed, name) for name in self.members}
+            results = {}
+            for name, future in futures.items():
+                results[name], self.timings[name] = future.result()
+        return results
+
+    # Function to train all members on the same windows
+    def fit(self, x_train, y_train, **train_kwargs):
+        started = time.perf_counter()
+        self._run_members(lambda name, model_type, model: fit_model(model, model_type, x_train, y_train, **train_kwargs))
+        fit_times = dict(self.timings)
+        print(f"Trained {len(self.members)} members in {time.perf_counter() - started:.1f}s "
+              f"(slowest member {max(fit_times.values()):.1f}s, sum {sum(fit_times.values()):.1f}s)")
+        return fit_times
+
+    # Function to get every member's predictions for one set of windows
+    def member_predictions(self, x):
+        return self._run_members(lambda name, model_type, model: predict(model, model_type, x))
+
+    # Function to learn stacking weights (least squares with intercept) on held-out predictions
+    def fit_stacking(self, x_val, y_val):
+        preds = self.member_predictions(x_val)
+        design = np.column_stack([preds[name] for name in self.members] + [np.ones(len(y_val))])
+        self.stacking_coef, *_ = np.linalg.lstsq(design, np.asarray(y_val), rcond=None)
+        return dict(zip(list(self.members) + ['intercept'], self.stacking_coef.tolist()))
+
+    # Function to combine member predictions with the configured weights or the stacking model
+    def combine(self, preds):
+        if self.method == 'stacking':
+            if self.stacking_coef is None:
+                raise ValueError('Call fit_stacking() before combining with stacking')
+            return np.column_stack([preds[name] for name in self.members]) @ self.stacking_coef[:-1] + self.stacking_coef[-1]
+        return sum(self.weights[name] * preds[name] for name in self.members)
+
+    def predict(self, x):
+        return self.combine(self.member_predictions(x))
+
+    # Function to report RMSE/MAE and predict time per member and for the ensemble (in price units)
+    def evaluate(self, x, y, low=0.0, high=1.0):
+        started = time.perf_counter()
+        preds = self.member_predictions(x)
+        preds['ensemble'] = self.combine(preds)
+        elapsed = time.perf_counter() - started
+        actual = np.asarray(y) * (high - low) + low
+        report = {}
+        for name, values in preds.items():
+            values = values * (high - low) + low
+            report[name] = {
+                'rmse': float(np.sqrt(np.mean((values - actual) ** 2))),
+                'mae': float(np.mean(np.abs(values - actual))),
+                'predict_time': elapsed if name == 'ensemble' else self.timings[name],
+            }
+        return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train and evaluate an LSTM/GRU/XGBoost ensemble for one ticker.')
+    parser.add_argument('ticker')
+    parser.add_argument('--models', nargs='+', choices=MODEL_TYPES, default=list(MODEL_TYPES))
+    parser.add_argument('--method', choices=['weighted', 'stacking'], default='weighted')
+    parser.add_argument('--weights', nargs='+', type=float, default=None, help='one weight per model')
+    parser.add_argument('--start', default='2022-04-01')
+    parser.add_argument('--window', type=int, default=60)
+    parser.add_argument('--epochs', type=int, default=50)
+    args = parser.parse_args()
+
+    # Build the windows once from the shared feature store
+    store = FeatureStore()
+    entry = store.materialize(args.ticker, args.start)
+    x, y = store.windows(args.ticker, args.start, args.window)
+    train_end, val_end = int(len(y) * 0.8), int(len(y) * 0.9)
+
+    members = {name: (name, build_model(name, args.window)) for name in args.models}
+    weights = dict(zip(args.models, args.weights)) if args.weights else None
+    ensemble = EnsembleForecaster(members, weights, args.method)
+    ensemble.fit(x[:train_end], y[:train_end], epochs=args.epochs)
+    if args.method == 'stacking':
+        print('Stacking weights:', ensemble.fit_stacking(x[train_end:val_end], y[train_end:val_end]))
+
+    low, high = entry['scaler']['min'][0], entry['scaler']['max'][0]
+    for name, metrics in ensemble.evaluate(x[val_end:], y[val_end:], low, high).items():
+        print(f"{name:>10}: RMSE {metrics['rmse']:.3f}, MAE {metrics['mae']:.3f}, {metrics['predict_time'] * 1000:.0f}ms")
@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: index updates are not locked
+    fcntl = None
+
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+
+STORE_DIR = 'feature_store'
+
+
+# Function to name a temporary file next to `path`, unique per process and thread (like data_providers.write_recording)
+def _tmp_path(path):
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+# Function to write an array atomically, so concurrent writers and memory-mapped readers never see a partial file
+def _save(path, values):
+    tmp = _tmp_path(path)
+    with open(tmp, 'wb') as f:
+        np.save(f, values)
+    os.replace(tmp, path)
+
+
+# On-disk store of per-ticker feature arrays. Each feature is saved once as raw and min-max scaled
+# float32 .npy files; readers memory-map them, so every process on the box shares the page cache
+# instead of holding its own copy, and windows are zero-copy views.
+class FeatureStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        os.makedirs(root, exist_ok=True)
+
+    # Function to build the store key for a ticker, start date and feature set
+    def key(self, ticker, start, features=('Close',)):
+        return f"{ticker}_{start}_{'-'.join(features)}"
+
+    # Function to hold an exclusive lock while the index is rewritten
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.root, 'index.lock'), 'w') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    # Function to look up the metadata for a key (None if not materialized)
+    def entry(self, ticker, start, features=('Close',)):
+        return self._read_index().get(self.key(ticker, start, features))
+
+    # Function to write a ticker's features and scaler parameters, unless a fresh copy already exists.
+    # Pass `frame` to store data that is already in memory instead of downloading it.
+    def materialize(self, ticker, start, end=None, features=('Close',), max_age=12 * 3600, frame=None):
+        key = self.key(ticker, start, features)
+        existing = self._read_index().get(key)
+        if (frame is None and existing and time.time() - existing['materialized_at'] < max_age
+                and os.path.exists(os.path.join(self.root, key, 'dates.npy'))):
+            return existing
+
+        if frame is None:
+            from data_providers import download
+            frame = download(ticker, start=start, end=end, progress=False)
+        folder = os.path.join(self.root, key)
+        os.makedirs(folder, exist_ok=True)
+
+        minimums, maximums = [], []
+        for feature in features:
+            raw = frame[feature].to_numpy(dtype=np.float32).reshape(-1)
+            low, high = float(raw.min()), float(raw.max())
+            scaled = (raw - low) / ((high - low) or 1.0)
+            for suffix, values in (('', raw), ('.scaled', scaled)):
+                _save(os.path.join(folder, f"{feature}{suffix}.npy"), values.astype(np.float32))
+            minimums.append(low)
+            maximums.append(high)
+        # Dates are kept as local wall-clock times (recorded bars carry America/New_York, downloads none)
+        dates = frame.index.tz_localize(None) if getattr(frame.index, 'tz', None) is not None else frame.index
+        _save(os.path.join(folder, 'dates.npy'), dates.to_numpy(dtype='datetime64[ns]'))
+
+        entry = {
+            'key': key,
+            'ticker': ticker,
+            'start': str(start),
+            'features': list(features),
+            'rows': len(frame),
+            'first_date': str(frame.index[0].date()),
+            'last_date': str(frame.index[-1].date()),
+            # Same layout as model_registry.scaler_params so restore_scaler() can rebuild it
+            'scaler': {'type': 'minmax', 'min': minimums, 'max': maximums, 'feature_range': [0, 1]},
+            'materialized_at': time.time(),
+            'materialized': datetime.now().isoformat(timespec='seconds'),
+        }
+        with self._locked():
+            index = self._read_index()
+            index[key] = entry
+            tmp = _tmp_path(self.index_path)
+            with open(tmp, 'w') as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp, self.index_path)
+        return entry
+
+    # Function to get the file path of a stored feature array
+    def path(self, ticker, start, feature='Close', scaled=False, features=('Close',)):
+        suffix = '.scaled' if scaled else ''
+        return os.path.join(self.root, self.key(ticker, start, features), f"{feature}{suffix}.npy")
+
+    # Function to memory-map a stored feature array (read-only, nothing is copied)
+    def open(self, ticker, start, feature='Close', scaled=False, features=('Close',)):
+        return np.load(self.path(ticker, start, feature, scaled, features), mmap_mode='r')
+
+    # Function to get the stored raw features as a DataFrame indexed by date, like the download it came from
+    def frame(self, ticker, start, features=('Close',)):
+        import pandas as pd
+        dates = np.load(os.path.join(self.root, self.key(ticker, start, features), 'dates.npy'))
+        columns = {feature: np.asarray(self.open(ticker, start, feature, features=features), dtype=np.float64)
+                   for feature in features}
+        return pd.DataFrame(columns, index=pd.DatetimeIndex(dates, name='Date'))
+
+    # Function to get (window, next value) samples as zero-copy views over the scaled feature
+    def windows(self, ticker, start, window, feature='Close', features=('Close',)):
+        series = self.open(ticker, start, feature, scaled=True, features=features)
+        x = np.lib.stride_tricks.sliding_window_view(series[:-1], window)
+        return x, series[window:]
+
+    # Function to rebuild the scaler that produced the scaled arrays
+    def scaler(self, ticker, start, features=('Close',)):
+        from model_registry import restore_scaler
+        return restore_scaler(self.entry(ticker, start, features)['scaler'])
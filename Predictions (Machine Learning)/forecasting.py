@@ -0,0 +1,80 @@
+import weakref
+import numpy as np
+
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from instrumentation import timed
+
+# Compiled rollout graphs, one per Keras model
+_keras_rollouts = weakref.WeakKeyDictionary()
+
+
+# Function to check whether a model is a Keras model (without importing TensorFlow)
+def is_keras_model(model):
+    return hasattr(model, 'layers') and hasattr(model, 'predict_on_batch')
+
+
+# Function to build training pairs for a direct multi-output model
+# (each sample is `window` inputs followed by the next `horizon` targets)
+def make_direct_dataset(series, window, horizon):
+    series = np.asarray(series, dtype=np.float32).reshape(-1)
+    views = np.lib.stride_tricks.sliding_window_view(series, window + horizon)
+    return views[:, :window].copy(), views[:, window:].copy()
+
+
+# Function to build a compiled single-graph recursive rollout for a one-step Keras model
+def _keras_rollout(model):
+    import tensorflow as tf
+
+    @tf.function(reduce_retracing=True)
+    def rollout(windows, horizon):
+        window_len = tf.shape(windows)[1]
+        # Ring buffer of the last `window_len` values; the oldest value sits at `head`
+        buffer = windows
+        head = tf.constant(0)
+        outputs = tf.TensorArray(tf.float32, size=horizon)
+        for step in tf.range(horizon):
+            pred = model(tf.roll(buffer, shift=-head, axis=1), training=False)[:, :1]
+            outputs = outputs.write(step, pred[:, 0])
+            mask = tf.one_hot(head, window_len, dtype=tf.float32)[tf.newaxis, :, tf.newaxis]
+            buffer = buffer * (1.0 - mask) + pred[:, tf.newaxis, :] * mask
+            head = (head + 1) % window_len
+        return tf.transpose(outputs.stack())
+
+    return rollout
+
+
+# Function to roll a one-step model forward using a preallocated buffer (scikit-learn / XGBoost)
+def _numpy_rollout(predict, windows, horizon, first_step):
+    batch, window_len = windows.shape
+    buffer = np.empty((batch, window_len + horizon), dtype=np.float32)
+    buffer[:, :window_len] = windows
+    buffer[:, window_len] = first_step
+    for step in range(1, horizon):
+        buffer[:, window_len + step] = np.asarray(predict(buffer[:, step:step + window_len])).reshape(batch, -1)[:, 0]
+    return buffer[:, window_len:].copy()
+
+
+# Function to forecast `horizon` steps for a batch of scaled windows in as few model calls as possible.
+# Direct multi-output models (output width >= horizon) take a single forward pass; one-step Keras
+# models run a compiled rollout and other models a batched rollout (one call per step for all tickers).
+@timed('predict', kind='multi_step')
+def multi_step_forecast(model, windows, horizon):
+    windows = np.asarray(windows, dtype=np.float32)
+
+    if is_keras_model(model):
+        if windows.ndim == 2:
+            windows = windows[..., np.newaxis]
+        if model.output_shape[-1] >= horizon:
+            return np.asarray(model.predict(windows, batch_size=len(windows), verbose=0))[:, :horizon]
+        if model not in _keras_rollouts:
+            _keras_rollouts[model] = _keras_rollout(model)
+        import tensorflow as tf
+        return _keras_rollouts[model](tf.constant(windows), tf.constant(horizon)).numpy()
+
+    windows = windows.reshape(len(windows), -1)
+    # XGBoost can predict straight from a NumPy array without building a DMatrix
+    predict = model.get_booster().inplace_predict if hasattr(model, 'get_booster') else model.predict
+    first = np.asarray(predict(windows)).reshape(len(windows), -1)
+    if first.shape[1] >= horizon:
+        return first[:, :horizon]
+    return _numpy_rollout(predict, windows, horizon, first[:, 0])
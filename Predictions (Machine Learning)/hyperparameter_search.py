@@ -0,0 +1,245 @@
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from model_builders import MODEL_TYPES
+from train_watchlist import WATCHLIST, init_worker
+from walk_forward import cached_closes
+
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from instrumentation import worker_task
+
+SEARCH_DIR = 'hyperparameter_search'
+
+# Search spaces replacing the values hard-coded in the prediction scripts
+SEARCH_SPACES = {
+    'keras': {
+        'window': [30, 60, 100],
+        'units': [[128, 64, 64], [64, 32], [128, 64], [50, 60, 80, 120]],
+        'dropout': [0.1, 0.2, 0.3],
+        'batch_size': [32, 64, 128],
+        'base_lr': [3e-4, 1e-3, 3e-3],
+    },
+    'xgboost': {
+        'window': [30, 60, 100],
+        'max_depth': [3, 5, 7],
+        'learning_rate': [0.03, 0.1, 0.3],
+        'subsample': [0.7, 1.0],
+        'colsample_bytree': [0.7, 1.0],
+    },
+}
+
+# Budget is training epochs for Keras models and boosting rounds for XGBoost
+BUDGETS = {'keras': (1, 27), 'xgboost': (30, 810)}
+
+
+# Function to draw a random configuration from a search space
+def sample_params(space, rng):
+    return {name: rng.choice(values) for name, values in space.items()}
+
+
+# Function to give a configuration a stable id so resumed searches recognise it
+def trial_id(model_type, bracket, params):
+    raw = json.dumps([model_type, bracket, params], sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+# Function to train a trial up to `budget` (continuing from its previous rung) and return the validation loss
+@worker_task
+def run_trial(tid, model_type, params, budget, prev_budget, cache_paths, search_dir):
+    from model_builders import build_model, fit_model
+    if model_type != 'xgboost':
+        from training_pipeline import configure_threads
+        import train_watchlist
+        configure_threads(train_watchlist._worker_threads, 1)
+
+    started = time.perf_counter()
+    window = params['window']
+    trial_dir = os.path.join(search_dir, 'trials', tid)
+    os.makedirs(trial_dir, exist_ok=True)
+
+    losses = []
+    for path in cache_paths:
+        closes = np.load(path, mmap_mode='r')
+        x = np.lib.stride_tricks.sliding_window_view(closes[:-1], window)
+        y = closes[window:]
+        split = int(len(y) * 0.9)
+        low, high = float(closes[:split + window].min()), float(closes[:split + window].max())
+        span = (high - low) or 1.0
+        x_train, y_train = ((x[:split] - low) / span).astype(np.float32), ((y[:split] - low) / span).astype(np.float32)
+        x_val, y_val = ((x[split:] - low) / span).astype(np.float32), ((y[split:] - low) / span).astype(np.float32)
+
+        # Saved models carry the budget they were trained to in their file name (written atomically), so a
+        # model saved before a crash is reused as is rather than trained past its rung, and only the model
+        # from the previous rung is continued with the extra budget
+        name = os.path.splitext(os.path.basename(path))[0]
+        extension = '.json' if model_type == 'xgboost' else '.keras'
+        model_file = os.path.join(trial_dir, f"{name}.b{budget}{extension}")
+        prev_file = os.path.join(trial_dir, f"{name}.b{prev_budget}{extension}")
+        trained = os.path.exists(model_file)
+        resume = not trained and prev_budget and os.path.exists(prev_file)
+        extra = budget - prev_budget if resume else budget
+        tmp = os.path.join(trial_dir, f"{name}.b{budget}.{os.getpid()}.tmp{extension}")
+        if model_type == 'xgboost':
+            from xgboost import XGBRegressor
+            if trained:
+                model = XGBRegressor()
+                model.load_model(model_file)
+            else:
+                xgb_params = {k: v for k, v in params.items() if k != 'window'}
+                model = build_model('xgboost', window, n_estimators=extra, **xgb_params)
+                previous = None
+                if resume:
+                    previous = XGBRegressor()
+                    previous.load_model(prev_file)
+                    previous = previous.get_booster()
+                model.fit(x_train, y_train, xgb_model=previous)
+                model.save_model(tmp)
+            val_pred = model.predict(x_val)
+        else:
+            from tensorflow.keras.models import load_model
+            if trained:
+                model = load_model(model_file)
+            else:
+                if resume:
+                    model = load_model(prev_file)
+                else:
+                    model = build_model(model_type, window, units=params['units'], dropout=params['dropout'])
+                fit_model(model, model_type, x_train, y_train, batch_size=params['batch_size'], epochs=extra,
+                          validation_split=0, patience=0, base_lr=params['base_lr'])
+                model.save(tmp)
+            val_pred = model.predict(x_val[..., np.newaxis], batch_size=1024, verbose=0)
+        if not trained:
+            os.replace(tmp, model_file)
+            if resume:
+                os.remove(prev_file)
+        losses.append(float(np.mean((np.asarray(val_pred).reshape(-1) - y_val) ** 2)))
+
+    return {'val_loss': float(np.mean(losses)), 'wall_time': time.perf_counter() - started}
+
+
+# Persistent, append-only trial history (one JSON record per evaluated trial and rung)
+class TrialHistory:
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.records[(record['trial_id'], record['budget'])] = record
+
+    def get(self, tid, budget):
+        return self.records.get((tid, budget))
+
+    def add(self, record):
+        self.records[(record['trial_id'], record['budget'])] = record
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+# Function to run hyperband: several successive-halving brackets trading off number of configs vs budget
+def hyperband(model_type, tickers, start='2022-04-01', eta=3, workers=None, threads_per_worker=1,
+              time_budget=None, search_dir=SEARCH_DIR, seed=42):
+    family = 'xgboost' if model_type == 'xgboost' else 'keras'
+    min_budget, max_budget = BUDGETS[family]
+    space = SEARCH_SPACES[family]
+    search_dir = os.path.join(search_dir, model_type)
+    os.makedirs(search_dir, exist_ok=True)
+    history = TrialHistory(os.path.join(search_dir, 'trials.jsonl'))
+    cache_paths = [cached_closes(t, start) for t in tickers]
+    workers = workers or max((os.cpu_count() or 1) // threads_per_worker, 1)
+
+    started = time.perf_counter()
+    s_max = int(round(math.log(max_budget / min_budget, eta)))
+    context = mp.get_context('spawn')
+    counter = context.Value('i', 0)
+    out_of_time = False
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=init_worker, initargs=(threads_per_worker, counter, True)) as executor:
+        for bracket in range(s_max, -1, -1):
+            if out_of_time:
+                break
+            # Seeded per bracket so a resumed search regenerates the same configurations
+            rng = random.Random(seed + bracket)
+            n = int(math.ceil((s_max + 1) / (bracket + 1) * eta ** bracket))
+            trials = {}
+            for _ in range(n):
+                params = sample_params(space, rng)
+                trials[trial_id(model_type, bracket, params)] = params
+
+            prev_budget = 0
+            for rung in range(bracket + 1):
+                if time_budget and time.perf_counter() - started > time_budget:
+                    print('Time budget exhausted, stopping search')
+                    out_of_time = True
+                    break
+                budget = int(round(max_budget * eta ** (rung - bracket)))
+                losses = {}
+                futures = {}
+                for tid, params in trials.items():
+                    done = history.get(tid, budget)
+                    if done:
+                        losses[tid] = done['val_loss']
+                    else:
+                        futures[executor.submit(run_trial, tid, model_type, params, budget, prev_budget,
+                                                cache_paths, search_dir)] = tid
+                for future in as_completed(futures):
+                    tid = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Trial {tid} failed: {e}")
+                        result = {'val_loss': float('inf'), 'wall_time': 0.0}
+                    losses[tid] = result['val_loss']
+                    history.add({'trial_id': tid, 'model_type': model_type, 'bracket': bracket, 'rung': rung,
+                                 'budget': budget, 'params': trials[tid], **result})
+
+                # Successive halving: only the best 1/eta configurations continue with a larger budget
+                keep = max(int(len(trials) / eta), 1)
+                ranked = sorted(trials, key=lambda t: losses[t])
+                print(f"Bracket {bracket} rung {rung}: {len(trials)} trials at budget {budget}, "
+                      f"best loss {losses[ranked[0]]:.6f}")
+                if rung < bracket:
+                    trials = {t: trials[t] for t in ranked[:keep]}
+                prev_budget = budget
+
+    best = best_trials(history)
+    if not best:
+        print('No trials finished')
+        return best
+    with open(os.path.join(search_dir, 'best_params.json'), 'w') as f:
+        json.dump(best[:5], f, indent=2)
+    print(f"Search finished in {time.perf_counter() - started:.1f}s, best: {best[0]['params']} "
+          f"(loss {best[0]['val_loss']:.6f}, budget {best[0]['budget']})")
+    return best
+
+
+# Function to rank finished trials, preferring results at the largest budget (failed trials, recorded
+# with an infinite loss, are left out)
+def best_trials(history):
+    records = [r for r in history.records.values() if math.isfinite(r['val_loss'])]
+    return sorted(records, key=lambda r: (-r['budget'], r['val_loss']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Hyperband search over the forecasting model settings.')
+    parser.add_argument('--model', choices=MODEL_TYPES, default='gru')
+    parser.add_argument('--tickers', nargs='+', default=WATCHLIST)
+    parser.add_argument('--start', default='2022-04-01')
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--time-budget', type=float, default=None, help='seconds before no new rungs start')
+    parser.add_argument('--search-dir', default=SEARCH_DIR)
+    args = parser.parse_args()
+
+    hyperband(args.model, args.tickers, args.start, args.eta, args.workers, args.threads_per_worker,
+              args.time_budget, args.search_dir)
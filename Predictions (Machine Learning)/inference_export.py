@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime
+import numpy as np
+
+# Exported formats, in the order we prefer them when serving
+EXPORT_EXTENSIONS = ('.onnx', '.tflite')
+
+
+# Function to read the metadata written next to an exported model ({} if there is none)
+def export_metadata(path):
+    if not os.path.exists(path + '.json'):
+        return {}
+    with open(path + '.json') as f:
+        return json.load(f)
+
+
+# Function to export a Keras model to TFLite, optionally quantized
+# ('dynamic' = int8 weights, 'int8' = full integer with representative windows for calibration).
+# Models that only convert with TensorFlow ops (Flex) need the full TensorFlow runtime to run, so that
+# fallback is refused unless allow_tf_ops is set, and is then recorded in <path>.json.
+def export_tflite(model, path, quantize=None, representative_windows=None, allow_tf_ops=False):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == 'int8':
+        if representative_windows is None:
+            raise ValueError('Full int8 quantization needs representative windows for calibration')
+
+        def representative_dataset():
+            for window in np.asarray(representative_windows, dtype=np.float32)[:200]:
+                yield [window[np.newaxis]]
+        converter.representative_dataset = representative_dataset
+    tf_ops = False
+    try:
+        tflite_model = converter.convert()
+    except Exception as e:
+        # Some recurrent layers only convert with TensorFlow ops enabled
+        if not allow_tf_ops:
+            raise RuntimeError(f"Builtin-only TFLite conversion failed ({e}). Exporting with TensorFlow ops gives "
+                               f"a model that needs the full TensorFlow runtime; pass allow_tf_ops=True "
+                               f"(--allow-tf-ops) to accept that, or export to ONNX instead") from e
+        warnings.warn(f"Builtin-only TFLite conversion failed ({e}); {path} uses TensorFlow ops (Flex) and will "
+                      f"only load with the full TensorFlow runtime, not tflite_runtime or LiteRT", RuntimeWarning)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+        tflite_model = converter.convert()
+        tf_ops = True
+    with open(path, 'wb') as f:
+        f.write(tflite_model)
+    metadata = {'format': 'tflite', 'quantize': quantize, 'select_tf_ops': tf_ops,
+                'tensorflow_version': tf.__version__, 'exported': datetime.now().isoformat(timespec='seconds')}
+    with open(path + '.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return path
+
+
+# Function to export a Keras model to ONNX, optionally with int8 dynamic quantization
+def export_onnx(model, path, quantize=False):
+    import tensorflow as tf
+    import tf2onnx
+    spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, output_path=path)
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(path, path, weight_type=QuantType.QInt8)
+    return path
+
+
+# Function to open a TFLite interpreter without pulling in TensorFlow when a standalone runtime is installed
+# (models exported with TensorFlow ops always use TensorFlow's interpreter, the only one with Flex kernels)
+def _tflite_interpreter(path):
+    if export_metadata(path).get('select_tf_ops'):
+        import tensorflow as tf
+        return tf.lite.Interpreter(model_path=path)
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=path)
+
+
+# Inference wrapper for exported models with the same predict() interface as Keras
+class LiteModel:
+    def __init__(self, path):
+        self.path = path
+        if path.endswith('.onnx'):
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+            model_input = self.session.get_inputs()[0]
+            self.input_name = model_input.name
+            self.input_shape = tuple(model_input.shape)
+            self.output_shape = tuple(self.session.get_outputs()[0].shape)
+        else:
+            self.interpreter = _tflite_interpreter(path)
+            self.interpreter.allocate_tensors()
+            self.input_detail = self.interpreter.get_input_details()[0]
+            self.output_detail = self.interpreter.get_output_details()[0]
+            self.input_shape = tuple(self.input_detail['shape'])
+            self.output_shape = tuple(self.output_detail['shape'])
+            self._batch = self.input_shape[0]
+
+    # Function to run a batch through the TFLite interpreter (resizing only when the batch size changes)
+    def _run_tflite(self, x):
+        if len(x) != self._batch:
+            self.interpreter.resize_tensor_input(self.input_detail['index'], [len(x)] + list(self.input_shape[1:]))
+            self.interpreter.allocate_tensors()
+            self.input_detail = self.interpreter.get_input_details()[0]
+            self.output_detail = self.interpreter.get_output_details()[0]
+            self._batch = len(x)
+
+        scale, zero_point = self.input_detail['quantization']
+        if scale:
+            x = np.round(x / scale + zero_point).astype(self.input_detail['dtype'])
+        self.interpreter.set_tensor(self.input_detail['index'], x)
+        self.interpreter.invoke()
+        out = self.interpreter.get_tensor(self.output_detail['index'])
+        scale, zero_point = self.output_detail['quantization']
+        if scale:
+            out = (out.astype(np.float32) - zero_point) * scale
+        return out
+
+    def predict(self, x, batch_size=None, verbose=0):
+        x = np.asarray(x, dtype=np.float32)
+        # Accept (batch, window) windows like the XGBoost scripts use
+        if x.ndim == len(self.input_shape) - 1:
+            x = x[..., np.newaxis]
+        if hasattr(self, 'session'):
+            return self.session.run(None, {self.input_name: x})[0]
+        return self._run_tflite(x)
+
+
+# Function to load the fastest available version of a model: an exported sibling file
+# (model.onnx / model.tflite next to model.h5) if present, else the Keras model itself
+def load_inference_model(path, custom_objects=None):
+    base, extension = os.path.splitext(path)
+    if extension in EXPORT_EXTENSIONS:
+        return LiteModel(path)
+    for candidate in EXPORT_EXTENSIONS:
+        if os.path.exists(base + candidate):
+            return LiteModel(base + candidate)
+    from tensorflow.keras.losses import MeanSquaredError
+    from tensorflow.keras.models import load_model
+    # Older .h5 files refer to the loss by its 'mse' alias
+    objects = {'mse': MeanSquaredError()}
+    objects.update(custom_objects or {})
+    return load_model(path, custom_objects=objects)
+
+
+# Function to measure one runtime in isolation (run in a subprocess so memory and imports are not shared)
+def _measure(path, windows_path, repeats):
+    import resource
+    windows = np.load(windows_path)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if path.endswith(EXPORT_EXTENSIONS):
+        model = LiteModel(path)
+    else:
+        from tensorflow.keras.models import load_model
+        model = load_model(path, compile=False)
+    load_time = time.perf_counter() - started
+
+    predictions = np.asarray(model.predict(windows, verbose=0)).reshape(-1)
+    single, batch = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        model.predict(windows[:1], verbose=0)
+        single.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        model.predict(windows, verbose=0)
+        batch.append(time.perf_counter() - started)
+
+    return {
+        'model': path,
+        'load_time': load_time,
+        'latency_p50_ms': float(np.percentile(single, 50) * 1000),
+        'latency_p95_ms': float(np.percentile(single, 95) * 1000),
+        'batch_latency_p50_ms': float(np.percentile(batch, 50) * 1000),
+        'batch_size': len(windows),
+        # ru_maxrss is reported in KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'rss_growth_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024,
+        'tensorflow_imported': 'tensorflow' in sys.modules,
+        'predictions': predictions.tolist(),
+    }
+
+
+# Function to compare exported models against the Keras original: latency, memory and accuracy drift
+def benchmark(keras_path, exported_paths, windows, repeats=50, output='inference_benchmark.json'):
+    # Next to the exported models, not in whatever folder the benchmark was started from
+    windows_path = os.path.join(os.path.dirname(os.path.abspath(keras_path)), f'benchmark_windows.{os.getpid()}.npy')
+    np.save(windows_path, np.asarray(windows, dtype=np.float32))
+    results = []
+    try:
+        for path in [keras_path] + list(exported_paths):
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), 'measure', path, windows_path,
+                                   '--repeats', str(repeats)], capture_output=True, text=True, check=True)
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    finally:
+        os.remove(windows_path)
+
+    reference = np.array(results[0]['predictions'])
+    for result in results:
+        predictions = np.array(result.pop('predictions'))
+        result['max_abs_drift'] = float(np.max(np.abs(predictions - reference)))
+        result['mean_abs_drift'] = float(np.mean(np.abs(predictions - reference)))
+        print(f"{os.path.basename(result['model']):>24}: load {result['load_time']:.2f}s, "
+              f"p50 {result['latency_p50_ms']:.2f}ms, batch {result['batch_latency_p50_ms']:.1f}ms, "
+              f"RSS {result['peak_rss_mb']:.0f}MB, drift {result['max_abs_drift']:.2e}, "
+              f"TensorFlow imported: {result['tensorflow_imported']}")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export Keras forecasting models for fast CPU inference.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help='convert a Keras model to ONNX and/or TFLite')
+    export_parser.add_argument('model')
+    export_parser.add_argument('--formats', nargs='+', choices=['onnx', 'tflite'], default=['onnx', 'tflite'])
+    export_parser.add_argument('--quantize', choices=['dynamic', 'int8'], default=None)
+    export_parser.add_argument('--calibration', help='.npy file of scaled windows for int8 calibration')
+    export_parser.add_argument('--allow-tf-ops', action='store_true',
+                               help='fall back to TensorFlow ops when builtin TFLite conversion fails '
+                                    '(the model then needs the full TensorFlow runtime)')
+
+    bench_parser = commands.add_parser('benchmark', help='compare exported models against the Keras model')
+    bench_parser.add_argument('model')
+    bench_parser.add_argument('--windows', help='.npy file of scaled windows (random windows if omitted)')
+    bench_parser.add_argument('--batch-size', type=int, default=500)
+    bench_parser.add_argument('--repeats', type=int, default=50)
+
+    measure_parser = commands.add_parser('measure')
+    measure_parser.add_argument('model')
+    measure_parser.add_argument('windows')
+    measure_parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == 'measure':
+        print(json.dumps(_measure(args.model, args.windows, args.repeats)))
+    elif args.command == 'export':
+        from tensorflow.keras.models import load_model
+        model = load_model(args.model, compile=False)
+        base = os.path.splitext(args.model)[0]
+        calibration = np.load(args.calibration) if args.calibration else None
+        if 'onnx' in args.formats:
+            print('Wrote', export_onnx(model, base + '.onnx', quantize=bool(args.quantize)))
+        if 'tflite' in args.formats:
+            print('Wrote', export_tflite(model, base + '.tflite', args.quantize, calibration, args.allow_tf_ops))
+    else:
+        base = os.path.splitext(args.model)[0]
+        exported = [base + extension for extension in EXPORT_EXTENSIONS if os.path.exists(base + extension)]
+        if args.windows:
+            windows = np.load(args.windows)
+        else:
+            from tensorflow.keras.models import load_model
+            window = load_model(args.model, compile=False).input_shape[1]
+            windows = np.random.default_rng(0).random((args.batch_size, window, 1), dtype=np.float32)
+        benchmark(args.model, exported, windows, args.repeats)
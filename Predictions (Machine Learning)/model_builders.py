@@ -0,0 +1,56 @@
+import numpy as np
+
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from instrumentation import span, timed
+
+KERAS_MODEL_TYPES = ('gru', 'lstm')
+MODEL_TYPES = KERAS_MODEL_TYPES + ('xgboost',)
+
+
+# Function to split a scaled series into (window, next value) samples without a Python loop
+def make_windows(series, window):
+    series = np.asarray(series, dtype=np.float32).reshape(-1)
+    x = np.lib.stride_tricks.sliding_window_view(series[:-1], window)
+    y = series[window:]
+    return x, y
+
+
+# Function to build a model of the given type with the same layouts as the prediction scripts
+def build_model(model_type, window, units=(128, 64, 64), dropout=0.2, n_estimators=100, n_jobs=None, **xgb_params):
+    if model_type == 'xgboost':
+        from xgboost import XGBRegressor
+        return XGBRegressor(objective='reg:squarederror', n_estimators=n_estimators, random_state=42, n_jobs=n_jobs,
+                            **xgb_params)
+
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense, GRU, LSTM, Dropout, Input
+    layer = GRU if model_type == 'gru' else LSTM
+
+    model = Sequential()
+    model.add(Input(shape=(window, 1)))
+    for i, size in enumerate(units):
+        model.add(layer(size, return_sequences=i < len(units) - 1))
+        model.add(Dropout(dropout))
+    if model_type == 'lstm':
+        model.add(Dense(25))
+    model.add(Dense(1))
+    return model
+
+
+# Function to fit a model built by build_model; Keras models go through the shared training pipeline
+def fit_model(model, model_type, x, y, **train_kwargs):
+    if model_type == 'xgboost':
+        with span('train', model='xgboost'):
+            model.fit(x, y)
+        return {}
+    from training_pipeline import train_model
+    history, stats = train_model(model, x[..., np.newaxis], y, **train_kwargs)
+    return stats
+
+
+# Function to predict one step ahead for a batch of windows
+@timed('predict', kind='one_step')
+def predict(model, model_type, x):
+    if model_type == 'xgboost':
+        return np.asarray(model.predict(x)).reshape(-1)
+    return np.asarray(model.predict(x[..., np.newaxis], batch_size=1024, verbose=0)).reshape(-1)
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+import numpy as np
+
+REGISTRY_DIR = 'model_registry'
+
+
+# Function to fingerprint a price series so we can tell whether history was revised
+def fingerprint(values):
+    return hashlib.sha1(np.ascontiguousarray(values, dtype=np.float64).tobytes()).hexdigest()
+
+
+# Function to capture scaler parameters as plain JSON
+def scaler_params(scaler):
+    if hasattr(scaler, 'data_min_'):
+        return {'type': 'minmax', 'min': scaler.data_min_.tolist(), 'max': scaler.data_max_.tolist(),
+                'feature_range': list(scaler.feature_range)}
+    return {'type': 'standard', 'mean': np.asarray(scaler.mean).reshape(-1).tolist(),
+            'variance': np.asarray(scaler.variance).reshape(-1).tolist()}
+
+
+# Function to rebuild a scaler from stored parameters
+def restore_scaler(params):
+    if params['type'] == 'minmax':
+        from sklearn.preprocessing import MinMaxScaler
+        scaler = MinMaxScaler(feature_range=tuple(params['feature_range']))
+        # Fitting on the stored extremes reproduces the original transform exactly
+        scaler.fit(np.array([params['min'], params['max']]))
+        return scaler
+    import tensorflow as tf
+    return tf.keras.layers.Normalization(axis=-1, mean=params['mean'], variance=params['variance'])
+
+
+# Local store of trained models keyed by (ticker, model type, window, feature set, data start).
+# Every save is a new version holding the model, scaler parameters and metrics.
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_DIR, keep=3):
+        self.root = root
+        self.keep = keep
+        os.makedirs(root, exist_ok=True)
+
+    # Function to build the registry key for a model configuration
+    def key(self, ticker, model_type, window, features, data_start):
+        raw = json.dumps([ticker, model_type, window, list(features), str(data_start)])
+        return f"{ticker}_{model_type}_{window}_{hashlib.sha1(raw.encode()).hexdigest()[:10]}"
+
+    def _versions(self, key):
+        path = os.path.join(self.root, key)
+        if not os.path.isdir(path):
+            return []
+        return sorted(v for v in os.listdir(path) if os.path.exists(os.path.join(path, v, 'meta.json')))
+
+    # Function to read the metadata of the latest version for a key
+    def latest(self, key):
+        versions = self._versions(key)
+        if not versions:
+            return None
+        with open(os.path.join(self.root, key, versions[-1], 'meta.json')) as f:
+            return json.load(f)
+
+    # Function to compare the latest version against the current data.
+    # Returns (entry, status) with status 'missing', 'changed', 'current' or 'advanced'.
+    def resolve(self, key, values):
+        entry = self.latest(key)
+        if entry is None:
+            return None, 'missing'
+        num_rows = entry['num_rows']
+        if len(values) < num_rows or fingerprint(values[:num_rows]) != entry['fingerprint']:
+            return entry, 'changed'
+        if len(values) == num_rows:
+            return entry, 'current'
+        return entry, 'advanced'
+
+    # Function to store a new version of a model
+    def save(self, key, model, values, scaler, metrics, **extra):
+        version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        path = os.path.join(self.root, key, version)
+        os.makedirs(path)
+
+        if hasattr(model, 'get_booster'):
+            model_file = 'model.json'
+            model.save_model(os.path.join(path, model_file))
+        else:
+            model_file = 'model.keras'
+            model.save(os.path.join(path, model_file))
+
+        entry = {
+            'key': key,
+            'version': version,
+            'model_file': model_file,
+            'num_rows': len(values),
+            'fingerprint': fingerprint(values),
+            'scaler': scaler_params(scaler),
+            'metrics': metrics,
+            'saved_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        entry.update(extra)
+        # meta.json is written last so a half-written version is never picked up
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(entry, f, indent=2)
+
+        for old in self._versions(key)[:-self.keep]:
+            shutil.rmtree(os.path.join(self.root, key, old), ignore_errors=True)
+        return entry
+
+    # Function to load the model stored with a registry entry
+    def load_model(self, entry):
+        path = os.path.join(self.root, entry['key'], entry['version'], entry['model_file'])
+        if entry['model_file'].endswith('.json'):
+            from xgboost import XGBRegressor
+            model = XGBRegressor()
+            model.load_model(path)
+            return model
+        from tensorflow.keras.models import load_model
+        return load_model(path)
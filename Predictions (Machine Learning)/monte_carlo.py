@@ -0,0 +1,195 @@
+import argparse
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from feature_store import STORE_DIR, FeatureStore
+
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from instrumentation import worker_task
+
+PERCENTILES = (5, 25, 50, 75, 95)
+HORIZONS = (10, 30)
+METHODS = ('gbm', 'block', 'residual')
+RESULTS_FILE = os.path.join('monte_carlo', 'bands.csv')
+# Columns of a simulated row (simulate_ticker), so a run where nothing could be simulated still has them
+RESULT_COLUMNS = ['ticker', 'horizon', 'last_close', 'prob_up'] + [f"p{p}" for p in PERCENTILES]
+
+
+# Function to compute daily log returns as float32
+def log_returns(closes):
+    closes = np.asarray(closes, dtype=np.float64).reshape(-1)
+    return np.diff(np.log(closes)).astype(np.float32)
+
+
+# Function to compute one-step model residuals as log(actual / predicted)
+def model_residuals(actual, predicted):
+    actual = np.asarray(actual, dtype=np.float64).reshape(-1)
+    predicted = np.asarray(predicted, dtype=np.float64).reshape(-1)
+    return np.log(actual / predicted).astype(np.float32)
+
+
+# Function to draw one chunk of log-return increments with shape (n, horizon)
+def _draw_increments(rng, method, returns, n, horizon, block_size):
+    if method == 'gbm':
+        # Normal log returns with the historical drift and volatility
+        increments = rng.standard_normal((n, horizon), dtype=np.float32)
+        increments *= np.float32(returns.std())
+        increments += np.float32(returns.mean())
+        return increments
+    if method == 'block':
+        # Contiguous blocks of history keep short-range autocorrelation and volatility clusters
+        block_size = min(block_size, len(returns))
+        n_blocks = -(-horizon // block_size)
+        starts = rng.integers(0, len(returns) - block_size + 1, size=(n, n_blocks))
+        index = (starts[..., np.newaxis] + np.arange(block_size)).reshape(n, -1)[:, :horizon]
+        return returns[index]
+    # 'residual': independent draws from the model's one-step residuals
+    return returns[rng.integers(0, len(returns), size=(n, horizon))]
+
+
+# Function to simulate price paths of shape (n_paths, horizon) in float32.
+# Paths start from last_price, or follow the model forecast `center` when one is given; chunks cap the
+# temporary arrays so memory stays at the size of the output.
+def simulate_paths(last_price, returns, horizon=30, n_paths=10000, method='gbm', block_size=5, center=None,
+                   chunk_size=5000, seed=None):
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method}, expected one of {METHODS}")
+    returns = np.asarray(returns, dtype=np.float32).reshape(-1)
+    if len(returns) < 2:
+        raise ValueError('Need at least two returns to simulate')
+    if center is not None:
+        base = np.log(np.asarray(center, dtype=np.float32).reshape(-1)[:horizon])
+        horizon = len(base)
+    else:
+        base = np.float32(np.log(last_price))
+
+    rng = np.random.default_rng(seed)
+    paths = np.empty((n_paths, horizon), dtype=np.float32)
+    for begin in range(0, n_paths, chunk_size):
+        chunk = paths[begin:begin + chunk_size]
+        np.cumsum(_draw_increments(rng, method, returns, len(chunk), horizon, block_size), axis=1, out=chunk)
+        chunk += base
+        np.exp(chunk, out=chunk)
+    return paths
+
+
+# Function to get percentile bands of shape (len(percentiles), horizon) from simulated paths
+def percentile_bands(paths, percentiles=PERCENTILES):
+    return np.percentile(paths, percentiles, axis=0).astype(np.float32)
+
+
+# Function to turn bands into a DataFrame with one column per percentile (p5, p25, ...)
+def bands_frame(bands, index=None, percentiles=PERCENTILES):
+    return pd.DataFrame(np.asarray(bands).T, index=index, columns=[f"p{p}" for p in percentiles])
+
+
+# Function to get forecast bands by resampling the validation residuals around the model's forecast
+def residual_bands(forecast, actual, predicted, n_paths=10000, percentiles=PERCENTILES, index=None, seed=42):
+    paths = simulate_paths(None, model_residuals(actual, predicted), n_paths=n_paths, method='residual',
+                           center=forecast, seed=seed)
+    return bands_frame(percentile_bands(paths, percentiles), index, percentiles)
+
+
+# Function to shade the 5-95 and 25-75 percentile bands on a plot
+def plot_bands(bands, ax=None, color='red'):
+    if ax is None:
+        import matplotlib.pyplot as plt
+        ax = plt.gca()
+    ax.fill_between(bands.index, bands['p5'], bands['p95'], color=color, alpha=0.1)
+    ax.fill_between(bands.index, bands['p25'], bands['p75'], color=color, alpha=0.2)
+
+
+# Function to simulate one ticker from its memory-mapped closes and summarize each horizon's end point
+@worker_task
+def simulate_ticker(ticker, cache_path, horizons=HORIZONS, n_paths=10000, method='gbm', block_size=5,
+                    lookback=252, seed=None):
+    closes = np.load(cache_path, mmap_mode='r')[-(lookback + 1):]
+    last_close = float(closes[-1])
+    paths = simulate_paths(last_close, log_returns(closes), max(horizons), n_paths, method, block_size, seed=seed)
+
+    rows = []
+    for horizon in horizons:
+        terminal = paths[:, horizon - 1]
+        row = {'ticker': ticker, 'horizon': horizon, 'last_close': last_close,
+               'prob_up': float(np.mean(terminal > last_close))}
+        row.update({f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(terminal, PERCENTILES))})
+        rows.append(row)
+    return rows
+
+
+# Function to fetch S&P 500 stock tickers
+def get_sp500_tickers():
+    from bs4 import BeautifulSoup
+    from data_providers import sp500_html
+    soup = BeautifulSoup(sp500_html(), 'html.parser')
+    table = soup.find('table', {'id': 'constituents'})
+    # Yahoo uses dashes for share classes (BRK.B -> BRK-B)
+    return [row.find_all('td')[0].text.strip().replace('.', '-') for row in table.find_all('tr')[1:]]
+
+
+# Function to fill the feature store for many tickers with a single batched download
+def materialize_universe(tickers, start, store_dir=STORE_DIR, max_age=12 * 3600):
+    store = FeatureStore(store_dir)
+    stale = [t for t in tickers
+             if not (store.entry(t, start) and time.time() - store.entry(t, start)['materialized_at'] < max_age)]
+    if stale:
+        from data_providers import download
+        # A list of tickers always gives (ticker, field) columns with group_by='ticker', even for one ticker
+        data = download(stale, start=start, group_by='ticker', progress=False, threads=True)
+        for ticker in stale:
+            try:
+                frame = data[ticker].dropna(subset=['Close'])
+                if len(frame) > 1:
+                    store.materialize(ticker, start, frame=frame)
+            except KeyError:
+                print(f"No data for {ticker}")
+    return {t: store.path(t, start) for t in tickers if store.entry(t, start)}
+
+
+# Function to simulate a whole universe of tickers across cores and save the bands
+def simulate_universe(tickers, start='2022-04-01', horizons=HORIZONS, n_paths=10000, method='gbm', block_size=5,
+                      workers=None, seed=42, results_file=RESULTS_FILE):
+    from train_watchlist import init_worker
+    started = time.perf_counter()
+    paths = materialize_universe(tickers, start)
+    loaded = time.perf_counter()
+
+    rows = []
+    context = mp.get_context('spawn')
+    counter = context.Value('i', 0)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context,
+                             initializer=init_worker, initargs=(1, counter, False)) as executor:
+        futures = {executor.submit(simulate_ticker, ticker, path, horizons, n_paths, method, block_size,
+                                   seed=seed + i): ticker
+                   for i, (ticker, path) in enumerate(paths.items())}
+        for future in as_completed(futures):
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                print(f"Error simulating {futures[future]}: {e}")
+
+    results = pd.DataFrame(rows, columns=RESULT_COLUMNS).sort_values(['ticker', 'horizon'])
+    os.makedirs(os.path.dirname(results_file) or '.', exist_ok=True)
+    results.to_csv(results_file, index=False)
+    print(f"{len(paths)} tickers x {n_paths} paths: data {loaded - started:.1f}s, "
+          f"simulation {time.perf_counter() - loaded:.1f}s")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monte Carlo price bands for a list of tickers (default: S&P 500).')
+    parser.add_argument('--tickers', nargs='+', default=None)
+    parser.add_argument('--method', choices=['gbm', 'block'], default='gbm')
+    parser.add_argument('--paths', type=int, default=10000)
+    parser.add_argument('--block-size', type=int, default=5)
+    parser.add_argument('--horizons', nargs='+', type=int, default=list(HORIZONS))
+    parser.add_argument('--start', default='2022-04-01')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    simulate_universe(args.tickers or get_sp500_tickers(), args.start, tuple(args.horizons), args.paths, args.method,
+                      args.block_size, args.workers, results_file=args.output)
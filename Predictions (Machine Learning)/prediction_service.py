@@ -0,0 +1,233 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from feature_store import FeatureStore
+from forecasting import multi_step_forecast
+
+DEFAULT_MODELS = {'lstm': 'LSTM_sercan.h5'}
+
+
+# Raised (through the request's Future) when there are no prices for a ticker
+class UnknownTicker(LookupError):
+    pass
+
+
+# A forecast request; its input window and scaler bounds are filled in before it joins the batching queue
+class _Request:
+    def __init__(self, ticker, horizon):
+        self.ticker = ticker
+        self.horizon = horizon
+        self.window = None
+        self.low = self.high = None
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+        self.queued = None
+
+
+# In-process prediction service: requests are queued per model and coalesced into micro-batches,
+# so many concurrent callers share one batched forward pass (or one compiled rollout).
+class PredictionService:
+    def __init__(self, models=None, start='2022-04-01', max_batch_size=64, max_wait_ms=5.0, store=None,
+                 feature_workers=8):
+        from inference_export import load_inference_model
+        self.start = start
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.store = store or FeatureStore()
+        self.models = {name: load_inference_model(path) for name, path in (models or DEFAULT_MODELS).items()}
+        self.queues = {name: queue.Queue() for name in self.models}
+        self.latencies = {name: deque(maxlen=10000) for name in self.models}
+        self.batch_sizes = {name: Counter() for name in self.models}
+        self._lock = threading.Lock()
+        # Features are loaded here, never on a batching thread: a cold ticker's download would stall every
+        # request queued behind it. Requests for a ticker that is already loading share that load.
+        self._feature_pool = ThreadPoolExecutor(feature_workers, thread_name_prefix='features')
+        self._loading = {}
+        self._running = True
+        self._workers = [threading.Thread(target=self._serve, args=(name,), daemon=True) for name in self.models]
+        for worker in self._workers:
+            worker.start()
+
+    # Function to queue forecasts for several tickers at once and return their Futures. Each request joins
+    # the model's batching queue as soon as its ticker's features are loaded (at once for stored tickers).
+    def submit_many(self, model_name, tickers, horizon=10):
+        if model_name not in self.models:
+            raise KeyError(f"Unknown model {model_name}")
+        window_len = self.models[model_name].input_shape[1]
+        requests = [_Request(ticker, horizon) for ticker in tickers]
+        for request in requests:
+            self._features(request.ticker, window_len).add_done_callback(
+                lambda loaded, request=request: self._enqueue(model_name, request, loaded))
+        return [request.future for request in requests]
+
+    # Function to queue a forecast for one ticker and return a Future with the predicted prices
+    def submit(self, model_name, ticker, horizon=10):
+        return self.submit_many(model_name, [ticker], horizon)[0]
+
+    # Function to forecast several tickers and wait for all of them
+    def predict(self, model_name, tickers, horizon=10, timeout=60):
+        futures = dict(zip(tickers, self.submit_many(model_name, tickers, horizon)))
+        return {ticker: future.result(timeout=timeout) for ticker, future in futures.items()}
+
+    # Function to get a Future with a ticker's last input window and scaler bounds, starting the load on the
+    # feature pool unless the same load is already running
+    def _features(self, ticker, window_len):
+        with self._lock:
+            loading = self._loading.get((ticker, window_len))
+            if loading is None:
+                loading = self._feature_pool.submit(self._load_features, ticker, window_len)
+                self._loading[(ticker, window_len)] = loading
+                loading.add_done_callback(lambda _: self._forget(ticker, window_len))
+            return loading
+
+    def _forget(self, ticker, window_len):
+        with self._lock:
+            self._loading.pop((ticker, window_len), None)
+
+    # Function to read a ticker's features from the store, downloading them first when missing or stale
+    def _load_features(self, ticker, window_len):
+        try:
+            entry = self.store.materialize(ticker, self.start)
+        except LookupError as e:
+            raise UnknownTicker(f"No prices for {ticker}") from e
+        except ValueError as e:
+            # An empty download (yfinance's answer for an unknown symbol) has no min or max to scale by
+            raise UnknownTicker(f"No prices for {ticker}") from e
+        series = self.store.open(ticker, self.start, scaled=True)
+        return np.array(series[-window_len:]), entry['scaler']['min'][0], entry['scaler']['max'][0]
+
+    # Function to hand a request with loaded features to its model's batching queue (a failed load fails it)
+    def _enqueue(self, name, request, loaded):
+        error = loaded.exception()
+        if error is not None:
+            request.future.set_exception(error)
+            return
+        request.window, request.low, request.high = loaded.result()
+        request.queued = time.perf_counter()
+        self.queues[name].put(request)
+
+    # Function to collect requests until the batch is full or the oldest request has waited max_wait
+    def _next_batch(self, name):
+        batch = [self.queues[name].get()]
+        if batch[0] is None:
+            return batch
+        deadline = batch[0].queued + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queues[name].get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    # Worker loop: one batched forecast per micro-batch
+    def _serve(self, name):
+        model = self.models[name]
+        while self._running:
+            # close() wakes the worker with a None sentinel
+            batch = [r for r in self._next_batch(name) if r is not None]
+            if not batch:
+                break
+            try:
+                horizon = max(r.horizon for r in batch)
+                scaled = multi_step_forecast(model, np.stack([r.window for r in batch]), horizon)
+                for request, values in zip(batch, scaled):
+                    prices = values[:request.horizon] * ((request.high - request.low) or 1.0) + request.low
+                    request.future.set_result(prices.tolist())
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+
+            done = time.perf_counter()
+            with self._lock:
+                self.batch_sizes[name][len(batch)] += 1
+                self.latencies[name].extend(done - r.enqueued for r in batch)
+
+    # Function to report latency percentiles (ms) and the batch-size histogram per model
+    def stats(self):
+        with self._lock:
+            report = {}
+            for name in self.models:
+                latencies = np.array(self.latencies[name]) * 1000
+                report[name] = {
+                    'requests': int(len(latencies)),
+                    'batch_size_histogram': dict(sorted(self.batch_sizes[name].items())),
+                    'max_batch_size': self.max_batch_size,
+                    'max_wait_ms': self.max_wait * 1000,
+                }
+                if len(latencies):
+                    report[name].update({f"latency_p{p}_ms": float(np.percentile(latencies, p)) for p in (50, 90, 99)})
+            return report
+
+    def close(self):
+        self._running = False
+        self._feature_pool.shutdown(wait=False)
+        for q in self.queues.values():
+            q.put(None)
+
+
+# Function to build the HTTP handler for a service
+# (POST /predict {"model": "lstm", "tickers": ["AMD"], "horizon": 30}, GET /stats)
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._send(200, service.stats())
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send(404, {'error': 'not found'})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                results = service.predict(request['model'], request['tickers'], int(request.get('horizon', 10)))
+                self._send(200, {'model': request['model'], 'forecasts': results})
+            except UnknownTicker as e:
+                self._send(404, {'error': str(e)})
+            except KeyError as e:
+                self._send(400, {'error': f"missing or unknown {e}"})
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Micro-batching forecast service.')
+    parser.add_argument('--model', action='append', default=None, metavar='NAME=PATH',
+                        help='model to serve, e.g. lstm=LSTM_sercan.h5 (repeatable)')
+    parser.add_argument('--start', default='2022-04-01')
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--port', type=int, default=8500)
+    args = parser.parse_args()
+
+    models = dict(m.split('=', 1) for m in args.model) if args.model else DEFAULT_MODELS
+    service = PredictionService(models, args.start, args.max_batch_size, args.max_wait_ms)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(service))
+    print(f"Serving {', '.join(models)} on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    finally:
+        service.close()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+import data_providers
+import monte_carlo
+from hyperparameter_search import TrialHistory, best_trials
+from data_providers import ReplayProvider, save_bars
+
+# Offline tests: run with `python tests.py` from this folder. Prices come from the replay provider.
+
+
+# Function to build `rows` business days of synthetic OHLCV bars
+def synthetic_bars(rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    index = pd.bdate_range('2022-01-03', periods=rows, tz='America/New_York')
+    return pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                         'Volume': 1000}, index=index)
+
+
+# Test case that runs in a scratch folder with a replay provider reading recordings/ there
+class ReplayTestCase(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.folder)
+        self.recordings = os.path.join(self.folder, 'recordings')
+        self.addCleanup(data_providers.set_provider, data_providers._provider)
+        data_providers.set_provider(ReplayProvider(self.recordings))
+
+
+class MonteCarloUniverseTests(ReplayTestCase):
+    def test_one_ticker_universe_is_materialized(self):
+        save_bars(synthetic_bars(), 'AAA', self.recordings)
+        paths = monte_carlo.materialize_universe(['AAA'], '2022-01-03', store_dir='store')
+        self.assertEqual(list(paths), ['AAA'])
+        self.assertEqual(len(np.load(paths['AAA'])), 300)
+
+    def test_one_ticker_universe_is_simulated(self):
+        save_bars(synthetic_bars(), 'AAA', self.recordings)
+        results = monte_carlo.simulate_universe(['AAA'], '2022-01-03', horizons=(5, 10), n_paths=200, workers=1,
+                                                results_file='bands.csv')
+        self.assertEqual(list(results['ticker']), ['AAA', 'AAA'])
+        self.assertEqual(list(results['horizon']), [5, 10])
+        self.assertTrue((results['p5'] <= results['p95']).all())
+
+    def test_empty_universe_keeps_columns(self):
+        results = monte_carlo.simulate_universe([], '2022-01-03', n_paths=200, workers=1, results_file='bands.csv')
+        self.assertTrue(results.empty)
+        self.assertEqual(list(results.columns), monte_carlo.RESULT_COLUMNS)
+        self.assertEqual(list(pd.read_csv('bands.csv').columns), monte_carlo.RESULT_COLUMNS)
+
+
+
+class BestTrialsTests(unittest.TestCase):
+    def test_failed_trials_are_left_out(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        history = TrialHistory(os.path.join(folder.name, 'trials.jsonl'))
+        for tid, budget, loss in (('a', 3, 0.2), ('b', 9, float('inf')), ('c', 9, 0.5), ('d', 3, 0.1)):
+            history.add({'trial_id': tid, 'budget': budget, 'val_loss': loss, 'params': {}})
+
+        # Reloaded from disk, as a resumed search sees it
+        best = best_trials(TrialHistory(history.path))
+        self.assertEqual([r['trial_id'] for r in best], ['c', 'd', 'a'])
+
+    def test_no_finished_trials(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        history = TrialHistory(os.path.join(folder.name, 'trials.jsonl'))
+        history.add({'trial_id': 'a', 'budget': 1, 'val_loss': float('inf'), 'params': {}})
+        self.assertEqual(best_trials(history), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
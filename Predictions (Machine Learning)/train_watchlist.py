@@ -0,0 +1,223 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from feature_store import FeatureStore
+from instrumentation import worker_task
+from model_builders import MODEL_TYPES
+from model_registry import fingerprint
+
+# Nothing that imports TensorFlow or XGBoost is imported at module level: worker processes
+# must set their thread limits before those libraries start their thread pools.
+
+WATCHLIST = ['AMD', 'LLY', 'SOUN', 'DELL']
+OUTPUT_DIR = 'watchlist_runs'
+
+_worker_threads = 1
+
+
+# Function to cap intra-op threads in a worker and pin it to its own block of cores
+def init_worker(threads, counter, pin):
+    global _worker_threads
+    _worker_threads = threads
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS'):
+        os.environ[var] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+
+    with counter.get_lock():
+        slot = counter.value
+        counter.value += 1
+    if pin and hasattr(os, 'sched_setaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+        first = (slot * threads) % len(cpus)
+        os.sched_setaffinity(0, {cpus[(first + i) % len(cpus)] for i in range(threads)})
+
+
+# Function to get the checkpoint path for a ticker
+def checkpoint_path(output_dir, model_type, ticker):
+    return os.path.join(output_dir, model_type, f"{ticker}.json")
+
+
+# Function to tell whether a ticker's checkpoint was made from the given data and settings
+def checkpoint_current(path, data_fingerprint, start, window):
+    if not os.path.exists(path):
+        return False
+    with open(path) as f:
+        done = json.load(f)
+    return (done.get('data_fingerprint'), done.get('start'), done.get('window')) == (data_fingerprint, str(start), window)
+
+
+# Function to train (or warm-start) one ticker and checkpoint its metrics
+@worker_task
+def train_ticker(ticker, model_type, start, window, epochs, batch_size, output_dir):
+    from model_builders import make_windows, build_model, fit_model, predict
+    from model_registry import ModelRegistry, restore_scaler
+    if model_type != 'xgboost':
+        from training_pipeline import configure_threads
+        configure_threads(_worker_threads, 1)
+
+    started = time.perf_counter()
+    # Download once into the shared feature store; later runs and other workers memory-map it
+    store = FeatureStore()
+    stored = store.materialize(ticker, start)
+    closes = np.asarray(store.open(ticker, start), dtype=np.float64)
+    if len(closes) < 2 * window:
+        raise ValueError(f"Not enough history for {ticker}: {len(closes)} rows")
+
+    registry = ModelRegistry()
+    registry_key = registry.key(ticker, model_type, window, ['Close'], start)
+    entry, status = registry.resolve(registry_key, closes)
+
+    if status in ('current', 'advanced'):
+        scaler = restore_scaler(entry['scaler'])
+        scaled = scaler.transform(closes.reshape(-1, 1))[:, 0]
+    else:
+        scaler = store.scaler(ticker, start)
+        scaled = store.open(ticker, start, scaled=True)
+
+    # Same 95/5 split as the prediction scripts; sample j predicts bar j + window
+    training_data_len = int(np.ceil(len(closes) * .95))
+    x, y = make_windows(scaled, window)
+    num_train = training_data_len - window
+    x_train, y_train = x[:num_train], y[:num_train]
+
+    train_stats = {}
+    if status == 'current':
+        model = registry.load_model(entry)
+    elif status == 'advanced':
+        model = registry.load_model(entry)
+        first_new = max(entry['num_train_rows'] - window, 0)
+        if first_new < len(x_train):
+            if model_type == 'xgboost':
+                model.set_params(n_estimators=20)
+                model.fit(x_train[first_new:], y_train[first_new:], xgb_model=model.get_booster())
+            else:
+                train_stats = fit_model(model, model_type, x_train[first_new:], y_train[first_new:],
+                                        batch_size=batch_size, epochs=max(epochs // 10, 1),
+                                        validation_split=0, patience=0, base_lr=1e-4)
+    else:
+        model = build_model(model_type, window, n_jobs=_worker_threads)
+        train_stats = fit_model(model, model_type, x_train, y_train, batch_size=batch_size, epochs=epochs)
+
+    predictions = scaler.inverse_transform(predict(model, model_type, x[num_train:]).reshape(-1, 1))[:, 0]
+    actual = closes[training_data_len:]
+    rmse = float(np.sqrt(np.mean((predictions - actual) ** 2)))
+    mae = float(np.mean(np.abs(predictions - actual)))
+
+    if status != 'current':
+        registry.save(registry_key, model, closes, scaler, {'rmse': rmse, 'mae': mae},
+                      num_train_rows=training_data_len)
+
+    result = {
+        'ticker': ticker,
+        'model_type': model_type,
+        'registry_status': status,
+        'start': str(start),
+        'window': window,
+        'rows': len(closes),
+        'last_date': stored['last_date'],
+        'data_fingerprint': fingerprint(closes),
+        'rmse': rmse,
+        'mae': mae,
+        'epochs_run': train_stats.get('epochs_run', 0),
+        'samples_per_second': train_stats.get('samples_per_second', 0.0),
+        'wall_time': time.perf_counter() - started,
+        'worker_pid': os.getpid(),
+    }
+
+    # Write the checkpoint atomically so an interrupted run never leaves a half-written file
+    path = checkpoint_path(output_dir, model_type, ticker)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(result, f, indent=2)
+    os.replace(path + '.tmp', path)
+    return result
+
+
+# Function to merge all per-ticker checkpoints into one metrics table
+def write_metrics_table(output_dir, model_type):
+    folder = os.path.join(output_dir, model_type)
+    rows = []
+    for name in sorted(os.listdir(folder)):
+        if name.endswith('.json'):
+            with open(os.path.join(folder, name)) as f:
+                rows.append(json.load(f))
+    table = pd.DataFrame(rows)
+    table.to_csv(os.path.join(output_dir, f"{model_type}_metrics.csv"), index=False)
+    return table
+
+
+# Function to train a model type for many tickers across a process pool
+def train_watchlist(tickers, model_type='gru', workers=None, threads_per_worker=1, start='2022-04-01',
+                    window=60, epochs=50, batch_size=64, output_dir=OUTPUT_DIR, pin=True):
+    os.makedirs(os.path.join(output_dir, model_type), exist_ok=True)
+    workers = workers or max((os.cpu_count() or 1) // threads_per_worker, 1)
+
+    # Resume: skip tickers whose checkpoint was made from the data now in the feature store (fresh entries are
+    # not downloaded again), so an interrupted run picks up where it stopped while new bars still retrain
+    store = FeatureStore()
+    pending = []
+    failures = {}
+    for ticker in tickers:
+        try:
+            store.materialize(ticker, start)
+            data_fingerprint = fingerprint(np.asarray(store.open(ticker, start), dtype=np.float64))
+        except Exception as e:
+            failures[ticker] = str(e)
+            print(f"Error downloading {ticker}: {e}")
+            continue
+        if not checkpoint_current(checkpoint_path(output_dir, model_type, ticker), data_fingerprint, start, window):
+            pending.append(ticker)
+    print(f"{len(tickers) - len(pending) - len(failures)} tickers up to date, training {len(pending)} "
+          f"with {workers} workers x {threads_per_worker} threads")
+
+    started = time.perf_counter()
+    # Spawned workers start clean instead of inheriting a forked TensorFlow runtime
+    context = mp.get_context('spawn')
+    counter = context.Value('i', 0)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=init_worker, initargs=(threads_per_worker, counter, pin)) as executor:
+        futures = {executor.submit(train_ticker, t, model_type, start, window, epochs, batch_size, output_dir): t
+                   for t in pending}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                result = future.result()
+                print(f"{ticker}: RMSE {result['rmse']:.3f} ({result['registry_status']}, {result['wall_time']:.1f}s)")
+            except Exception as e:
+                failures[ticker] = str(e)
+                print(f"Error training {ticker}: {e}")
+
+    elapsed = time.perf_counter() - started
+    table = write_metrics_table(output_dir, model_type)
+    if pending and not table.empty:
+        busy = table[table['ticker'].isin(pending)]['wall_time'].sum()
+        print(f"Finished in {elapsed:.1f}s (parallel speedup {busy / elapsed:.1f}x)")
+    return table, failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train one model type for a list of tickers in parallel.')
+    parser.add_argument('--model', choices=MODEL_TYPES, default='gru')
+    parser.add_argument('--tickers', nargs='+', default=WATCHLIST)
+    parser.add_argument('--tickers-file', help='text file with one ticker per line')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--start', default='2022-04-01')
+    parser.add_argument('--window', type=int, default=60)
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--no-pin', action='store_true', help='do not pin workers to CPU cores')
+    args = parser.parse_args()
+
+    tickers = args.tickers
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers = [line.strip().upper() for line in f if line.strip()]
+
+    train_watchlist(tickers, args.model, args.workers, args.threads_per_worker, args.start,
+                    args.window, args.epochs, args.batch_size, args.output_dir, pin=not args.no_pin)
@@ -0,0 +1,117 @@
+import time
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback, EarlyStopping
+from tensorflow.keras.optimizers import Adam
+
+import repo_path  # noqa: F401  (puts the repository root on sys.path)
+from instrumentation import timed
+
+# Reference point for learning-rate scaling (Adam defaults at batch size 32)
+BASE_BATCH_SIZE = 32
+BASE_LEARNING_RATE = 1e-3
+
+
+# Function to set TensorFlow thread pools (0 lets TensorFlow pick)
+def configure_threads(intra_op_threads=0, inter_op_threads=0):
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        # Thread pools can only be changed before the TensorFlow runtime starts
+        print(f"Could not configure TensorFlow threads: {e}")
+
+
+# Function to scale the learning rate with the batch size
+def scaled_learning_rate(batch_size, base_lr=BASE_LEARNING_RATE, base_batch_size=BASE_BATCH_SIZE, rule='sqrt'):
+    ratio = batch_size / base_batch_size
+    if rule == 'linear':
+        return base_lr * ratio
+    if rule == 'sqrt':
+        return base_lr * np.sqrt(ratio)
+    return base_lr
+
+
+# Function to build a streaming input pipeline with shuffling and prefetching
+def make_dataset(x, y, batch_size, shuffle=True, seed=42):
+    dataset = tf.data.Dataset.from_tensor_slices((np.asarray(x, dtype=np.float32), np.asarray(y, dtype=np.float32)))
+    if shuffle:
+        dataset = dataset.shuffle(buffer_size=len(x), seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+# Callback to record epoch wall time and samples/second
+class ThroughputLogger(Callback):
+    def __init__(self, num_samples):
+        super().__init__()
+        self.num_samples = num_samples
+        self.epoch_times = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._start
+        self.epoch_times.append(elapsed)
+        print(f"Epoch {epoch + 1}: {elapsed:.2f}s, {self.num_samples / elapsed:.0f} samples/s")
+
+    def summary(self):
+        times = np.array(self.epoch_times)
+        return {
+            'epochs_run': len(times),
+            'total_time': float(times.sum()),
+            'mean_epoch_time': float(times.mean()) if len(times) else 0.0,
+            'samples_per_second': float(self.num_samples / times.mean()) if len(times) else 0.0,
+        }
+
+
+# Function to compile and train a Keras model with the high-throughput settings
+@timed('train', model='keras')
+def train_model(model, x_train, y_train, batch_size=64, epochs=50, validation_split=0.1, patience=5,
+                base_lr=BASE_LEARNING_RATE, lr_rule='sqrt', loss='mean_squared_error',
+                intra_op_threads=None, inter_op_threads=None, callbacks=None, verbose=0,
+                checkpoint_dir=None, scaler=None, keep_checkpoints=3):
+    if intra_op_threads is not None or inter_op_threads is not None:
+        configure_threads(intra_op_threads or 0, inter_op_threads or 0)
+
+    # Hold out the most recent samples for validation (no shuffling across time)
+    num_val = int(len(x_train) * validation_split)
+    if num_val > 0:
+        x_fit, y_fit = x_train[:-num_val], y_train[:-num_val]
+        val_data = make_dataset(x_train[-num_val:], y_train[-num_val:], batch_size, shuffle=False)
+        monitor = 'val_loss'
+    else:
+        x_fit, y_fit = x_train, y_train
+        val_data = None
+        monitor = 'loss'
+
+    learning_rate = scaled_learning_rate(batch_size, base_lr, rule=lr_rule)
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss=loss)
+
+    throughput = ThroughputLogger(len(x_fit))
+    all_callbacks = [throughput]
+    early_stopping = None
+    if patience:
+        early_stopping = EarlyStopping(monitor=monitor, patience=patience, restore_best_weights=True)
+        all_callbacks.append(early_stopping)
+    all_callbacks.extend(callbacks or [])
+
+    # Save weights, optimizer state and scaler every epoch and pick up an interrupted run where it stopped
+    initial_epoch = 0
+    if checkpoint_dir:
+        from checkpointing import TrainingCheckpoint
+        checkpoint = TrainingCheckpoint(checkpoint_dir, scaler=scaler, data=y_train, keep=keep_checkpoints,
+                                        early_stopping=early_stopping)
+        initial_epoch = checkpoint.restore(model)
+        if checkpoint.completed:
+            initial_epoch = epochs
+        all_callbacks.append(checkpoint)
+
+    history = model.fit(make_dataset(x_fit, y_fit, batch_size), validation_data=val_data, initial_epoch=initial_epoch,
+                        epochs=epochs, callbacks=all_callbacks, verbose=verbose)
+
+    stats = throughput.summary()
+    stats.update({'batch_size': batch_size, 'learning_rate': float(learning_rate)})
+    print(f"Training: {stats['epochs_run']} epochs in {stats['total_time']:.1f}s "
+          f"({stats['samples_per_second']:.0f} samples/s, batch size {batch_size}, lr {learning_rate:.2e})")
+    return history, stats
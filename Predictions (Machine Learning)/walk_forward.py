@@ -0,0 +1,147 @@
+import argparse
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from feature_store import STORE_DIR, FeatureStore
+from instrumentation import worker_task
+from model_builders import MODEL_TYPES
+from train_watchlist import WATCHLIST, init_worker
+
+RESULTS_FILE = os.path.join('walk_forward', 'folds.csv')
+# Columns of a fold result (run_fold's dict), so a run where every fold failed still has them
+RESULT_COLUMNS = ['ticker', 'model_type', 'fold', 'train_samples', 'test_samples', 'rmse', 'mae',
+                  'directional_accuracy', 'wall_time']
+
+
+# Function to split window samples into walk-forward folds of (train_start, test_start, test_end).
+# Expanding folds always train from the first sample; rolling folds keep a fixed-size training window.
+def make_folds(num_samples, n_folds=5, test_size=None, mode='expanding', train_size=None):
+    test_size = test_size or num_samples // (n_folds + 1)
+    train_size = train_size or num_samples - n_folds * test_size
+    if train_size <= 0:
+        raise ValueError(f"Not enough samples ({num_samples}) for {n_folds} folds of {test_size}")
+    folds = []
+    for k in range(n_folds):
+        test_end = num_samples - (n_folds - 1 - k) * test_size
+        test_start = test_end - test_size
+        train_start = 0 if mode == 'expanding' else max(test_start - train_size, 0)
+        folds.append((train_start, test_start, test_end))
+    return folds
+
+
+# Function to make sure a ticker's closes are in the feature store and return the .npy path
+# that folds and workers memory-map
+def cached_closes(ticker, start, store_dir=STORE_DIR):
+    store = FeatureStore(store_dir)
+    store.materialize(ticker, start)
+    return store.path(ticker, start)
+
+
+# Function to train and score one fold; windows are zero-copy views over the memory-mapped cache
+@worker_task
+def run_fold(ticker, model_type, cache_path, window, fold_index, fold, epochs, batch_size):
+    from model_builders import build_model, fit_model, predict
+    if model_type != 'xgboost':
+        from training_pipeline import configure_threads
+        import train_watchlist
+        configure_threads(train_watchlist._worker_threads, 1)
+
+    started = time.perf_counter()
+    closes = np.load(cache_path, mmap_mode='r')
+    x = np.lib.stride_tricks.sliding_window_view(closes[:-1], window)
+    y = closes[window:]
+    train_start, test_start, test_end = fold
+
+    # Scale with the training range only so nothing from the test period leaks in
+    low = float(closes[train_start:test_start + window].min())
+    high = float(closes[train_start:test_start + window].max())
+    span = (high - low) or 1.0
+    x_train = ((x[train_start:test_start] - low) / span).astype(np.float32)
+    y_train = ((y[train_start:test_start] - low) / span).astype(np.float32)
+    x_test = ((x[test_start:test_end] - low) / span).astype(np.float32)
+
+    model = build_model(model_type, window)
+    fit_model(model, model_type, x_train, y_train, batch_size=batch_size, epochs=epochs)
+    predictions = predict(model, model_type, x_test) * span + low
+
+    actual = np.asarray(y[test_start:test_end])
+    last_close = np.asarray(x[test_start:test_end, -1])
+    return {
+        'ticker': ticker,
+        'model_type': model_type,
+        'fold': fold_index,
+        'train_samples': test_start - train_start,
+        'test_samples': test_end - test_start,
+        'rmse': float(np.sqrt(np.mean((predictions - actual) ** 2))),
+        'mae': float(np.mean(np.abs(predictions - actual))),
+        'directional_accuracy': float(np.mean(np.sign(predictions - last_close) == np.sign(actual - last_close))),
+        'wall_time': time.perf_counter() - started,
+    }
+
+
+# Function to run walk-forward evaluation for several tickers and model types in parallel
+def walk_forward(tickers, model_types=('gru', 'lstm', 'xgboost'), n_folds=5, mode='expanding', test_size=None,
+                 start='2022-04-01', window=60, epochs=20, batch_size=64, workers=None, threads_per_worker=1,
+                 results_file=RESULTS_FILE):
+    workers = workers or max((os.cpu_count() or 1) // threads_per_worker, 1)
+
+    # Fetch each ticker once in the parent; workers only read the cache
+    tasks = []
+    for ticker in tickers:
+        try:
+            path = cached_closes(ticker, start)
+        except Exception as e:
+            print(f"Error downloading {ticker}: {e}")
+            continue
+        num_samples = len(np.load(path, mmap_mode='r')) - window
+        for fold_index, fold in enumerate(make_folds(num_samples, n_folds, test_size, mode)):
+            for model_type in model_types:
+                tasks.append((ticker, model_type, path, window, fold_index, fold, epochs, batch_size))
+
+    started = time.perf_counter()
+    rows = []
+    context = mp.get_context('spawn')
+    counter = context.Value('i', 0)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=init_worker, initargs=(threads_per_worker, counter, True)) as executor:
+        futures = [executor.submit(run_fold, *task) for task in tasks]
+        for future in as_completed(futures):
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                print(f"Error in fold: {e}")
+
+    results = pd.DataFrame(rows, columns=RESULT_COLUMNS).sort_values(['ticker', 'model_type', 'fold'])
+    os.makedirs(os.path.dirname(results_file) or '.', exist_ok=True)
+    results.to_csv(results_file, index=False)
+    if results.empty:
+        print(f"No folds completed ({len(tasks)} scheduled)")
+        return results
+
+    summary = results.groupby(['model_type'])[['rmse', 'mae', 'directional_accuracy', 'wall_time']].mean()
+    print(summary)
+    print(f"{len(rows)} folds in {time.perf_counter() - started:.1f}s with {workers} workers")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Walk-forward evaluation of the forecasting models.')
+    parser.add_argument('--models', nargs='+', choices=MODEL_TYPES, default=list(MODEL_TYPES))
+    parser.add_argument('--tickers', nargs='+', default=WATCHLIST)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--mode', choices=['expanding', 'rolling'], default='expanding')
+    parser.add_argument('--test-size', type=int, default=None)
+    parser.add_argument('--start', default='2022-04-01')
+    parser.add_argument('--window', type=int, default=60)
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    walk_forward(args.tickers, args.models, args.folds, args.mode, args.test_size, args.start, args.window,
+                 args.epochs, workers=args.workers, threads_per_worker=args.threads_per_worker,
+                 results_file=args.output)
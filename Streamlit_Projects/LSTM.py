@@ -1,17 +1,21 @@
 import numpy as np
 import pandas as pd
 import plotly.graph_objs as go
-import yfinance as yf
 from sklearn.preprocessing import MinMaxScaler
 from keras.layers import Dense, Dropout, LSTM
 from keras.models import Sequential
 from sklearn.metrics import mean_absolute_error, mean_squared_error
+import os
+
+import repo_path  # noqa: F401  (puts the repository root and the prediction helpers on sys.path)
+from checkpointing import CHECKPOINT_DIR, TrainingCheckpoint
+from data_providers import download
 
 start = '2023-01-01'
 end = '2024-07-23'
 stock = 'MSFT'
 
-data = yf.download(stock, start, end)
+data = download(stock, start=start, end=end)
 
 data.reset_index(inplace=True)
 
@@ -67,7 +71,13 @@ model.add(Dense(units =1))
 
 model.compile(optimizer = 'adam', loss = 'mean_squared_error')
 
-model.fit(x,y, epochs = 10, batch_size =32, verbose =1)
+# Checkpoint every epoch so an interrupted run continues from the last saved epoch
+checkpoint = TrainingCheckpoint(os.path.join(CHECKPOINT_DIR, f'{stock}_streamlit_lstm'), scaler=scaler, data=y)
+initial_epoch = checkpoint.restore(model)
+if checkpoint.completed:
+    initial_epoch = 10
+
+model.fit(x,y, epochs = 10, batch_size =32, verbose =1, initial_epoch = initial_epoch, callbacks = [checkpoint])
 
 pas_100_days = data_train.tail(100)
 
@@ -1,13 +1,17 @@
 import streamlit as st
 import numpy as np
 import pandas as pd
-import yfinance as yf
 from datetime import datetime, timedelta
 from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import load_model
-from tensorflow.keras.losses import MeanSquaredError
 import plotly.graph_objs as go
 import requests
+import hashlib
+import os
+
+import repo_path  # noqa: F401  (puts the repository root and the prediction helpers on sys.path)
+from forecasting import multi_step_forecast
+from inference_export import load_inference_model
+from data_providers import download
 
 # Function to calculate moving averages
 def calculate_moving_average(data, window_size):
@@ -20,12 +24,79 @@ def create_dataset(data, look_back=100):
         X.append(data[i:(i + look_back)])
     return np.array(X)
 
+# Models offered in the sidebar: (download URL, local file)
+MODELS = {
+    "Neural Network": ("https://github.com/rajdeepUWE/stock_market_forecast/raw/master/KNN_model.h5", "KNN_model.h5"),
+    "Random Forest": ("https://github.com/rajdeepUWE/stock_market_forecast/raw/master/random_forest_model.h5", "random_forest_model.h5"),
+    "LSTM Model": ("https://github.com/sercanbugra/Trading-Projects-by-Python/raw/main/Predictions%20(Machine%20Learning)/LSTM_sercan.h5", "LSTM.h5"),
+}
+
+# Function to compute the SHA-256 checksum of a file
+def file_checksum(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
 # Function to download model file
 def download_model(model_url, model_filename):
     response = requests.get(model_url)
+    response.raise_for_status()
     with open(model_filename, 'wb') as f:
         f.write(response.content)
 
+# Function to make sure a verified local copy of the model exists; the checksum recorded next to
+# the file is compared on every call and the model is only downloaded when missing or corrupted
+def ensure_model_file(model_url, model_filename):
+    checksum_file = model_filename + '.sha256'
+    if os.path.exists(model_filename):
+        checksum = file_checksum(model_filename)
+        if not os.path.exists(checksum_file):
+            with open(checksum_file, 'w') as f:
+                f.write(checksum)
+            return checksum
+        with open(checksum_file) as f:
+            if f.read().strip() == checksum:
+                return checksum
+    download_model(model_url, model_filename)
+    checksum = file_checksum(model_filename)
+    with open(checksum_file, 'w') as f:
+        f.write(checksum)
+    return checksum
+
+# Function to load a model once per process (the checksum is part of the cache key, so a
+# replaced file is reloaded)
+@st.cache_resource(show_spinner=False)
+def get_model(model_filename, checksum):
+    return load_inference_model(model_filename)
+
+# Function to download stock data, cached per (symbol, date range) for an hour
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_stock_data(stock_symbol, start_date, end_date):
+    return download(stock_symbol, start=start_date, end=end_date)
+
+# Function to run the backtest predictions and the 30-day forecast, memoized per (model, data fingerprint)
+@st.cache_data(show_spinner=False, max_entries=256)
+def predict_prices(model_checksum, data_fingerprint, _model, _closes, look_back=100):
+    # Scale data
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    scaled_data = scaler.fit_transform(_closes.reshape(-1, 1))
+
+    # Prepare data for prediction
+    x_pred = create_dataset(scaled_data, look_back)
+
+    # Reshape x_pred to match the model's input shape
+    x_pred = np.reshape(x_pred, (x_pred.shape[0], x_pred.shape[1], 1))
+
+    # Predict stock prices
+    y_pred = scaler.inverse_transform(_model.predict(x_pred))
+
+    # Use the last 100 days of data for forecasting (all 30 steps in one rollout)
+    x_forecast = scaled_data[-look_back:].reshape(1, -1, 1)
+    y_forecast = multi_step_forecast(_model, x_forecast, horizon=30)
+    return y_pred.flatten(), scaler.inverse_transform(y_forecast.reshape(-1, 1))[:, 0]
+
 # Streamlit app
 def main():
     st.sidebar.title('Stock Price Forecasting Portal')
@@ -43,7 +114,8 @@ def main():
     # Load stock data
     if stock_symbol:
         try:
-            stock_data = yf.download(stock_symbol, start=start_date, end=end_date)
+            # Copy so the moving-average columns below do not modify the cached frame
+            stock_data = load_stock_data(stock_symbol, start_date, end_date).copy()
             st.subheader('Stock Data')
             st.write(stock_data.head(50))  # Display first 50 rows
             st.write("...")  # Inserting an ellipsis for large datasets
@@ -86,58 +158,29 @@ def main():
             volume_fig.update_layout(title='Volume Plot')
             st.plotly_chart(volume_fig)
 
-            # Load trained model based on selection
-            if selected_model == "Neural Network":
-                model_url = "https://github.com/rajdeepUWE/stock_market_forecast/raw/master/KNN_model.h5"
-                model_filename = "KNN_model.h5"
-            elif selected_model == "Random Forest":
-                model_url = "https://github.com/rajdeepUWE/stock_market_forecast/raw/master/random_forest_model.h5"
-                model_filename = "random_forest_model.h5"
-            elif selected_model == "LSTM Model":
-                model_url = "https://github.com/sercanbugra/Trading-Projects-by-Python/blob/main/Predictions%20(Machine%20Learning)/LSTM_sercan.h5"
-                model_filename = "LSTM.h5"
-
-            # Download model file
-            download_model(model_url, model_filename)
-
-            # Load model with custom objects
-            model = load_model(model_filename, custom_objects={'mse': MeanSquaredError()})
+            # Load trained model based on selection (downloaded and loaded once, then reused).
+            # An exported ONNX/TFLite copy (e.g. LSTM.onnx) is preferred so TensorFlow
+            # is only imported when no exported copy exists
+            model_url, model_filename = MODELS[selected_model]
+            checksum = ensure_model_file(model_url, model_filename)
+            model = get_model(model_filename, checksum)
 
-            # Scale data
-            scaler = MinMaxScaler(feature_range=(0, 1))
-            scaled_data = scaler.fit_transform(np.array(stock_data['Close']).reshape(-1, 1))
-
-            # Prepare data for prediction
+            # Predictions are memoized per (model, data), so switching back to a model is instant
             look_back = 100  # Ensure the look_back period matches the model's expectations
-            x_pred = create_dataset(scaled_data, look_back)
-            
-            # Reshape x_pred to match the model's input shape
-            x_pred = np.reshape(x_pred, (x_pred.shape[0], x_pred.shape[1], 1))
-
-            # Predict stock prices
-            y_pred = model.predict(x_pred)
-            y_pred = scaler.inverse_transform(y_pred)
+            closes = np.array(stock_data['Close'], dtype=np.float64).reshape(-1)
+            data_fingerprint = hashlib.sha1(closes.tobytes()).hexdigest()
+            y_pred, forecast_prices = predict_prices(checksum, data_fingerprint, model, closes, look_back)
 
             # Plot original vs predicted prices
             st.subheader('Original vs Predicted Prices')
             fig3 = go.Figure()
             fig3.add_trace(go.Scatter(x=stock_data.index, y=stock_data['Close'], mode='lines', name='Original Price'))
-            fig3.add_trace(go.Scatter(x=stock_data.index[look_back:], y=y_pred.flatten(), mode='lines', name='Predicted Price'))
+            fig3.add_trace(go.Scatter(x=stock_data.index[look_back:], y=y_pred, mode='lines', name='Predicted Price'))
             st.plotly_chart(fig3)
 
             # Forecasting
             forecast_dates = [stock_data.index[-1] + timedelta(days=i) for i in range(1, 31)]
-            forecast = pd.DataFrame(index=forecast_dates, columns=['Forecast'])
-
-            # Use the last 100 days of data for forecasting
-            last_100_days = stock_data['Close'].tail(look_back)
-            last_100_days_scaled = scaler.transform(np.array(last_100_days).reshape(-1, 1))
-
-            for i in range(30):
-                x_forecast = last_100_days_scaled[-look_back:].reshape(1, -1, 1)
-                y_forecast = model.predict(x_forecast)
-                forecast.iloc[i] = scaler.inverse_transform(y_forecast)[0][0]
-                last_100_days_scaled = np.append(last_100_days_scaled, y_forecast)
+            forecast = pd.DataFrame({'Forecast': forecast_prices}, index=forecast_dates)
 
             st.subheader('30-Day Forecast')
             st.write(forecast)
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Importing this module puts the repository root on sys.path, so scripts run from this folder can use
+# the shared modules there (data_providers, instrumentation, render_pool, ohlcv_api, ...), and the
+# prediction folder too, for the forecasting, checkpointing and model export helpers the apps reuse
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+PREDICTIONS = os.path.join(ROOT, 'Predictions (Machine Learning)')
+for path in (ROOT, PREDICTIONS):
+    if path not in sys.path:
+        sys.path.append(path)
@@ -0,0 +1,368 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from datetime import date, datetime
+import pandas as pd
+from instrumentation import span
+
+# Market data and web pages come through a provider so any script can run live, record what it gets,
+# or replay a recording offline (deterministic, optionally with simulated network latency).
+#
+#   DATA_PROVIDER=live|record|replay      (default live)
+#   DATA_PROVIDER_DIR=<recordings folder> (default recordings/ next to this file)
+#   DATA_PROVIDER_LATENCY=0.2 DATA_PROVIDER_JITTER=0.1   seconds added to every replayed call
+
+PROVIDER_ENV = 'DATA_PROVIDER'
+DIR_ENV = 'DATA_PROVIDER_DIR'
+LATENCY_ENV = 'DATA_PROVIDER_LATENCY'
+JITTER_ENV = 'DATA_PROVIDER_JITTER'
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recordings')
+MODES = ('live', 'record', 'replay')
+BAR_FORMATS = ('parquet', 'csv')
+
+SP500_URL = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
+PERIOD_DAYS = {'1d': 1, '5d': 5, '1wk': 7, '1mo': 31, '3mo': 92, '6mo': 183, '1y': 366, '2y': 731, '5y': 1827,
+               '10y': 3653}
+
+
+class MissingRecording(LookupError):
+    pass
+
+
+# A recorded HTTP error response (status, reason and body), replayed as urllib's HTTPError
+class HttpFailure:
+    def __init__(self, status, reason, body=b''):
+        self.status = status
+        self.reason = reason
+        self.body = body
+
+    def to_json(self):
+        return json.dumps({'status': self.status, 'reason': self.reason,
+                           'body': base64.b64encode(self.body).decode('ascii')})
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        return cls(data['status'], data['reason'], base64.b64decode(data['body']))
+
+    def raise_for(self, url):
+        from urllib.error import HTTPError
+        raise HTTPError(url, self.status, self.reason, None, io.BytesIO(self.body))
+
+
+# Function to turn call arguments into a stable key (datetimes become dates or ISO strings; headers are not part of it)
+def call_key(method, *args, **kwargs):
+    def normalize(value):
+        if isinstance(value, datetime):
+            return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat()
+        if isinstance(value, date):
+            return value.isoformat()
+        if isinstance(value, (list, tuple, pd.Index, pd.Series)):
+            return [normalize(v) for v in value]
+        return value
+
+    payload = [method, normalize(list(args)), {k: normalize(v) for k, v in sorted(kwargs.items()) if v is not None}]
+    text = json.dumps(payload, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()[:20], text
+
+
+# Function to cut a full daily history down to a yfinance-style period or start/end range
+def slice_history(df, period=None, start=None, end=None):
+    tz = getattr(df.index, 'tz', None)
+
+    def timestamp(value):
+        value = pd.Timestamp(value)
+        return value.tz_localize(tz) if tz is not None and value.tzinfo is None else value
+
+    if start is not None:
+        df = df[df.index >= timestamp(start)]
+    elif period in PERIOD_DAYS and len(df):
+        df = df[df.index > df.index[-1] - pd.Timedelta(days=PERIOD_DAYS[period])]
+    elif period and period.endswith('d') and period[:-1].isdigit() and len(df):
+        df = df[df.index > df.index[-1] - pd.Timedelta(days=int(period[:-1]))]
+    if end is not None:
+        df = df[df.index < timestamp(end)]
+    return df
+
+
+# Live backend: yfinance for prices, urllib for web pages
+class LiveProvider:
+    mode = 'live'
+
+    # Price history of one ticker (the frame yfinance.Ticker(...).history returns)
+    def history(self, ticker, period=None, start=None, end=None, interval='1d'):
+        import yfinance as yf
+        kwargs = {'interval': interval}
+        if start is not None:
+            kwargs.update(start=start, end=end)
+        else:
+            kwargs['period'] = period or '1mo'
+        return yf.Ticker(ticker).history(**kwargs)
+
+    # Batched download of one or more tickers (the frame yfinance.download returns)
+    def download(self, tickers, **kwargs):
+        import yfinance as yf
+        return yf.download(tickers, **kwargs)
+
+    # Raw body of a web page (raises urllib's HTTPError on failure, like urlopen)
+    def fetch(self, url, headers=None, timeout=30):
+        from urllib.request import Request, urlopen
+        with urlopen(Request(url, headers=headers or {}), timeout=timeout) as response:
+            return response.read()
+
+    # Politeness delay between scraped pages
+    def pause(self, seconds):
+        time.sleep(seconds)
+
+
+# Recording backend: calls the live backend and saves every response under the call's key
+class RecordingProvider:
+    mode = 'record'
+
+    def __init__(self, directory=DEFAULT_DIR, inner=None):
+        self.directory = directory
+        self.inner = inner or LiveProvider()
+        self._lock = threading.Lock()
+
+    def _save(self, method, key, text, value):
+        with self._lock:
+            write_recording(self.directory, method, key, text, value)
+
+    def history(self, ticker, period=None, start=None, end=None, interval='1d'):
+        key, text = call_key('history', ticker, period=period, start=start, end=end, interval=interval)
+        value = self.inner.history(ticker, period=period, start=start, end=end, interval=interval)
+        self._save('history', key, text, value)
+        return value
+
+    def download(self, tickers, **kwargs):
+        key, text = call_key('download', tickers, **kwargs)
+        value = self.inner.download(tickers, **kwargs)
+        self._save('download', key, text, value)
+        return value
+
+    # A page that fails with an HTTP error is recorded too, so replay fails the same way
+    def fetch(self, url, headers=None, timeout=30):
+        from urllib.error import HTTPError
+        key, text = call_key('fetch', url)
+        try:
+            value = self.inner.fetch(url, headers, timeout)
+        except HTTPError as e:
+            body = e.read() if e.fp is not None else b''
+            self._save('fetch', key, text, HttpFailure(e.code, str(e.reason), body))
+            raise HTTPError(e.url, e.code, e.reason, e.headers, io.BytesIO(body)) from None
+        self._save('fetch', key, text, value)
+        return value
+
+    def pause(self, seconds):
+        self.inner.pause(seconds)
+
+
+# Replay backend: serves recorded responses with optional simulated latency. history() and download()
+# fall back to full series in bars/<TICKER>_<interval>.csv (or .parquet), sliced to the requested period,
+# when the exact call was never recorded.
+class ReplayProvider:
+    mode = 'replay'
+
+    def __init__(self, directory=DEFAULT_DIR, latency=0.0, jitter=0.0, seed=0):
+        self.directory = directory
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._bars = {}
+
+    def _wait(self):
+        delay = self.latency + (self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _load(self, method, key, text):
+        folder = os.path.join(self.directory, method)
+        if os.path.exists(os.path.join(folder, key + '.pkl')):
+            return pd.read_pickle(os.path.join(folder, key + '.pkl'))
+        if os.path.exists(os.path.join(folder, key + '.bin')):
+            with open(os.path.join(folder, key + '.bin'), 'rb') as f:
+                return f.read()
+        if os.path.exists(os.path.join(folder, key + '.http')):
+            with open(os.path.join(folder, key + '.http')) as f:
+                return HttpFailure.from_json(f.read())
+        raise MissingRecording(f'No recording for {text} in {self.directory}; run once with {PROVIDER_ENV}=record')
+
+    def _bars_frame(self, ticker, interval):
+        for extension in BAR_FORMATS:
+            path = os.path.join(self.directory, 'bars', f'{ticker.upper()}_{interval}.{extension}')
+            if path in self._bars:
+                return self._bars[path]
+            if os.path.exists(path):
+                self._bars[path] = read_bars(path)
+                return self._bars[path]
+        return None
+
+    def history(self, ticker, period=None, start=None, end=None, interval='1d'):
+        self._wait()
+        key, text = call_key('history', ticker, period=period, start=start, end=end, interval=interval)
+        try:
+            return self._load('history', key, text)
+        except MissingRecording:
+            bars = self._bars_frame(ticker, interval)
+            if bars is None:
+                raise
+            return slice_history(bars, period, start, end).copy()
+
+    # One ticker gives flat columns; several give (field, ticker) columns, or (ticker, field) with
+    # group_by='ticker', like yfinance.download
+    def download(self, tickers, **kwargs):
+        self._wait()
+        key, text = call_key('download', tickers, **kwargs)
+        try:
+            return self._load('download', key, text)
+        except MissingRecording:
+            names = [tickers] if isinstance(tickers, str) else list(tickers)
+            interval = kwargs.get('interval', '1d')
+            frames = {}
+            for name in names:
+                bars = self._bars_frame(name, interval)
+                if bars is None:
+                    raise
+                frames[name] = slice_history(bars, kwargs.get('period'), kwargs.get('start'), kwargs.get('end'))
+            if isinstance(tickers, str):
+                return frames[tickers].copy()
+            data = pd.concat(frames, axis=1)
+            return data if kwargs.get('group_by') == 'ticker' else data.swaplevel(axis=1).sort_index(axis=1)
+
+    def fetch(self, url, headers=None, timeout=30):
+        self._wait()
+        value = self._load('fetch', *call_key('fetch', url))
+        if isinstance(value, HttpFailure):
+            value.raise_for(url)
+        return value
+
+    # Nothing to be polite to offline
+    def pause(self, seconds):
+        pass
+
+
+# Function to write one recorded response (a frame as a pickle, a page as raw bytes, an HTTP error as JSON)
+# and list it in index.jsonl; a new recording of the same call replaces the old one whatever its kind
+def write_recording(directory, method, key, text, value):
+    folder = os.path.join(directory, method)
+    os.makedirs(folder, exist_ok=True)
+    extension = '.bin' if isinstance(value, bytes) else '.http' if isinstance(value, HttpFailure) else '.pkl'
+    path = os.path.join(folder, key + extension)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    if isinstance(value, bytes):
+        with open(tmp, 'wb') as f:
+            f.write(value)
+    elif isinstance(value, HttpFailure):
+        with open(tmp, 'w') as f:
+            f.write(value.to_json())
+    else:
+        value.to_pickle(tmp)
+    os.replace(tmp, path)
+    for other in ('.bin', '.http', '.pkl'):
+        if other != extension and os.path.exists(os.path.join(folder, key + other)):
+            os.remove(os.path.join(folder, key + other))
+    # Human-readable list of what each key holds
+    with open(os.path.join(directory, 'index.jsonl'), 'a') as f:
+        f.write(json.dumps({'key': key, 'call': text, 'recorded_at': datetime.now().isoformat()}) + '\n')
+    return path
+
+
+# Function to store a page so fetch(url) replays it
+def save_page(url, body, directory=DEFAULT_DIR):
+    key, text = call_key('fetch', url)
+    return write_recording(directory, 'fetch', key, text, body if isinstance(body, bytes) else body.encode())
+
+
+# Function to save a ticker's full history as bars/<TICKER>_<interval>.csv (or .parquet, which is much
+# faster for large files but needs pyarrow) for replay
+def save_bars(df, ticker, directory=DEFAULT_DIR, interval='1d', fmt='csv'):
+    if fmt not in BAR_FORMATS:
+        raise ValueError(f"Unknown bar format {fmt}; choose from {', '.join(BAR_FORMATS)}")
+    folder = os.path.join(directory, 'bars')
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f'{ticker.upper()}_{interval}.{fmt}')
+    tmp = f'{path}.{os.getpid()}.tmp'
+    df = df[['Open', 'High', 'Low', 'Close', 'Volume']].rename_axis('Date')
+    if fmt == 'parquet':
+        df.to_parquet(tmp)
+    else:
+        df.to_csv(tmp, float_format='%.4f')
+    os.replace(tmp, path)
+    return path
+
+
+# Function to read saved bars back with a time zone aware index (America/New_York, like yfinance)
+def read_bars(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    df = pd.read_csv(path, index_col='Date')
+    df.index = pd.to_datetime(df.index, utc=True).tz_convert('America/New_York')
+    return df
+
+
+# Function to build a provider from arguments, falling back to the DATA_PROVIDER* environment variables
+def create_provider(mode=None, directory=None, latency=None, jitter=None):
+    mode = (mode or os.environ.get(PROVIDER_ENV) or 'live').lower()
+    directory = directory or os.environ.get(DIR_ENV) or DEFAULT_DIR
+    if mode == 'live':
+        return LiveProvider()
+    if mode == 'record':
+        return RecordingProvider(directory)
+    if mode == 'replay':
+        latency = float(os.environ.get(LATENCY_ENV, 0)) if latency is None else latency
+        jitter = float(os.environ.get(JITTER_ENV, 0)) if jitter is None else jitter
+        return ReplayProvider(directory, latency, jitter)
+    raise ValueError(f"Unknown data provider {mode}; choose from {', '.join(MODES)}")
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+# Function to get the process-wide provider (built from the environment on first use)
+def get_provider():
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = create_provider()
+    return _provider
+
+
+# Function to replace the process-wide provider, e.g. with a replay for a benchmark
+def set_provider(provider):
+    global _provider
+    _provider = provider
+
+
+# Module-level calls are the download stage of every pipeline
+def history(ticker, period=None, start=None, end=None, interval='1d'):
+    provider = get_provider()
+    with span('download', source='history', mode=provider.mode):
+        return provider.history(ticker, period=period, start=start, end=end, interval=interval)
+
+
+def download(tickers, **kwargs):
+    provider = get_provider()
+    with span('download', source='download', mode=provider.mode):
+        return provider.download(tickers, **kwargs)
+
+
+def fetch(url, headers=None, timeout=30):
+    provider = get_provider()
+    with span('download', source='fetch', mode=provider.mode):
+        return provider.fetch(url, headers, timeout)
+
+
+def pause(seconds):
+    get_provider().pause(seconds)
+
+
+# Function to fetch the S&P 500 constituents page from Wikipedia (parsed by the callers)
+def sp500_html():
+    return fetch(SP500_URL)
@@ -0,0 +1,386 @@
+import atexit
+import contextvars
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+# Stage timing and metrics. Off unless enabled, and then a span costs one flag check:
+#
+#   METRICS=1                  collect, and print a per-stage summary at exit
+#   METRICS_FILE=run.jsonl     also write every span (and the final summary) as JSON lines
+#   METRICS_PORT=9100          also serve the Prometheus text format on http://localhost:9100/metrics
+#
+# Worker processes (multiprocessing / ProcessPoolExecutor) inherit the settings. Without a metrics file each
+# worker saves its totals to a per-pid file in a spool directory, and the main process merges them into the
+# summary it prints; /metrics only shows the serving process. A worker saves at exit, but forked workers
+# leave through os._exit and pool workers may be terminated, so pool tasks are wrapped in @worker_task,
+# which saves after every task.
+#
+#   with span('download', source='finviz'):      # or @timed('train') on a function
+#       ...
+#   count('tickers_scanned')
+
+METRICS_ENV = 'METRICS'
+FILE_ENV = 'METRICS_FILE'
+PORT_ENV = 'METRICS_PORT'
+# Set by the main process for its workers: directory where they leave their totals at exit
+SPOOL_ENV = 'METRICS_SPOOL'
+# Histogram buckets in seconds: Prometheus defaults plus longer ones for downloads and training
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'sum', 'count', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+
+# Counters and histograms keyed by (name, sorted label pairs)
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value, labels):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels):
+        key = (name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    # Function to get the counters and histograms as JSON-compatible lists
+    def state(self):
+        with self._lock:
+            return {'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                    'histograms': [[name, labels, h.buckets, h.sum, h.count, h.max]
+                                   for (name, labels), h in self.histograms.items()]}
+
+    # Function to add another registry's state (from state()) to this one
+    def merge(self, state):
+        with self._lock:
+            for name, labels, value in state['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                self.counters[key] = self.counters.get(key, 0) + value
+            for name, labels, buckets, total, n, top in state['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram()
+                histogram.buckets = [a + b for a, b in zip(histogram.buckets, buckets)]
+                histogram.sum += total
+                histogram.count += n
+                histogram.max = max(histogram.max, top)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+registry = Registry()
+_enabled = False
+_sink = None
+_sink_lock = threading.Lock()
+# Spool directory for worker totals (main process without a metrics file only)
+_spool = None
+# Innermost open span; a context variable so nesting also holds across interleaved asyncio tasks
+_current = contextvars.ContextVar('span', default=None)
+
+
+# Function to tell the main process from a worker. A spawned worker imports this module before its parent
+# is recorded, so the process name (set first) is checked too.
+def _main_process():
+    return mp.parent_process() is None and mp.current_process().name == 'MainProcess'
+
+
+def enabled():
+    return _enabled
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _emit(record):
+    line = json.dumps(record, default=str) + '\n'
+    with _sink_lock:
+        if _sink is not None:
+            _sink.write(line)
+
+
+# A timed stage: its duration goes to the span_seconds histogram (labelled with the span name) and,
+# with a metrics file, to a JSON line that also names the enclosing span
+class Span:
+    __slots__ = ('name', 'labels', 'start', 'wall_start', 'parent', 'token')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        parent = _current.get()
+        self.parent = parent.name if parent is not None else None
+        self.token = _current.set(self)
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        try:
+            _current.reset(self.token)
+        except ValueError:
+            # Exited in another context (e.g. an async generator resumed elsewhere)
+            pass
+        labels = (('span', self.name),) + self.labels
+        registry.observe('span_seconds', seconds, labels)
+        if exc_type is not None:
+            registry.inc('span_errors', 1, labels)
+        if _sink is not None:
+            _emit({'type': 'span', 'span': self.name, 'labels': dict(self.labels), 'parent': self.parent,
+                   'start': self.wall_start, 'seconds': seconds, 'pid': os.getpid(),
+                   'thread': threading.current_thread().name, 'error': exc_type.__name__ if exc_type else None})
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+# Function to time a block: `with span('render', ticker=t): ...`
+def span(name, **labels):
+    if not _enabled:
+        return _NOOP
+    return Span(name, _labels(labels))
+
+
+# Decorator to time every call of a function as a span (named after the function by default)
+def timed(name=None, **labels):
+    def decorate(function):
+        span_name = name or function.__name__
+        span_labels = _labels(labels)
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with Span(span_name, span_labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Decorator for functions run in worker processes (pool tasks, render calls): saves the worker's totals to
+# the spool directory after every call, so they reach the main process however the worker ends
+def worker_task(function):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        finally:
+            flush()
+    return wrapper
+
+
+# Function to add to a counter
+def count(name, value=1, **labels):
+    if _enabled:
+        registry.inc(name, value, _labels(labels))
+
+
+# Function to record a value (seconds by convention) in a histogram
+def observe(name, value, **labels):
+    if _enabled:
+        registry.observe(name, value, _labels(labels))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+# Function to render all metrics in the Prometheus text exposition format
+def prometheus_text():
+    with registry._lock:
+        counters = sorted(registry.counters.items())
+        histograms = sorted((key, (list(h.buckets), h.sum, h.count)) for key, h in registry.histograms.items())
+    lines = []
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            lines.append(f'# TYPE {name}_total counter')
+            typed.add(name)
+        lines.append(f'{name}_total{_format_labels(labels)} {value}')
+    for (name, labels), (buckets, total, n) in histograms:
+        if name not in typed:
+            lines.append(f'# TYPE {name} histogram')
+            typed.add(name)
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS + (float('inf'),), buckets):
+            cumulative += bucket
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", le)])} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+        lines.append(f'{name}_count{_format_labels(labels)} {n}')
+    return '\n'.join(lines) + '\n'
+
+
+# Function to summarize spans (count, total, mean and max seconds) and counters
+def summary():
+    with registry._lock:
+        spans = [{'span': dict(labels)['span'], 'labels': {k: v for k, v in labels if k != 'span'},
+                  'count': h.count, 'total_seconds': h.sum, 'mean_seconds': h.sum / h.count, 'max_seconds': h.max}
+                 for (name, labels), h in registry.histograms.items() if name == 'span_seconds']
+        counters = [{'counter': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in registry.counters.items()]
+    return {'spans': sorted(spans, key=lambda s: -s['total_seconds']), 'counters': counters}
+
+
+def print_summary(file=sys.stderr):
+    report = summary()
+    if not report['spans'] and not report['counters']:
+        return
+    print(f"{'span':<32} {'count':>8} {'total s':>10} {'mean ms':>10} {'max ms':>10}", file=file)
+    for s in report['spans']:
+        name = s['span'] + ''.join(f' {k}={v}' for k, v in s['labels'].items())
+        print(f"{name[:32]:<32} {s['count']:>8} {s['total_seconds']:>10.2f} {s['mean_seconds'] * 1000:>10.1f} "
+              f"{s['max_seconds'] * 1000:>10.1f}", file=file)
+    for c in report['counters']:
+        name = c['counter'] + ''.join(f' {k}={v}' for k, v in c['labels'].items())
+        print(f"{name[:32]:<32} {c['value']:>8}", file=file)
+
+
+# Function to serve /metrics on a background thread (for scripts; the web apps have their own route)
+def serve(port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Function to leave this worker's totals in the spool directory for the main process
+def _spool_write(directory):
+    state = registry.state()
+    if not state['counters'] and not state['histograms']:
+        return
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+# Function to save a worker's totals now (they are cumulative, so each save replaces the last one)
+def flush():
+    directory = os.environ.get(SPOOL_ENV)
+    if _enabled and _sink is None and directory and os.path.isdir(directory) and not _main_process():
+        _spool_write(directory)
+
+
+# Function to merge the totals that workers left in the spool directory, then remove it
+def _spool_merge(directory):
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    registry.merge(json.load(f))
+            except (OSError, ValueError):
+                pass
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def _shutdown():
+    global _sink
+    if not _enabled:
+        return
+    if _sink is not None:
+        _emit({'type': 'summary', 'pid': os.getpid(), **summary()})
+        with _sink_lock:
+            _sink.close()
+            _sink = None
+    elif _main_process():
+        if _spool is not None:
+            _spool_merge(_spool)
+        print_summary()
+    else:
+        flush()
+
+
+# A forked worker starts with a copy of its parent's totals; clear them so the merge does not count them twice
+def _after_fork():
+    registry.reset()
+
+
+# Function to turn instrumentation on or off; path appends JSON lines, port serves /metrics
+# (only from the main process, so worker processes do not fight over the port). Without a path the
+# main process also creates the spool directory its workers report to.
+def configure(enable=True, path=None, port=None):
+    global _enabled, _sink, _spool
+    _enabled = enable
+    if path:
+        with _sink_lock:
+            _sink = open(path, 'a', buffering=1)
+    elif enable and _main_process() and _spool is None:
+        _spool = tempfile.mkdtemp(prefix='metrics-')
+        os.environ[SPOOL_ENV] = _spool
+    if port and _main_process():
+        serve(port)
+
+
+if os.environ.get(METRICS_ENV, '').lower() in ('1', 'true', 'yes') or os.environ.get(FILE_ENV) or os.environ.get(PORT_ENV):
+    configure(True, os.environ.get(FILE_ENV), int(os.environ[PORT_ENV]) if os.environ.get(PORT_ENV) else None)
+atexit.register(_shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,195 @@
+import gzip
+import json
+import struct
+import numpy as np
+import pandas as pd
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Column name -> (source column, binary dtype). Timestamps are epoch seconds.
+COLUMNS = {'t': (None, 'f8'), 'o': ('Open', 'f4'), 'h': ('High', 'f4'), 'l': ('Low', 'f4'),
+           'c': ('Close', 'f4'), 'v': ('Volume', 'f4')}
+BINARY_MAGIC = b'OHLC'
+MAX_INDICATORS = 8
+FORMATS = {'json': 'application/json', 'bin': 'application/octet-stream'}
+
+
+# Function to parse a date or timestamp in the time zone of the price index
+def _timestamp(value, tz):
+    timestamp = pd.Timestamp(value)
+    if tz is not None and timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize(tz)
+    return timestamp
+
+
+# Function to keep the bars between start and end (dates or timestamps) and then the last `limit` bars
+def select_rows(df, start=None, end=None, limit=None):
+    tz = getattr(df.index, 'tz', None)
+    if start:
+        df = df[df.index >= _timestamp(start, tz)]
+    if end:
+        df = df[df.index <= _timestamp(end, tz)]
+    if limit not in (None, ''):
+        if not str(limit).isdigit() or int(limit) < 1:
+            raise ValueError(f"limit must be a positive integer, got {limit}")
+        df = df.tail(int(limit))
+    return df
+
+
+# Function to compute indicators named like sma20, ema50 or rsi14 on the Close column
+def add_indicators(df, names):
+    columns = {}
+    for name in names[:MAX_INDICATORS]:
+        kind, window = name[:3].lower(), name[3:]
+        if not window.isdigit() or not 1 < int(window) <= 500:
+            raise ValueError(f"Bad indicator {name}")
+        window = int(window)
+        if kind == 'sma':
+            columns[name] = df['Close'].rolling(window).mean()
+        elif kind == 'ema':
+            columns[name] = df['Close'].ewm(span=window, adjust=False).mean()
+        elif kind == 'rsi':
+            delta = df['Close'].diff()
+            gain = delta.clip(lower=0).rolling(window).mean()
+            loss = (-delta.clip(upper=0)).rolling(window).mean()
+            columns[name] = 100 - 100 / (1 + gain / loss)
+        else:
+            raise ValueError(f"Unknown indicator {name}")
+    return columns
+
+
+# Function to get the column arrays: epoch-second timestamps, OHLCV and the named indicator columns
+def to_columns(df, indicators=()):
+    columns = {'t': (df.index.asi8 // 10 ** 9).astype(np.float64) if len(df) else np.array([], dtype=np.float64)}
+    for name, (source, dtype) in COLUMNS.items():
+        if source:
+            columns[name] = df[source].to_numpy(dtype=np.float64)
+    for name in indicators:
+        columns[name] = df[name].to_numpy(dtype=np.float64)
+    return columns
+
+
+# Function to encode columns as compact JSON (prices rounded to 4 decimals, NaN as null)
+def encode_json(columns, meta):
+    payload = dict(meta, rows=len(columns['t']), columns={})
+    for name, values in columns.items():
+        rounded = np.round(values, 0 if name in ('t', 'v') else 4)
+        payload['columns'][name] = [None if np.isnan(x) else (int(x) if name in ('t', 'v') else float(x))
+                                    for x in rounded.tolist()]
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+# Function to decode a JSON body back into (meta, columns), with nulls as NaN
+def decode_json(body):
+    payload = json.loads(body)
+    columns = {name: np.array([np.nan if x is None else x for x in values], dtype=np.float64)
+               for name, values in payload.pop('columns').items()}
+    return payload, columns
+
+
+# Function to encode columns as binary: b'OHLC', uint32 header length, JSON header (padded to 8 bytes),
+# then each column as little-endian float64 (t) or float32 arrays in header order
+def encode_binary(columns, meta):
+    header = dict(meta, rows=len(columns['t']),
+                  columns=[{'name': name, 'dtype': COLUMNS.get(name, (None, 'f4'))[1]} for name in columns])
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    header_bytes += b' ' * (-(8 + len(header_bytes)) % 8)
+    parts = [BINARY_MAGIC, struct.pack('<I', len(header_bytes)), header_bytes]
+    for name, values in columns.items():
+        dtype = '<' + COLUMNS.get(name, (None, 'f4'))[1]
+        parts.append(np.asarray(values).astype(dtype).tobytes())
+    return b''.join(parts)
+
+
+# Function to decode a binary body back into (meta, columns); every column comes back as float64
+def decode_binary(body):
+    if body[:4] != BINARY_MAGIC:
+        raise ValueError('Not an OHLC binary body')
+    (length,) = struct.unpack_from('<I', body, 4)
+    header = json.loads(body[8:8 + length])
+    offset = 8 + length
+    columns = {}
+    for column in header.pop('columns'):
+        dtype = np.dtype('<' + column['dtype'])
+        columns[column['name']] = np.frombuffer(body, dtype, header['rows'], offset).astype(np.float64)
+        offset += dtype.itemsize * header['rows']
+    return header, columns
+
+
+# Function to parse an Accept or Accept-Encoding header into {value: quality}
+def _qualities(header):
+    qualities = {}
+    for part in (header or '').split(','):
+        value, *options = [p.strip() for p in part.split(';')]
+        if not value:
+            continue
+        quality = 1.0
+        for option in options:
+            name, _, number = option.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        qualities[value.lower()] = quality
+    return qualities
+
+
+# Function to pick the content encoding the client prefers (br before gzip on a tie, q=0 refuses, else none)
+def negotiate_encoding(accept_encoding):
+    accepted = _qualities(accept_encoding)
+    available = ('br', 'gzip') if brotli is not None else ('gzip',)
+    ranked = [(accepted.get(name, accepted.get('*', 0.0)), -i, name) for i, name in enumerate(available)]
+    quality, _, name = max(ranked)
+    return name if quality > 0 else None
+
+
+# Function to pick the body format from the Accept header when the query has no format parameter
+# (binary only when the client prefers it; browsers sending */* get JSON)
+def negotiate_format(accept):
+    accepted = _qualities(accept)
+    binary = accepted.get(FORMATS['bin'], 0.0)
+    text = max(accepted.get(FORMATS['json'], 0.0), accepted.get('application/*', 0.0), accepted.get('*/*', 0.0))
+    return 'bin' if binary > 0 and binary > text else 'json'
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def decompress(body, encoding):
+    if encoding == 'br':
+        return brotli.decompress(body)
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    return body
+
+
+# Function to build the (body, headers) of an OHLCV response from a price frame, the query parameters and
+# the Accept-Encoding and Accept headers (ValueError for bad parameters)
+def build_response(df, ticker, period, params, accept_encoding, accept=None):
+    fmt = params.get('format') or negotiate_format(accept)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt}; choose from {', '.join(FORMATS)}")
+    names = [n for n in (params.get('indicators') or '').split(',') if n]
+    # Indicators use the whole period so the selected range has no warm-up gap
+    if names:
+        df = df.assign(**add_indicators(df, names))
+    df = select_rows(df, params.get('start'), params.get('end'), params.get('limit'))
+    columns = to_columns(df, names[:MAX_INDICATORS])
+    meta = {'ticker': ticker, 'period': period}
+    body = encode_binary(columns, meta) if fmt == 'bin' else encode_json(columns, meta)
+
+    # Tiny bodies are not worth compressing
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= 512 else None
+    headers = {'Content-Type': FORMATS[fmt], 'Vary': 'Accept, Accept-Encoding'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return compress(body, encoding), headers
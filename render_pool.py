@@ -0,0 +1,177 @@
+import asyncio
+import io
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from instrumentation import flush, span
+
+# Charts are drawn in a small pool of render processes shared by the Flask and Django apps, so threaded
+# servers can render concurrently and a slow render cannot stall the request threads. Each app keeps
+# its own draw_* functions (module-level, so they pickle by reference) and passes them to render().
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', min(4, os.cpu_count() or 1)))
+RENDER_TIMEOUT = float(os.environ.get('RENDER_TIMEOUT', 10))
+
+
+class RenderError(Exception):
+    pass
+
+
+class RenderTimeout(RenderError):
+    pass
+
+
+class RenderBusy(RenderError):
+    pass
+
+
+# Function to encode a Matplotlib figure as PNG bytes with the Agg canvas
+def figure_png(fig):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    buf = io.BytesIO()
+    FigureCanvasAgg(fig).print_png(buf)
+    return buf.getvalue()
+
+
+# Render worker loop: receive (fn, args), send back (ok, result or exception)
+def _worker_main(conn):
+    while True:
+        try:
+            fn, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            reply = (True, fn(*args))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # The result or the exception could not be pickled
+            conn.send((False, RenderError(f'{fn.__name__} failed: {e!r}')))
+        # Render workers are terminated rather than exiting, so their metrics are saved after every render
+        flush()
+
+
+# One render process with its own pipe, so a hung render can be killed without touching the others
+class _Worker:
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+# Bounded pool of render processes. At most max_pending renders are queued or running. A render gets a
+# single deadline covering the wait for a slot, the wait for a worker and the drawing itself; a worker
+# that misses it is terminated and replaced.
+class RenderPool:
+    def __init__(self, workers=RENDER_WORKERS, timeout=RENDER_TIMEOUT, max_pending=None):
+        self.workers = workers
+        self.timeout = timeout
+        self._context = mp.get_context('spawn')
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 4)
+        # Idle workers; None is a worker not started yet (started on first use)
+        self._idle = queue.Queue()
+        for _ in range(workers):
+            self._idle.put(None)
+        self._lock = threading.Lock()
+        self._all = set()
+        self._closed = False
+
+    def _start_worker(self):
+        worker = _Worker(self._context)
+        with self._lock:
+            self._all.add(worker)
+        return worker
+
+    def _retire(self, worker):
+        with self._lock:
+            self._all.discard(worker)
+        worker.kill()
+
+    # Function to run fn(*args) in a render worker and return its result
+    def render(self, fn, *args, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        if self._closed:
+            raise RenderError('Render pool is shut down')
+        if not self._slots.acquire(timeout=timeout):
+            raise RenderBusy(f"No render slot free after {timeout}s")
+        try:
+            try:
+                worker = self._idle.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise RenderTimeout(f"No render worker free within {timeout}s")
+            try:
+                if worker is None or not worker.alive():
+                    if worker is not None:
+                        self._retire(worker)
+                    worker = self._start_worker()
+                worker.conn.send((fn, args))
+                if not worker.conn.poll(max(deadline - time.monotonic(), 0)):
+                    self._retire(worker)
+                    worker = None
+                    raise RenderTimeout(f"Rendering took longer than {timeout}s")
+                ok, value = worker.conn.recv()
+            except (EOFError, OSError):
+                if worker is not None:
+                    self._retire(worker)
+                worker = None
+                raise RenderError('Render worker crashed')
+            finally:
+                # A killed worker is replaced lazily by the next render
+                self._idle.put(worker)
+        finally:
+            self._slots.release()
+        if not ok:
+            raise value
+        return value
+
+    # Async version of render() for async views: the event loop is free while the worker draws
+    async def arender(self, fn, *args, timeout=None):
+        return await asyncio.to_thread(self.render, fn, *args, timeout=timeout)
+
+    def shutdown(self):
+        self._closed = True
+        with self._lock:
+            workers, self._all = self._all, set()
+        for worker in workers:
+            worker.kill()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to get the process-wide render pool (created on first use)
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderPool()
+        return _pool
+
+
+# Function to render a chart in the shared pool
+def render(fn, *args, timeout=None):
+    with span('render', chart=fn.__name__):
+        return get_pool().render(fn, *args, timeout=timeout)
+
+
+# Function to render a chart in the shared pool from an async view
+async def arender(fn, *args, timeout=None):
+    with span('render', chart=fn.__name__):
+        return await get_pool().arender(fn, *args, timeout=timeout)
@@ -0,0 +1,246 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from data_providers import BAR_FORMATS, DEFAULT_DIR, SP500_URL, save_bars, save_page
+from instrumentation import worker_task
+
+# Synthetic OHLCV panels for scale tests: GBM with jumps, clustered volatility, intraday seasonality, opening
+# gaps and embedded candlestick patterns whose positions are saved as ground truth. Output uses the replay
+# format of data_providers (bars/<TICKER>_<interval>.parquet|csv) plus a constituents page, so the scanners
+# run unchanged on the synthetic universe:
+#
+#   python synthetic_data.py --tickers 5000 --bars 2000 --workers 4
+#   DATA_PROVIDER=replay DATA_PROVIDER_DIR=recordings/synthetic python "Indicator Analysis (Web Scrapping)/MACD_Analysis.py"
+
+OUTPUT_DIR = os.path.join(DEFAULT_DIR, 'synthetic')
+BARS_PER_DAY = {'1m': 390, '5m': 78, '15m': 26, '30m': 13, '1h': 7, '1d': 1}
+INTERVAL_MINUTES = {'1m': 1, '5m': 5, '15m': 15, '30m': 30, '1h': 60}
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=30)
+END_DATE = '2024-12-31'
+
+# Annualized unless noted; vol_persistence is the day-to-day autocorrelation of log volatility
+DEFAULTS = {
+    'mean_price': 50.0,
+    'drift': 0.05,
+    'vol_low': 0.15,
+    'vol_high': 0.6,
+    'vol_of_vol': 0.5,
+    'vol_persistence': 0.97,
+    'jumps_per_year': 2.5,
+    'jump_mean': -0.01,
+    'jump_std': 0.05,
+    'gap_std': 0.3,          # opening gap, in units of daily volatility
+    'pattern_rate': 0.005,   # embedded patterns per bar
+}
+
+# Embedded pattern -> (TA-Lib function expected to fire on the last bar, expected signal)
+PATTERNS = {
+    'doji': ('CDLDOJI', 100),
+    'hammer': ('CDLHAMMER', 100),
+    'shooting_star': ('CDLSHOOTINGSTAR', -100),
+    'bullish_engulfing': ('CDLENGULFING', 100),
+    'bearish_engulfing': ('CDLENGULFING', -100),
+}
+# Candles of each pattern, oldest first, as (close-to-close return, open, high, low offsets from the close)
+# in units of the local bar volatility. Working in returns and offsets keeps the path after a pattern continuous.
+TEMPLATES = {
+    'doji': [(0.0, 0.0, 1.5, -1.5)],
+    'hammer': [(-1.0, 1.0, 1.2, -0.2), (-0.2, -0.1, 0.0, -2.6)],
+    'shooting_star': [(1.0, -1.0, 0.2, -1.2), (0.2, 0.1, 2.6, 0.0)],
+    'bullish_engulfing': [(-1.0, 1.0, 1.2, -0.2), (1.6, -1.9, 0.2, -2.1)],
+    'bearish_engulfing': [(1.0, -1.0, 0.2, -1.2), (-1.6, 1.9, 2.1, -0.2)],
+}
+# Bars between pattern slots, so TA-Lib's 10-bar body and range averages only see ordinary candles
+PATTERN_SPACING = 15
+
+
+# Function to name the synthetic tickers
+def synthetic_tickers(count):
+    return [f'SYN{i:05d}' for i in range(count)]
+
+
+# Function to build the bar timestamps shared by every ticker: regular sessions on business days up to `end`
+def bar_index(bars, interval='1d', end=END_DATE):
+    per_day = BARS_PER_DAY[interval]
+    days = pd.bdate_range(end=end, periods=-(-bars // per_day))
+    if per_day == 1:
+        index = days
+    else:
+        offsets = SESSION_OPEN + pd.to_timedelta(np.arange(per_day) * INTERVAL_MINUTES[interval], unit='m')
+        index = pd.DatetimeIndex((days.values[:, None] + offsets.values[None, :]).ravel())
+    return index[-bars:].tz_localize('America/New_York').rename('Date')
+
+
+# Function to overwrite bars with the pattern templates (in place) and return (row, bar, pattern name) of each
+def embed_patterns(ret, o_off, h_off, l_off, sigma, rng, rate):
+    n_tickers, bars = ret.shape
+    slots = np.arange(PATTERN_SPACING, bars, PATTERN_SPACING)
+    rows, cols = np.nonzero(rng.random((n_tickers, len(slots))) < rate * PATTERN_SPACING)
+    positions = slots[cols]
+    names = list(TEMPLATES)
+    kinds = rng.integers(len(names), size=len(rows))
+
+    for kind, name in enumerate(names):
+        r, k = rows[kinds == kind], positions[kinds == kind]
+        scale = 1.5 * sigma[r, k]
+        for back, (r_, o_, h_, l_) in enumerate(reversed(TEMPLATES[name])):
+            ret[r, k - back] = r_ * scale
+            o_off[r, k - back] = o_ * scale
+            h_off[r, k - back] = h_ * scale
+            l_off[r, k - back] = l_ * scale
+    return rows, positions, [names[i] for i in kinds]
+
+
+# Function to simulate a block of tickers at once. Returns (open, high, low, close, volume) arrays of shape
+# (tickers, bars) and the (rows, bars, names) of the embedded patterns.
+def simulate_block(n_tickers, bars, interval='1d', rng=None, **params):
+    p = dict(DEFAULTS, **params)
+    rng = rng if rng is not None else np.random.default_rng()
+    per_day = BARS_PER_DAY[interval]
+    dt = 1 / (252 * per_day)
+    session_pos = (np.arange(-(-bars // per_day) * per_day) % per_day)[-bars:]
+
+    start_price = p['mean_price'] * np.exp(rng.normal(0, 0.8, (n_tickers, 1)))
+    drift = rng.normal(p['drift'], 0.1, (n_tickers, 1))
+    base_vol = rng.uniform(p['vol_low'], p['vol_high'], (n_tickers, 1))
+
+    # Volatility clustering: log volatility is an AR(1) process, i.e. an exponentially weighted sum of
+    # shocks (pandas runs the recursion in C). The first shock is drawn from the stationary distribution.
+    alpha = 1 - p['vol_persistence'] ** (1 / per_day)
+    shocks = rng.standard_normal((bars, n_tickers)) * (p['vol_of_vol'] * np.sqrt((2 - alpha) / alpha))
+    shocks[0] *= np.sqrt(alpha / (2 - alpha))
+    log_vol = pd.DataFrame(shocks).ewm(alpha=alpha, adjust=False).mean().to_numpy().T
+
+    # Intraday seasonality: more volatility and volume at the open and close (averages to 1 over a session)
+    tau = (session_pos + 0.5) / per_day
+    season = 0.7 + 0.9 * (2 * tau - 1) ** 2 if per_day > 1 else np.ones(bars)
+    sigma = base_vol * np.sqrt(dt) * np.exp(log_vol - p['vol_of_vol'] ** 2 / 2) * season
+
+    noise = rng.standard_normal((n_tickers, bars))
+    intrabar = (drift * dt - sigma ** 2 / 2) + sigma * noise
+    jumps = rng.random((n_tickers, bars)) < p['jumps_per_year'] * dt
+    intrabar[jumps] += rng.normal(p['jump_mean'], p['jump_std'], int(jumps.sum()))
+
+    # Opening gaps: the first bar of each session opens away from the previous close
+    gap = np.zeros((n_tickers, bars))
+    starts = session_pos == 0
+    gap[:, starts] = base_vol / np.sqrt(252) * p['gap_std'] * rng.standard_normal((n_tickers, int(starts.sum())))
+
+    ret = gap + intrabar
+    o_off = -intrabar
+    h_off = np.maximum(o_off, 0) + np.abs(rng.normal(0, 0.5, (n_tickers, bars))) * sigma
+    l_off = np.minimum(o_off, 0) - np.abs(rng.normal(0, 0.5, (n_tickers, bars))) * sigma
+    truth = embed_patterns(ret, o_off, h_off, l_off, sigma, rng, p['pattern_rate'])
+
+    log_close = np.log(start_price) + np.cumsum(ret, axis=1)
+    base_volume = np.exp(rng.normal(np.log(2e6), 1.0, (n_tickers, 1))) / per_day
+    volume = base_volume * season * np.exp(0.4 * rng.standard_normal((n_tickers, bars))) * (0.5 + np.abs(noise))
+    return (np.exp(log_close + o_off), np.exp(log_close + h_off), np.exp(log_close + l_off), np.exp(log_close),
+            volume.astype(np.int64), truth)
+
+
+# Function to generate one block of tickers and write each to the replay folder (runs in a worker process);
+# returns the block's ground truth. With directory=None nothing is written (to time generation alone).
+@worker_task
+def write_block(tickers, bars, interval, seed, directory, fmt, end, params):
+    open_, high, low, close, volume, (rows, positions, names) = simulate_block(
+        len(tickers), bars, interval, np.random.default_rng(seed), **params)
+    index = bar_index(bars, interval, end)
+    if directory is not None:
+        for row, ticker in enumerate(tickers):
+            frame = pd.DataFrame({'Open': open_[row], 'High': high[row], 'Low': low[row], 'Close': close[row],
+                                  'Volume': volume[row]}, index=index)
+            save_bars(frame, ticker, directory, interval, fmt)
+    return pd.DataFrame({
+        'ticker': np.asarray(tickers)[rows],
+        'timestamp': index[positions],
+        'pattern': names,
+        'talib_function': [PATTERNS[name][0] for name in names],
+        'signal': [PATTERNS[name][1] for name in names],
+    })
+
+
+# Function to build a Wikipedia-like constituents table listing the synthetic tickers
+def constituents_html(tickers):
+    rows = ''.join(f'<tr><td>{t}</td><td>Synthetic {t}</td></tr>' for t in tickers)
+    return f'<html><body><table id="constituents"><tr><th>Symbol</th><th>Security</th></tr>{rows}</table></body></html>'
+
+
+# Function to pick the bar file format: parquet when pyarrow is installed (much faster), else CSV
+def default_format():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return 'csv'
+    return 'parquet'
+
+
+# Function to generate a synthetic universe in blocks of about `block_bars` bars, optionally across processes.
+# Writes the bars, ground_truth.csv, meta.json and a constituents page (so sp500_html() lists the tickers).
+def generate_universe(n_tickers=500, bars=2520, interval='1d', directory=OUTPUT_DIR, fmt=None, workers=1, seed=0,
+                      end=END_DATE, block_bars=2_000_000, **params):
+    unknown = set(params) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown parameters {', '.join(sorted(unknown))}")
+    fmt = fmt or default_format()
+    tickers = synthetic_tickers(n_tickers)
+    size = max(1, block_bars // bars)
+    blocks = [tickers[i:i + size] for i in range(0, len(tickers), size)]
+    # One independent random stream per block, so the output does not depend on the number of workers
+    seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+    jobs = [(block, bars, interval, block_seed, directory, fmt, end, params) for block, block_seed in zip(blocks, seeds)]
+
+    if workers > 1:
+        with ProcessPoolExecutor(workers, mp_context=mp.get_context('spawn')) as pool:
+            truth = list(pool.map(write_block, *zip(*jobs)))
+    else:
+        truth = [write_block(*job) for job in jobs]
+    truth = pd.concat(truth, ignore_index=True)
+
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+        truth.to_csv(os.path.join(directory, 'ground_truth.csv'), index=False)
+        save_page(SP500_URL, constituents_html(tickers), directory)
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'tickers': n_tickers, 'bars': bars, 'interval': interval, 'format': fmt, 'seed': seed,
+                       'end': end, 'params': dict(DEFAULTS, **params), 'patterns': PATTERNS}, f, indent=2)
+    return truth
+
+
+# Function to generate one ticker's bars as a DataFrame (seeded by the ticker name, so reproducible)
+def synthetic_frame(ticker, bars=2520, interval='1d', end=END_DATE, **params):
+    rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+    open_, high, low, close, volume, _ = simulate_block(1, bars, interval, rng, **params)
+    return pd.DataFrame({'Open': open_[0], 'High': high[0], 'Low': low[0], 'Close': close[0], 'Volume': volume[0]},
+                        index=bar_index(bars, interval, end))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic OHLCV universe in the replay format.')
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--bars', type=int, default=2520, help='bars per ticker')
+    parser.add_argument('--interval', choices=list(BARS_PER_DAY), default='1d')
+    parser.add_argument('--output', default=OUTPUT_DIR)
+    parser.add_argument('--format', choices=BAR_FORMATS, help='default: parquet if pyarrow is installed, else csv')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--end', default=END_DATE, help='date of the last session')
+    parser.add_argument('--pattern-rate', type=float, default=DEFAULTS['pattern_rate'])
+    parser.add_argument('--no-write', action='store_true', help='only generate (to time the generator)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    truth = generate_universe(args.tickers, args.bars, args.interval, None if args.no_write else args.output,
+                              args.format, args.workers, args.seed, args.end, pattern_rate=args.pattern_rate)
+    elapsed = time.perf_counter() - started
+    total = args.tickers * args.bars
+    print(f'{total:,} bars for {args.tickers} tickers in {elapsed:.1f}s ({total / elapsed:,.0f} bars/s), '
+          f'{len(truth):,} embedded patterns')
+    if not args.no_write:
+        print('Written to', args.output)
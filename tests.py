@@ -0,0 +1,294 @@
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from urllib.error import HTTPError
+import numpy as np
+import pandas as pd
+
+import data_providers
+import instrumentation
+import ohlcv_api
+from data_providers import (HttpFailure, MissingRecording, RecordingProvider, ReplayProvider, call_key, save_bars,
+                            save_page, slice_history)
+from instrumentation import count, worker_task
+from ohlcv_api import (build_response, decode_binary, decode_json, decompress, encode_binary, encode_json,
+                       negotiate_encoding, negotiate_format, to_columns)
+
+# Offline tests of the shared modules at the repository root: run with `python tests.py` from here.
+
+
+# Function to build daily OHLCV bars at midnight New York time with a gap in the volume
+def daily_bars(rows=100, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    index = pd.bdate_range('2024-01-02', periods=rows, tz='America/New_York')
+    df = pd.DataFrame({'Open': close * 0.995, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                       'Volume': rng.integers(1000, 100000, rows).astype(float)}, index=index)
+    df.iloc[3, df.columns.get_loc('Volume')] = np.nan
+    return df
+
+
+class OhlcvEncodingTests(unittest.TestCase):
+    def setUp(self):
+        self.df = daily_bars()
+        self.columns = to_columns(self.df)
+        self.meta = {'ticker': 'AAA', 'period': '1y'}
+
+    def test_json_round_trip(self):
+        meta, columns = decode_json(encode_json(self.columns, self.meta))
+        self.assertEqual(meta, dict(self.meta, rows=100))
+        self.assertEqual(list(columns), ['t', 'o', 'h', 'l', 'c', 'v'])
+        np.testing.assert_array_equal(columns['t'], self.columns['t'])
+        np.testing.assert_allclose(columns['c'], self.columns['c'], atol=5e-5)
+        self.assertTrue(np.isnan(columns['v'][3]))
+
+    def test_binary_round_trip(self):
+        body = encode_binary(self.columns, self.meta)
+        # The header is padded so the column arrays start on an 8-byte boundary
+        self.assertEqual((len(body) - 100 * (8 + 5 * 4)) % 8, 0)
+        meta, columns = decode_binary(body)
+        self.assertEqual(meta, dict(self.meta, rows=100))
+        np.testing.assert_array_equal(columns['t'], self.columns['t'])
+        for name in 'ohlcv':
+            np.testing.assert_allclose(columns[name], self.columns[name], rtol=1e-6)
+
+    def test_empty_frame_round_trips(self):
+        columns = to_columns(self.df.iloc[:0])
+        self.assertEqual(decode_binary(encode_binary(columns, self.meta))[0]['rows'], 0)
+        self.assertEqual(decode_json(encode_json(columns, self.meta))[0]['rows'], 0)
+
+    def test_binary_rejects_other_bodies(self):
+        with self.assertRaises(ValueError):
+            decode_binary(b'{"rows":0}')
+
+
+class OhlcvNegotiationTests(unittest.TestCase):
+    def test_encoding_prefers_br_then_gzip(self):
+        best = 'br' if ohlcv_api.brotli is not None else 'gzip'
+        self.assertEqual(negotiate_encoding('gzip, deflate, br'), best)
+        self.assertEqual(negotiate_encoding('*'), best)
+        self.assertEqual(negotiate_encoding('br;q=0.5, gzip'), 'gzip')
+        self.assertEqual(negotiate_encoding('gzip;q=0, br;q=0'), None)
+        self.assertEqual(negotiate_encoding('deflate'), None)
+        self.assertEqual(negotiate_encoding(None), None)
+
+    def test_format_follows_accept(self):
+        self.assertEqual(negotiate_format('application/octet-stream'), 'bin')
+        self.assertEqual(negotiate_format('application/json, application/octet-stream;q=0.5'), 'json')
+        self.assertEqual(negotiate_format('application/octet-stream, */*;q=0.1'), 'bin')
+        self.assertEqual(negotiate_format('text/html,application/xhtml+xml,*/*;q=0.8'), 'json')
+        self.assertEqual(negotiate_format(None), 'json')
+
+
+class OhlcvResponseTests(unittest.TestCase):
+    def setUp(self):
+        self.df = daily_bars()
+
+    def test_accept_selects_binary_and_gzip(self):
+        body, headers = build_response(self.df, 'AAA', '1y', {}, 'gzip', 'application/octet-stream')
+        self.assertEqual(headers['Content-Type'], 'application/octet-stream')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept', headers['Vary'])
+        meta, columns = decode_binary(decompress(body, 'gzip'))
+        self.assertEqual(meta['rows'], 100)
+
+    def test_format_parameter_wins_over_accept(self):
+        body, headers = build_response(self.df, 'AAA', '1y', {'format': 'json', 'limit': '5'}, None,
+                                       'application/octet-stream')
+        self.assertEqual(headers['Content-Type'], 'application/json')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(decode_json(body)[0]['rows'], 5)
+
+    def test_indicators_use_the_whole_period(self):
+        body, _ = build_response(self.df, 'AAA', '1y', {'format': 'bin', 'indicators': 'sma20', 'limit': '10'}, None)
+        _, columns = decode_binary(body)
+        expected = self.df['Close'].rolling(20).mean().tail(10).to_numpy()
+        np.testing.assert_allclose(columns['sma20'], expected, rtol=1e-6)
+
+    def test_bad_parameters_raise_value_error(self):
+        for params in ({'limit': '-5'}, {'limit': '0'}, {'limit': 'ten'}, {'format': 'xml'},
+                       {'indicators': 'sma1'}, {'indicators': 'foo20'}):
+            with self.subTest(params=params), self.assertRaises(ValueError):
+                build_response(self.df, 'AAA', '1y', params, None)
+
+
+# Stand-in for the live backend: serves fixed bars and pages and counts the calls that reach it
+class FakeLive:
+    mode = 'live'
+
+    def __init__(self, bars, pages):
+        self.bars = bars
+        self.pages = pages
+        self.calls = 0
+
+    def history(self, ticker, period=None, start=None, end=None, interval='1d'):
+        self.calls += 1
+        return slice_history(self.bars, period, start, end)
+
+    def download(self, tickers, **kwargs):
+        self.calls += 1
+        return pd.concat({t: self.bars for t in tickers}, axis=1) if isinstance(tickers, list) else self.bars
+
+    def fetch(self, url, headers=None, timeout=30):
+        self.calls += 1
+        status, body = self.pages[url]
+        if status != 200:
+            HttpFailure(status, 'Error', body).raise_for(url)
+        return body
+
+    def pause(self, seconds):
+        pass
+
+
+# Test case with a scratch recordings folder
+class RecordingsTestCase(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.directory = folder.name
+
+
+class CallKeyTests(unittest.TestCase):
+    def test_equivalent_arguments_share_a_key(self):
+        key = call_key('history', 'AAA', start=date(2024, 1, 2), end=None, interval='1d')[0]
+        self.assertEqual(call_key('history', 'AAA', interval='1d', start=datetime(2024, 1, 2))[0], key)
+        self.assertEqual(call_key('history', 'AAA', start='2024-01-02', interval='1d')[0], key)
+        self.assertNotEqual(call_key('history', 'AAA', start=datetime(2024, 1, 2, 9, 30), interval='1d')[0], key)
+        self.assertNotEqual(call_key('history', 'BBB', start=date(2024, 1, 2), interval='1d')[0], key)
+
+    def test_lists_and_indexes_normalize_alike(self):
+        self.assertEqual(call_key('download', ['AAA', 'BBB'])[0], call_key('download', pd.Index(['AAA', 'BBB']))[0])
+
+
+class SliceHistoryTests(unittest.TestCase):
+    def setUp(self):
+        self.bars = daily_bars(30)
+
+    def test_period_counts_back_from_the_last_bar(self):
+        sliced = slice_history(self.bars, period='5d')
+        self.assertEqual(sliced.index[-1], self.bars.index[-1])
+        self.assertTrue((sliced.index > self.bars.index[-1] - pd.Timedelta(days=5)).all())
+        self.assertEqual(len(slice_history(self.bars, period='max')), 30)
+
+    def test_naive_start_and_end_use_the_index_time_zone(self):
+        sliced = slice_history(self.bars, start='2024-01-05', end='2024-01-10')
+        self.assertEqual([d.isoformat() for d in sliced.index.date], ['2024-01-05', '2024-01-08', '2024-01-09'])
+
+
+class RecordReplayTests(RecordingsTestCase):
+    def test_recorded_calls_replay_without_the_live_backend(self):
+        bars = daily_bars(30)
+        live = FakeLive(bars, {'https://example.com/a': (200, b'<html>a</html>')})
+        recorder = RecordingProvider(self.directory, inner=live)
+        recorded = recorder.history('AAA', period='1mo')
+        recorder.download(['AAA', 'BBB'], start='2024-01-10', group_by='ticker')
+        recorder.fetch('https://example.com/a')
+
+        replay = ReplayProvider(self.directory)
+        pd.testing.assert_frame_equal(replay.history('AAA', period='1mo'), recorded)
+        self.assertEqual(list(replay.download(['AAA', 'BBB'], start='2024-01-10', group_by='ticker').columns.levels[0]),
+                         ['AAA', 'BBB'])
+        self.assertEqual(replay.fetch('https://example.com/a'), b'<html>a</html>')
+        self.assertEqual(live.calls, 3)
+
+    def test_http_failures_replay_as_http_errors(self):
+        live = FakeLive(daily_bars(5), {'https://example.com/gone': (404, b'not here')})
+        with self.assertRaises(HTTPError) as recorded:
+            RecordingProvider(self.directory, inner=live).fetch('https://example.com/gone')
+        self.assertEqual(recorded.exception.read(), b'not here')
+
+        with self.assertRaises(HTTPError) as replayed:
+            ReplayProvider(self.directory).fetch('https://example.com/gone')
+        self.assertEqual((replayed.exception.code, replayed.exception.read()), (404, b'not here'))
+
+        # Recording the page again once it works replaces the failure
+        save_page('https://example.com/gone', 'back', self.directory)
+        self.assertEqual(ReplayProvider(self.directory).fetch('https://example.com/gone'), b'back')
+        self.assertEqual(len(os.listdir(os.path.join(self.directory, 'fetch'))), 1)
+
+    def test_unknown_calls_raise_missing_recording(self):
+        replay = ReplayProvider(self.directory)
+        with self.assertRaises(MissingRecording):
+            replay.history('AAA', period='1mo')
+        with self.assertRaises(MissingRecording):
+            replay.download(['AAA'], period='1mo')
+        with self.assertRaises(MissingRecording):
+            replay.fetch('https://example.com/never')
+
+        # With bars for only one of two tickers the batch still fails
+        save_bars(daily_bars(5), 'AAA', self.directory)
+        with self.assertRaises(MissingRecording):
+            ReplayProvider(self.directory).download(['AAA', 'BBB'], period='1mo')
+
+
+class DownloadFallbackTests(RecordingsTestCase):
+    def setUp(self):
+        super().setUp()
+        for ticker, seed in (('AAA', 1), ('BBB', 2)):
+            save_bars(daily_bars(30, seed), ticker, self.directory)
+        self.replay = ReplayProvider(self.directory)
+
+    def test_one_ticker_string_is_flat(self):
+        data = self.replay.download('AAA', period='5d')
+        self.assertEqual(list(data.columns), ['Open', 'High', 'Low', 'Close', 'Volume'])
+
+    def test_ticker_list_is_field_then_ticker(self):
+        data = self.replay.download(['AAA', 'BBB'], period='5d')
+        self.assertEqual(data.columns.nlevels, 2)
+        self.assertEqual(set(data.columns.get_level_values(0)), {'Open', 'High', 'Low', 'Close', 'Volume'})
+        self.assertEqual(list(data['Close'].columns), ['AAA', 'BBB'])
+
+    def test_group_by_ticker_is_ticker_then_field(self):
+        data = self.replay.download(['AAA', 'BBB'], period='5d', group_by='ticker')
+        self.assertEqual(list(data['AAA'].columns), ['Open', 'High', 'Low', 'Close', 'Volume'])
+        self.assertEqual(list(data['BBB'].index), list(self.replay.history('BBB', period='5d').index))
+
+    def test_one_ticker_list_keeps_the_ticker_level(self):
+        data = self.replay.download(['AAA'], period='5d', group_by='ticker')
+        self.assertEqual(list(data.columns.get_level_values(0).unique()), ['AAA'])
+        self.assertEqual(len(data), len(self.replay.history('AAA', period='5d')))
+
+    def test_module_functions_use_the_process_provider(self):
+        self.addCleanup(data_providers.set_provider, data_providers._provider)
+        data_providers.set_provider(self.replay)
+        self.assertEqual(len(data_providers.history('aaa', period='max')), 30)
+
+
+
+# Pool task for the worker metrics tests
+@worker_task
+def count_items(n):
+    count('test_items', n)
+    return os.getpid()
+
+
+class WorkerMetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(self.disable)
+        instrumentation.configure(True)
+
+    def disable(self):
+        instrumentation._enabled = False
+        instrumentation.registry.reset()
+        if instrumentation._spool is not None:
+            shutil.rmtree(instrumentation._spool, ignore_errors=True)
+        instrumentation._spool = None
+        os.environ.pop(instrumentation.SPOOL_ENV, None)
+
+    # Forked workers leave through os._exit, so nothing they count would survive without @worker_task
+    @unittest.skipUnless('fork' in mp.get_all_start_methods(), 'needs the fork start method')
+    def test_fork_pool_workers_report_their_totals(self):
+        count('test_items', 100)
+        with ProcessPoolExecutor(2, mp_context=mp.get_context('fork')) as pool:
+            list(pool.map(count_items, range(1, 11)))
+        instrumentation._spool_merge(instrumentation._spool)
+        # The parent's 100 counted once: forked workers start from empty totals
+        self.assertEqual(instrumentation.registry.counters[('test_items', ())], 155)
+
+
+if __name__ == '__main__':
+    unittest.main()